@@ -0,0 +1,64 @@
+import streamlit as st
+from helpers.EngagementAnalytics import EngagementAnalytics
+from helpers.MetricsStore import METRICS, PLATFORMS
+
+
+@st.cache_resource
+def get_analytics():
+    # One instance per server process; it keeps its rollup state between reruns
+    return EngagementAnalytics()
+
+
+def run(operation):
+    analytics = get_analytics()
+
+    # Fold in only the samples collected since the previous rerun
+    try:
+        analytics.refresh()
+    except Exception as e:
+        st.error(f"Failed to load engagement data: {e}")
+        return
+
+    if analytics.version == 0:
+        st.warning("No engagement data collected yet. Start the metrics collector with "
+                   "`python -m helpers.MetricsCollector` (or `--once` for a single collection).")
+        return
+
+    # --- OVERVIEW ---
+    if operation == "Overview":
+        st.header("Per-Platform Totals")
+        st.caption(f"{analytics.version:,} data points")
+        st.dataframe(analytics.platform_totals())
+
+    # --- GROWTH ---
+    elif operation == "Growth":
+        st.header("Growth Rates")
+        metric = st.selectbox("Metric", list(METRICS), index=METRICS.index('followers'))
+        window_days = st.number_input("Window (days)", min_value=1, max_value=365, value=7)
+
+        growth = analytics.growth_rates(metric, int(window_days))
+        st.dataframe(growth.to_frame(f"{window_days}-day growth").style.format("{:.2%}"))
+        st.line_chart(analytics.daily_totals(metric))
+
+    # --- BEST POSTING HOURS ---
+    elif operation == "Best Posting Hours":
+        st.header("Mean Engagement by Hour Posted (UTC)")
+        hours = analytics.best_posting_hours()
+        st.bar_chart(hours)
+
+        best = hours.idxmax()
+        for platform in PLATFORMS:
+            if best.notna()[platform]:
+                st.write(f"{platform.capitalize()}: {int(best[platform]):02d}:00 UTC")
+
+    # --- TOP POSTS ---
+    elif operation == "Top Posts":
+        st.header("Top Posts by Engagement Rate")
+        platform = st.selectbox("Platform", ["All"] + list(PLATFORMS))
+        n = st.number_input("Number of posts", min_value=1, max_value=100, value=10)
+
+        top = analytics.top_posts(int(n), None if platform == "All" else platform)
+        if top.empty:
+            st.warning("No posts with engagement data found.")
+        else:
+            st.dataframe(top)
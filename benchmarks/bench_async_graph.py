@@ -0,0 +1,109 @@
+"""Compare the blocking Graph API clients with their async counterparts.
+
+Runs against a local GraphAPIStandIn with simulated network latency, so no
+credentials or network access are needed:
+
+    python -m benchmarks.bench_async_graph --requests 500 --latency 0.05
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.standins import GraphAPIStandIn
+
+
+def configure(base_url):
+    """Point every Graph API client at the stand-in with throwaway credentials"""
+    os.environ.update({
+        'GRAPH_API_BASE_URL': base_url,
+        'FB_ACCESS_TOKEN': 'bench-user-token',
+        'FB_PAGE_ID': '1000',
+        'FACEBOOK_ACCESS_TOKEN': 'bench-token',
+        'FACEBOOK_PAGE_ID': '1000',
+        'INSTAGRAM_BUSINESS_ACCOUNT_ID': '2000',
+        'CREDENTIAL_STORE_DIR': tempfile.mkdtemp(prefix='bench-credentials-'),
+    })
+
+
+def timed(call):
+    start = time.perf_counter()
+    call()
+    return time.perf_counter() - start
+
+
+async def timed_async(call):
+    start = time.perf_counter()
+    await call()
+    return time.perf_counter() - start
+
+
+def report(name, latencies, elapsed):
+    latencies = sorted(latencies)
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{name:<28} {len(latencies) / elapsed:>10.1f} req/s"
+          f"   p50 {statistics.median(latencies) * 1000:>8.1f} ms"
+          f"   p99 {p99 * 1000:>8.1f} ms")
+
+
+def bench_sync(name, calls, workers):
+    start = time.perf_counter()
+    if workers == 1:
+        latencies = [timed(call) for call in calls]
+    else:
+        with ThreadPoolExecutor(workers) as pool:
+            latencies = list(pool.map(timed, calls))
+    report(name, latencies, time.perf_counter() - start)
+
+
+async def bench_async(name, calls):
+    start = time.perf_counter()
+    latencies = await asyncio.gather(*(timed_async(call) for call in calls))
+    report(name, latencies, time.perf_counter() - start)
+
+
+async def run_async(requests, concurrency):
+    from helpers.AsyncGraphAPI import AsyncFacebookMinimal, AsyncInstagramAPI, create_session
+
+    async with create_session(concurrency) as session:
+        facebook = AsyncFacebookMinimal(session, max_concurrency=concurrency)
+        instagram = AsyncInstagramAPI(session, max_concurrency=concurrency)
+        await facebook.warmup()
+        await bench_async(f"facebook async ({concurrency})",
+                          [lambda i=i: facebook.read_post(f"1000_{i}") for i in range(requests)])
+        await bench_async(f"instagram async ({concurrency})",
+                          [lambda: instagram.get_media_list(limit=5) for _ in range(requests)])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help="Calls per scenario")
+    parser.add_argument('--latency', type=float, default=0.05, help="Simulated server latency in seconds")
+    parser.add_argument('--threads', type=int, default=16, help="Thread pool size for the sync clients")
+    parser.add_argument('--concurrency', type=int, default=100, help="In-flight limit for the async clients")
+    args = parser.parse_args()
+
+    with GraphAPIStandIn(latency=args.latency) as graph:
+        configure(graph.base_url)
+        from helpers.FacebookMinimal import FacebookMinimal
+        from helpers.InstagramAPI import InstagramAPI
+
+        facebook = FacebookMinimal()
+        instagram = InstagramAPI()
+        # Sequential runs are capped so a high --requests does not take minutes
+        sequential = min(args.requests, 50)
+        bench_sync("facebook sync", [lambda i=i: facebook.read_post(f"1000_{i}") for i in range(sequential)], 1)
+        bench_sync(f"facebook sync threads ({args.threads})",
+                   [lambda i=i: facebook.read_post(f"1000_{i}") for i in range(args.requests)], args.threads)
+        bench_sync("instagram sync", [lambda: instagram.get_media_list(limit=5) for _ in range(sequential)], 1)
+        bench_sync(f"instagram sync threads ({args.threads})",
+                   [lambda: instagram.get_media_list(limit=5) for _ in range(args.requests)], args.threads)
+        asyncio.run(run_async(args.requests, args.concurrency))
+        print(f"stand-in served {graph.requests} requests")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,275 @@
+"""Throughput, latency and memory of every manager operation, without credentials or network.
+
+Each platform's manager is pointed at a local stand-in server (see
+benchmarks/standins.py) running in a child process, then every operation is
+called --iterations times. Throughput and p50/p99 latency come from that
+timed pass; peak memory comes from a shorter second pass under tracemalloc,
+so tracing does not distort the timings.
+
+    python -m benchmarks.bench_managers --latency 0.02 --iterations 100
+    python -m benchmarks.bench_managers --platforms twitter reddit --error-rate 0.05 --json results.json
+
+Not covered: InstagramAPI.create_post (a fixed 5 second wait) and Reddit
+image posts (upload to Reddit's media host and websocket confirmation).
+"""
+import argparse
+import contextlib
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.standins import RedirectAdapter, redirect_httplib2, run_standins
+
+PLATFORMS = ('facebook', 'instagram', 'twitter', 'reddit', 'youtube')
+
+
+def configure(urls, workdir, client_limits=''):
+    """Point every manager at the stand-ins with throwaway credentials and local state"""
+    os.environ.update({
+        'FB_ACCESS_TOKEN': 'bench-user-token',
+        'FB_PAGE_ID': '1000',
+        'FACEBOOK_ACCESS_TOKEN': 'bench-token',
+        'FACEBOOK_PAGE_ID': '1000',
+        'INSTAGRAM_BUSINESS_ACCOUNT_ID': '2000',
+        'TWITTER_CLIENT_ID': 'bench',
+        'TWITTER_CLIENT_SECRET': 'bench',
+        'TWITTER_BEARER_TOKEN': 'bench',
+        'TWITTER_ACCESS_TOKEN': 'bench',
+        'TWITTER_ACCESS_TOKEN_SECRET': 'bench',
+        'REDDIT_CLIENT_ID': 'bench',
+        'REDDIT_CLIENT_SECRET': 'bench',
+        'REDDIT_USERNAME': 'standin',
+        'REDDIT_PASSWORD': 'bench',
+        'REDDIT_USER_AGENT': 'bench-managers/1.0',
+        'praw_check_for_updates': 'False',
+        'CREDENTIAL_STORE_DIR': os.path.join(workdir, 'credentials'),
+        'UPLOAD_INDEX_PATH': os.path.join(workdir, 'upload_index.db'),
+        'RATE_LIMIT_DB': os.path.join(workdir, 'rate_limits.db'),
+        'QUOTA_LEDGER_PATH': os.path.join(workdir, 'quota_ledger.db'),
+        'WAL_PATH': os.path.join(workdir, 'write_ahead.db'),
+        # Each create_video costs 1600 units, so the real 10000 per day would stop the run after six
+        'YOUTUBE_DAILY_QUOTA': str(10 ** 9),
+        # The real platforms' limits would throttle a benchmark to a few requests per second
+        'RATE_LIMITS': client_limits or ','.join(f'{platform}=0' for platform in PLATFORMS),
+    })
+    if 'facebook' in urls:
+        os.environ['GRAPH_API_BASE_URL'] = f"{urls['facebook']}/v18.0"
+    if 'reddit' in urls:
+        os.environ['REDDIT_URL'] = os.environ['REDDIT_OAUTH_URL'] = urls['reddit']
+    if 'youtube' in urls:
+        os.environ['YOUTUBE_API_BASE_URL'] = urls['youtube']
+
+
+def facebook_operations(urls, workdir):
+    from helpers.FacebookMinimal import FacebookMinimal
+
+    fb = FacebookMinimal()
+    post_ids = [f"1000_{i}" for i in range(50)]
+    return {
+        'create_post': lambda i: fb.create_post(f"Benchmark post {i}"),
+        'read_post': lambda i: fb.read_post(post_ids[i % 50]),
+        'read_post(minimal)': lambda i: fb.read_post(post_ids[i % 50], fields='minimal'),
+        'update_post': lambda i: fb.update_post(post_ids[i % 50], f"Updated {i}"),
+        'delete_post': lambda i: fb.delete_post(post_ids[i % 50]),
+        'get_post_metrics(50)': lambda i: fb.get_post_metrics(post_ids),
+        'get_page_followers': lambda i: fb.get_page_followers(),
+        'list_posts(25)': lambda i: fb.list_posts(),
+        'verify_permissions': lambda i: fb.verify_permissions(),
+    }
+
+
+def instagram_operations(urls, workdir):
+    from helpers.InstagramAPI import InstagramAPI
+
+    ig = InstagramAPI()
+    media_ids = [str(i) for i in range(50)]
+    return {
+        'get_account_info': lambda i: ig.get_account_info(),
+        'create_media_container': lambda i: ig.create_media_container('https://example.invalid/a.jpg', f"Caption {i}"),
+        'publish_media': lambda i: ig.publish_media(str(i)),
+        'get_media_list(25)': lambda i: ig.get_media_list(),
+        'get_media_list(25,minimal)': lambda i: ig.get_media_list(fields='minimal'),
+        'list_media(25)': lambda i: ig.list_media(),
+        'get_media_metrics(50)': lambda i: ig.get_media_metrics(media_ids),
+        'delete_media': lambda i: ig.delete_media(media_ids[i % 50]),
+    }
+
+
+def twitter_operations(urls, workdir):
+    from helpers.TwitterManager import TwitterManager
+
+    twitter = TwitterManager(lazy=True)
+    # tweepy has no base URL setting, so requests to api.twitter.com are sent to the stand-in instead
+    session = twitter.client.session
+    for host in ('https://api.twitter.com', 'https://upload.twitter.com'):
+        session.mount(host, RedirectAdapter(urls['twitter'], session.get_adapter('https://')))
+    twitter.warmup()
+    tweet_ids = [str(i) for i in range(1, 101)]
+    image_paths = [os.path.join(workdir, f"image{i}.jpg") for i in range(4)]
+    for path in image_paths:
+        with open(path, 'wb') as f:
+            f.write(os.urandom(512 * 1024))
+    video_path = os.path.join(workdir, 'tweet_video.mp4')
+    with open(video_path, 'wb') as f:
+        f.write(os.urandom(16 * 1024 * 1024 + 1))
+    return {
+        'create_tweet': lambda i: twitter.create_tweet(f"Benchmark tweet {i}"),
+        'create_tweet(4 images)': lambda i: twitter.create_tweet(f"Benchmark tweet {i}", media_paths=image_paths),
+        'create_tweet(16MiB video)': lambda i: twitter.create_tweet(f"Benchmark tweet {i}", media_paths=[video_path]),
+        'get_tweet': lambda i: twitter.get_tweet(tweet_ids[i % 100]),
+        'get_my_tweets(5)': lambda i: twitter.get_my_tweets(),
+        'get_my_tweets(100)': lambda i: twitter.get_my_tweets(100),
+        'list_tweets(100)': lambda i: twitter.list_tweets(100),
+        'update_tweet': lambda i: twitter.update_tweet(tweet_ids[i % 100], f"Updated {i}"),
+        'delete_tweet': lambda i: twitter.delete_tweet(tweet_ids[i % 100]),
+        'get_tweet_metrics(100)': lambda i: twitter.get_tweet_metrics(tweet_ids),
+        'get_follower_count': lambda i: twitter.get_follower_count(),
+    }
+
+
+def reddit_operations(urls, workdir):
+    from helpers.RedditManager import RedditManager
+
+    reddit = RedditManager()
+    reddit.warmup()
+    post_ids = [format(i, 'x') for i in range(1000, 1100)]
+    return {
+        'create_post(text)': lambda i: reddit.create_post('test', f"Benchmark {i}", "Body"),
+        'read_post': lambda i: reddit.read_post(post_ids[i % 100]),
+        'update_post': lambda i: reddit.update_post(post_ids[i % 100], f"Updated {i}"),
+        'delete_post': lambda i: reddit.delete_post(post_ids[i % 100]),
+        'get_recent_posts(10)': lambda i: reddit.get_recent_posts(),
+        'list_posts(10)': lambda i: reddit.list_posts(10),
+        'get_post_metrics(100)': lambda i: reddit.get_post_metrics(post_ids),
+    }
+
+
+def youtube_operations(urls, workdir):
+    from google.oauth2.credentials import Credentials
+    from helpers.CredentialStore import CredentialStore
+    from helpers.YouTubeOperations import YouTubeOperations
+
+    # A token without an expiry is always valid, so authenticate() neither refreshes nor starts a login flow
+    CredentialStore.default().put('youtube', Credentials(
+        'bench-token', refresh_token='bench', client_id='bench', client_secret='bench',
+        token_uri=f"{urls['youtube']}/token"
+    ))
+    youtube = YouTubeOperations()
+    youtube.authenticate()
+    # The AuthorizedHttp wraps a plain httplib2.Http
+    redirect_httplib2(youtube.youtube._http.http, urls['youtube'])
+    video_path = os.path.join(workdir, 'video.mp4')
+    with open(video_path, 'wb') as f:
+        f.write(os.urandom(2 * 1024 * 1024 + 1))
+    video_ids = [f"v{i}" for i in range(50)]
+    return {
+        'create_video(2MiB)': lambda i: youtube.create_video(f"Benchmark {i}", "", 'private', video_path),
+        'read_video': lambda i: youtube.read_video(video_ids[i % 50]),
+        'update_video': lambda i: youtube.update_video(video_ids[i % 50], title=f"Updated {i}"),
+        'delete_video': lambda i: youtube.delete_video(video_ids[i % 50]),
+        'list_my_videos(10)': lambda i: youtube.list_my_videos(),
+        'list_videos(10)': lambda i: youtube.list_videos(),
+        'get_video_statistics(50)': lambda i: youtube.get_video_statistics(video_ids),
+        'get_channel_statistics': lambda i: youtube.get_channel_statistics(),
+    }
+
+
+OPERATIONS = {
+    'facebook': facebook_operations,
+    'instagram': instagram_operations,
+    'twitter': twitter_operations,
+    'reddit': reddit_operations,
+    'youtube': youtube_operations,
+}
+
+
+def call(operation, i):
+    """Latency of one call and whether it failed (an exception, None or False)"""
+    start = time.perf_counter()
+    try:
+        result = operation(i)
+        failed = result is None or result is False
+    except Exception:
+        failed = True
+    return time.perf_counter() - start, failed
+
+
+def measure(operation, iterations, concurrency, memory_iterations):
+    start = time.perf_counter()
+    if concurrency == 1:
+        results = [call(operation, i) for i in range(iterations)]
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            results = list(pool.map(lambda i: call(operation, i), range(iterations)))
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    for i in range(memory_iterations):
+        call(operation, i)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    latencies = sorted(latency for latency, _ in results)
+    return {
+        'calls': iterations,
+        'errors': sum(failed for _, failed in results),
+        'throughput': iterations / elapsed,
+        'p50_ms': statistics.median(latencies) * 1000,
+        'p99_ms': latencies[min(iterations - 1, int(iterations * 0.99))] * 1000,
+        'peak_kib': peak / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--platforms', nargs='+', choices=PLATFORMS, default=list(PLATFORMS))
+    parser.add_argument('--iterations', type=int, default=50, help="Timed calls per operation")
+    parser.add_argument('--memory-iterations', type=int, default=5, help="Calls per operation under tracemalloc")
+    parser.add_argument('--concurrency', type=int, default=1, help="Threads calling each operation")
+    parser.add_argument('--latency', type=float, default=0.0, help="Stand-in response latency in seconds")
+    parser.add_argument('--jitter', type=float, default=0.0, help="Extra random latency, up to this many seconds")
+    parser.add_argument('--error-rate', type=float, default=0.0, help="Share of requests answered with a 503")
+    parser.add_argument('--rate-limit', type=int, help="Requests per window before stand-ins answer 429/403")
+    parser.add_argument('--rate-window', type=float, default=900.0, help="Rate-limit window in seconds")
+    parser.add_argument('--client-limits', default='',
+                        help="RATE_LIMITS for the managers' own limiter, e.g. 'twitter=300/1' (default: off)")
+    parser.add_argument('--seed', type=int, default=0, help="Seed for jitter and injected errors")
+    parser.add_argument('--json', help="Also write the results to this file")
+    parser.add_argument('--verbose', action='store_true', help="Show the managers' own output")
+    args = parser.parse_args()
+
+    options = dict(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+                   rate_limit=args.rate_limit, rate_window=args.rate_window, seed=args.seed)
+    servers = {'facebook' if p == 'instagram' else p for p in args.platforms}
+    results = {}
+    if not args.verbose:
+        # Failures are counted in the results instead of being logged per call
+        os.environ['LOG_LEVEL'] = 'CRITICAL'
+    with tempfile.TemporaryDirectory(prefix='bench-managers-') as workdir, run_standins(servers, **options) as urls:
+        configure(urls, workdir, args.client_limits)
+        print(f"{'operation':<38} {'req/s':>9} {'p50 ms':>9} {'p99 ms':>9} {'peak KiB':>10} {'errors':>7}")
+        for platform in args.platforms:
+            with open(os.devnull, 'w') as devnull:
+                quiet = contextlib.nullcontext() if args.verbose else contextlib.redirect_stdout(devnull)
+                with quiet:
+                    operations = OPERATIONS[platform](urls, workdir)
+                for name, operation in operations.items():
+                    with quiet:
+                        result = measure(operation, args.iterations, args.concurrency, args.memory_iterations)
+                    results[f"{platform}.{name}"] = result
+                    print(f"{platform + '.' + name:<38} {result['throughput']:>9.1f} {result['p50_ms']:>9.2f} "
+                          f"{result['p99_ms']:>9.2f} {result['peak_kib']:>10.1f} {result['errors']:>7}")
+                    sys.stdout.flush()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+"""Replay a recorded traffic trace against a local stand-in at 1x-100x speed.
+
+Record a trace by running the app, bulk_cli or a benchmark with TRAFFIC_TRACE
+set (see helpers/TrafficRecorder.py), then replay it:
+
+    TRAFFIC_TRACE=trace.jsonl python bulk_cli.py manifest.csv
+    python -m benchmarks.replay trace.jsonl --speed 1 10 100 --concurrency 64
+
+A ReplayStandIn in a child process answers every request with the response
+recorded for it, after the recorded latency. The recorded requests are sent
+again at their recorded offsets divided by --speed, through the transport the
+managers use (resilient_session and ResilientHttp, so pooling, retries, circuit
+breakers, the rate limiter and instrumentation all take part). For every speed
+the p50/p99 latency per operation is reported, with how far requests fell
+behind their schedule.
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from aiohttp import web
+
+from benchmarks.standins import StandInServer
+from helpers.Instrumentation import current_operation
+from helpers.TrafficRecorder import REDACTED, SENSITIVE
+
+PLATFORMS = ('facebook', 'instagram', 'twitter', 'reddit', 'youtube')
+# Response headers that describe the recorded transfer rather than the content
+HOP_HEADERS = {'content-length', 'transfer-encoding', 'content-encoding', 'connection'}
+
+
+def load_trace(path: str, platforms=None) -> List[dict]:
+    """Trace entries in start-time order, optionally only for some platforms"""
+    with open(path) as f:
+        entries = [json.loads(line) for line in f if line.strip()]
+    if platforms:
+        entries = [entry for entry in entries if entry['platform'] in platforms]
+    return sorted(entries, key=lambda entry: entry['time'])
+
+
+def _key(method: str, path: str, query) -> tuple:
+    # Redacted values differ between recording and replay, so they don't take part in matching
+    return method, path, tuple(sorted((key, value) for key, value in query
+                                      if value != REDACTED and not SENSITIVE.search(key)))
+
+
+def _body(recorded: Optional[dict]):
+    """Bytes and content type to send for a recorded body"""
+    if not recorded:
+        return b'', None
+    if 'json' in recorded:
+        return json.dumps(recorded['json']).encode(), 'application/json'
+    if 'form' in recorded:
+        return urlencode([tuple(field) for field in recorded['form']]).encode(), 'application/x-www-form-urlencoded'
+    return bytes(recorded.get('size') or 0), 'application/octet-stream'
+
+
+class ReplayStandIn(StandInServer):
+    """Serves the responses of a trace, each after its recorded latency times `latency_scale`"""
+
+    def __init__(self, entries: List[dict], latency_scale: float = 1.0, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.latency_scale = latency_scale
+        responses: Dict[tuple, List[dict]] = {}
+        fallbacks: Dict[tuple, List[dict]] = {}
+        for entry in entries:
+            parts = urlsplit(entry['url'])
+            responses.setdefault(_key(entry['method'], parts.path, parse_qsl(parts.query)), []).append(entry)
+            fallbacks.setdefault((entry['method'], parts.path), []).append(entry)
+        # The same request recorded several times gets its responses in recorded order, then again;
+        # at high speed-ups concurrent requests (e.g. upload chunks) can take each other's responses
+        self.responses = {key: itertools.cycle(found) for key, found in responses.items()}
+        self.fallbacks = {key: itertools.cycle(found) for key, found in fallbacks.items()}
+        self.misses = 0
+
+    def routes(self, app):
+        app.router.add_route('*', '/{path:.*}', self.replay)
+
+    async def replay(self, request):
+        key = _key(request.method, request.path, request.query.items())
+        found = self.responses.get(key) or self.fallbacks.get((request.method, request.path))
+        if found is None:
+            self.misses += 1
+            return self.error(404, f"{request.method} {request.path} is not in the trace")
+        entry = next(found)
+        await request.read()
+        if self.latency_scale:
+            await asyncio.sleep(entry['latency'] * self.latency_scale)
+        if entry.get('status') is None:
+            # The recorded request failed without a response
+            return self.error(502, entry.get('error', 'Recorded request failed'))
+
+        body, content_type = _body(entry.get('response'))
+        headers = {key: value for key, value in entry.get('headers', {}).items() if key not in HOP_HEADERS}
+        if 'location' in headers:
+            # Upload sessions continue at this server
+            location = urlsplit(headers['location'])
+            headers['location'] = self.url + location.path + (f"?{location.query}" if location.query else '')
+        if content_type and 'content-type' not in headers:
+            headers['content-type'] = content_type
+        return web.Response(status=entry['status'], body=body, headers=headers)
+
+
+def _serve(path, platforms, latency_scale, options, conn):
+    server = ReplayStandIn(load_trace(path, platforms), latency_scale, **options).start()
+    conn.send(server.url)
+    try:
+        conn.recv()
+    except EOFError:
+        pass
+    server.stop()
+
+
+@contextmanager
+def run_replay_standin(path: str, platforms=None, latency_scale: float = 1.0, **options):
+    """
+    Start a ReplayStandIn for a trace in a child process, like standins.run_standins
+
+    Yields:
+        Root URL of the server
+    """
+    context = multiprocessing.get_context('spawn')
+    parent, child = context.Pipe()
+    process = context.Process(target=_serve, args=(path, platforms, latency_scale, options, child), daemon=True)
+    process.start()
+    child.close()
+    try:
+        yield parent.recv()
+    finally:
+        parent.close()
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
+
+
+class Replayer:
+    def __init__(self, base_url: str):
+        """Sends trace entries to `base_url` through the managers' transport, one client per platform"""
+        import requests
+        from googleapiclient.http import build_http
+        from helpers.Resilience import ResilientHttp, resilient_session
+
+        self.base_url = base_url.rstrip('/')
+        self.sessions = {platform: resilient_session(requests.Session(), platform, 'replay')
+                         for platform in PLATFORMS if platform != 'youtube'}
+        # googleapiclient's transport (build_http leaves 308 upload responses alone); httplib2.Http is
+        # not thread-safe, so one per thread
+        self._youtube = lambda: ResilientHttp(build_http(), 'youtube', 'replay')
+        self._local = threading.local()
+
+    def send(self, entry: dict) -> bool:
+        """Send one entry; returns whether the status differed from the recorded one"""
+        parts = urlsplit(entry['url'])
+        url = self.base_url + parts.path + (f"?{parts.query}" if parts.query else '')
+        body, content_type = _body(entry.get('request'))
+        headers = {'Content-Type': content_type} if content_type else {}
+        if entry['platform'] == 'youtube':
+            http = getattr(self._local, 'youtube', None)
+            if http is None:
+                http = self._local.youtube = self._youtube()
+            response, _ = http.request(url, entry['method'], body or None, headers)
+            status = response.status
+        else:
+            status = self.sessions[entry['platform']].request(entry['method'], url, data=body or None,
+                                                              headers=headers).status_code
+        return status != (entry.get('status') or 502)
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))] if values else 0.0
+
+
+def replay(replayer: Replayer, entries: List[dict], speed: float, concurrency: int) -> dict:
+    """
+    Send every entry at its recorded offset divided by `speed`
+
+    Returns:
+        Dict with overall duration, throughput, p50/p99 latency and schedule lag,
+        and per operation calls, errors and p50/p99 latency (milliseconds)
+    """
+    def run(entry, due):
+        lag = time.perf_counter() - start - due
+        token = current_operation.set(entry.get('operation'))
+        begin = time.perf_counter()
+        try:
+            failed = replayer.send(entry)
+        except Exception:
+            failed = True
+        finally:
+            current_operation.reset(token)
+        return f"{entry['platform']}.{entry.get('operation') or 'other'}", time.perf_counter() - begin, lag, failed
+
+    origin = entries[0]['time']
+    start = time.perf_counter()
+    with ThreadPoolExecutor(concurrency) as pool:
+        futures = []
+        for entry in entries:
+            due = (entry['time'] - origin) / speed
+            delay = due - (time.perf_counter() - start)
+            if delay > 0:
+                time.sleep(delay)
+            futures.append(pool.submit(run, entry, due))
+        results = [future.result() for future in futures]
+    elapsed = time.perf_counter() - start
+
+    operations = {}
+    for name, latency, _, failed in results:
+        operations.setdefault(name, []).append((latency, failed))
+    return {
+        'speed': speed,
+        'requests': len(results),
+        'duration_s': elapsed,
+        'throughput': len(results) / elapsed,
+        'p50_ms': statistics.median(latency for _, latency, _, _ in results) * 1000,
+        'p99_ms': _percentile([latency for _, latency, _, _ in results], 0.99) * 1000,
+        'lag_p99_ms': _percentile([lag for _, _, lag, _ in results], 0.99) * 1000,
+        'errors': sum(failed for _, _, _, failed in results),
+        'operations': {
+            name: {
+                'calls': len(calls),
+                'errors': sum(failed for _, failed in calls),
+                'p50_ms': statistics.median(latency for latency, _ in calls) * 1000,
+                'p99_ms': _percentile([latency for latency, _ in calls], 0.99) * 1000,
+            }
+            for name, calls in sorted(operations.items())
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('trace', help="JSONL trace written with TRAFFIC_TRACE")
+    parser.add_argument('--speed', type=float, nargs='+', default=[1.0], help="Replay speed-ups, e.g. 1 10 100")
+    parser.add_argument('--concurrency', type=int, default=64, help="Requests in flight at most")
+    parser.add_argument('--platforms', nargs='+', choices=PLATFORMS, help="Only replay these platforms")
+    parser.add_argument('--latency-scale', type=float, default=1.0,
+                        help="Multiplier for the recorded server latency (0 answers immediately)")
+    parser.add_argument('--client-limits', default='',
+                        help="RATE_LIMITS for the managers' own limiter, e.g. 'twitter=300/1' (default: off)")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args()
+
+    entries = load_trace(args.trace, args.platforms)
+    if not entries:
+        parser.error(f"No requests to replay in {args.trace}")
+    span = entries[-1]['time'] - entries[0]['time']
+    print(f"{len(entries)} requests recorded over {span:.1f}s")
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix='replay-') as workdir, \
+            run_replay_standin(args.trace, args.platforms, args.latency_scale) as url:
+        os.environ.update({
+            'RATE_LIMIT_DB': os.path.join(workdir, 'rate_limits.db'),
+            # The recorded traffic already went through the real platforms' limits
+            'RATE_LIMITS': args.client_limits or ','.join(f'{platform}=0' for platform in PLATFORMS),
+        })
+        os.environ.pop('TRAFFIC_TRACE', None)
+        replayer = Replayer(url)
+        for speed in args.speed:
+            result = replay(replayer, entries, speed, args.concurrency)
+            results.append(result)
+            print(f"\n{speed:g}x: {result['throughput']:.1f} req/s, p50 {result['p50_ms']:.2f} ms, "
+                  f"p99 {result['p99_ms']:.2f} ms, schedule lag p99 {result['lag_p99_ms']:.2f} ms, "
+                  f"{result['errors']} errors")
+            print(f"  {'operation':<38} {'calls':>7} {'p50 ms':>9} {'p99 ms':>9} {'errors':>7}")
+            for name, operation in result['operations'].items():
+                print(f"  {name:<38} {operation['calls']:>7} {operation['p50_ms']:>9.2f} "
+                      f"{operation['p99_ms']:>9.2f} {operation['errors']:>7}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
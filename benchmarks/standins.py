@@ -0,0 +1,652 @@
+"""Local stand-in servers that mimic the platform endpoints used by the helpers.
+
+Each stand-in runs an aiohttp application on its own event loop in a daemon
+thread, so both the blocking managers and the async clients can be pointed
+at it from the same process:
+
+    with GraphAPIStandIn(latency=0.05) as graph:
+        os.environ['GRAPH_API_BASE_URL'] = graph.base_url
+
+Latency (plus random jitter), a share of failed requests and a fixed-window
+rate limit with the platform's own rate-limit headers are configurable per
+server. run_standins() starts several servers in a child process instead,
+so their allocations do not show up in the benchmark's memory figures.
+"""
+import asyncio
+import itertools
+import json
+import multiprocessing
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+
+import requests
+from aiohttp import web
+
+
+class StandInServer:
+    # Status sent once the rate limit is used up
+    rate_limit_status = 429
+
+    def __init__(self, latency: float = 0.0, jitter: float = 0.0, error_rate: float = 0.0,
+                 rate_limit: Optional[int] = None, rate_window: float = 900.0, seed: Optional[int] = None,
+                 host: str = '127.0.0.1', port: int = 0):
+        """
+        Args:
+            latency: Seconds added to every response
+            jitter: Up to this many extra seconds, chosen at random per response
+            error_rate: Share of requests (0-1) answered with a 503
+            rate_limit: Requests allowed per window; None disables rate limiting
+            rate_window: Length of the rate-limit window in seconds
+            seed: Seed for jitter and errors, for repeatable runs
+            host: Interface to bind
+            port: Port to bind (0 picks a free one)
+        """
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.host = host
+        self.port = port
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._window_start = time.time()
+        self._window_used = 0
+        self._ids = itertools.count(1)
+        self._loop = None
+        self._runner = None
+        self._thread = None
+        self._ready = threading.Event()
+
+    @property
+    def url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    def next_id(self) -> str:
+        return str(next(self._ids))
+
+    def routes(self, app: web.Application):
+        raise NotImplementedError
+
+    def error(self, status: int, message: str) -> web.Response:
+        """Error response in the platform's format"""
+        return web.json_response({'error': message}, status=status)
+
+    def rate_limit_headers(self, remaining: int, reset: float) -> Dict[str, str]:
+        """Headers that tell the client how much of the rate limit is left"""
+        return {}
+
+    def _take(self):
+        """Count a request against the rate limit; returns (remaining, reset epoch seconds)"""
+        now = time.time()
+        if now >= self._window_start + self.rate_window:
+            self._window_start, self._window_used = now, 0
+        self._window_used += 1
+        return self.rate_limit - self._window_used, self._window_start + self.rate_window
+
+    @web.middleware
+    async def _middleware(self, request, handler):
+        self.requests += 1
+        delay = self.latency + (self._random.uniform(0, self.jitter) if self.jitter else 0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        headers = {}
+        if self.rate_limit is not None:
+            remaining, reset = self._take()
+            headers = self.rate_limit_headers(max(remaining, 0), reset)
+            if remaining < 0:
+                response = self.error(self.rate_limit_status, "Rate limit exceeded")
+                response.headers.update(headers)
+                return response
+        if self.error_rate and self._random.random() < self.error_rate:
+            return self.error(503, "Service unavailable")
+
+        response = await handler(request)
+        response.headers.update(headers)
+        return response
+
+    async def _start(self):
+        app = web.Application(middlewares=[self._middleware], client_max_size=1024 ** 3)
+        self.routes(app)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, self.host, self.port, backlog=4096)
+        await site.start()
+        self.port = site._server.sockets[0].getsockname()[1]
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_until_complete(self._start())
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.run_until_complete(self._runner.cleanup())
+        self._loop.close()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _timestamp(epoch=None):
+    return time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(epoch))
+
+
+class GraphAPIStandIn(StandInServer):
+    """Graph API v18.0 endpoints used by FacebookMinimal and InstagramAPI"""
+
+    version = 'v18.0'
+    # Graph API throttling is reported as error code 4 on a 403
+    rate_limit_status = 403
+    # Pages returned by /me/accounts, each with a linked Instagram account
+    page_count = 250
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.objects = {}
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.url}/{self.version}"
+
+    def error(self, status, message):
+        code = 4 if status == self.rate_limit_status else 2
+        return web.json_response({'error': {'message': message, 'type': 'OAuthException', 'code': code}},
+                                 status=status)
+
+    def rate_limit_headers(self, remaining, reset):
+        used = 100 * (self.rate_limit - remaining) // max(self.rate_limit, 1)
+        return {'X-App-Usage': json.dumps({'call_count': used, 'total_cputime': 0, 'total_time': 0})}
+
+    def routes(self, app):
+        prefix = f'/{self.version}'
+        app.router.add_get(prefix + '/', self.multi_read)
+        app.router.add_get(prefix + '/me/permissions', self.permissions)
+        app.router.add_get(prefix + '/me/accounts', self.accounts)
+        app.router.add_get(prefix + '/{id}', self.read)
+        app.router.add_post(prefix + '/{id}', self.update)
+        app.router.add_delete(prefix + '/{id}', self.delete)
+        app.router.add_get(prefix + '/{id}/media', self.media_list)
+        app.router.add_post(prefix + '/{id}/media', self.create_container)
+        app.router.add_post(prefix + '/{id}/media_publish', self.publish)
+        app.router.add_post(prefix + '/{id}/feed', self.create_post)
+        app.router.add_get(prefix + '/{id}/posts', self.posts)
+
+    def _object(self, object_id):
+        return self.objects.get(object_id) or {
+            'id': object_id,
+            'message': f"Stand-in post {object_id}",
+            'created_time': _timestamp(),
+            'permalink_url': f"https://example.invalid/{object_id}",
+            'username': 'standin',
+            'followers_count': 1000,
+            'media_count': 25,
+            'like_count': 10,
+            'comments_count': 2,
+            'shares': {'count': 1},
+            'reactions': {'data': [], 'summary': {'total_count': 10}},
+            'comments': {'data': [], 'summary': {'total_count': 2}},
+        }
+
+    @staticmethod
+    def _project(item, request):
+        # Like the Graph API, return only the requested fields (plus id) when `fields` is given
+        fields = request.query.get('fields')
+        if not fields:
+            return item
+        names = {re.split(r'[.{(]', field, 1)[0] for field in fields.split(',')} | {'id'}
+        return {key: value for key, value in item.items() if key in names}
+
+    async def read(self, request):
+        object_id = request.match_info['id']
+        if 'access_token' in request.query.get('fields', ''):
+            return web.json_response({'id': object_id, 'access_token': f"page-token-{object_id}"})
+        return web.json_response(self._project(self._object(object_id), request))
+
+    async def multi_read(self, request):
+        ids = request.query.get('ids', '').split(',')
+        return web.json_response({object_id: self._project(self._object(object_id), request)
+                                  for object_id in ids if object_id})
+
+    async def posts(self, request):
+        limit = int(request.query.get('limit', 25))
+        page_id = request.match_info['id']
+        return web.json_response({'data': [self._project(self._object(f"{page_id}_{i}"), request)
+                                           for i in range(limit)]})
+
+    async def accounts(self, request):
+        limit = min(int(request.query.get('limit', 25)), 100)
+        after = int(request.query.get('after', 0))
+        pages = [{'id': str(1000 + i), 'name': f"Stand-in page {i}", 'access_token': f"page-token-{1000 + i}",
+                  'instagram_business_account': {'id': str(2000 + i), 'username': f"standin{i}"}}
+                 for i in range(after, min(after + limit, self.page_count))]
+        body = {'data': pages}
+        if after + limit < self.page_count:
+            query = dict(request.query, after=str(after + limit))
+            body['paging'] = {'next': str(request.url.with_query(query))}
+        return web.json_response(body)
+
+    async def permissions(self, request):
+        return web.json_response({'data': [
+            {'permission': permission, 'status': 'granted'}
+            for permission in ('pages_read_engagement', 'pages_manage_posts')
+        ]})
+
+    async def create_post(self, request):
+        post_id = f"{request.match_info['id']}_{self.next_id()}"
+        self.objects[post_id] = dict(self._object(post_id), message=request.query.get('message', ''))
+        return web.json_response({'id': post_id})
+
+    async def update(self, request):
+        object_id = request.match_info['id']
+        if object_id in self.objects and 'message' in request.query:
+            self.objects[object_id]['message'] = request.query['message']
+        return web.json_response({'success': True})
+
+    async def delete(self, request):
+        self.objects.pop(request.match_info['id'], None)
+        return web.json_response({'success': True})
+
+    async def create_container(self, request):
+        return web.json_response({'id': self.next_id()})
+
+    async def publish(self, request):
+        return web.json_response({'id': self.next_id()})
+
+    async def media_list(self, request):
+        limit = int(request.query.get('limit', 25))
+        return web.json_response({'data': [
+            self._project({'id': str(i), 'caption': f"Stand-in media {i}", 'media_type': 'IMAGE',
+                           'media_url': f"https://example.invalid/{i}.jpg", 'permalink': f"https://example.invalid/p/{i}",
+                           'thumbnail_url': f"https://example.invalid/{i}_thumb.jpg", 'timestamp': _timestamp(),
+                           'username': 'standin'}, request)
+            for i in range(limit)
+        ]})
+
+
+class TwitterStandIn(StandInServer):
+    """
+    Twitter API v2 endpoints used by TwitterManager (point tweepy at it with RedirectAdapter),
+    and the v1.1 chunked media upload
+    """
+
+    user_id = '1000'
+    # STATUS polls a video needs before it is processed
+    processing_polls = 1
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # media_id -> {'total', 'received', 'category', 'polls'}
+        self.media = {}
+
+    def error(self, status, message):
+        return web.json_response({'title': message, 'detail': message, 'status': status}, status=status)
+
+    def rate_limit_headers(self, remaining, reset):
+        return {
+            'x-rate-limit-limit': str(self.rate_limit),
+            'x-rate-limit-remaining': str(remaining),
+            'x-rate-limit-reset': str(int(reset)),
+        }
+
+    def routes(self, app):
+        app.router.add_get('/2/users/me', self.me)
+        app.router.add_get('/2/users/{id}/tweets', self.user_tweets)
+        app.router.add_get('/2/tweets', self.lookup)
+        app.router.add_post('/2/tweets', self.create)
+        app.router.add_get('/2/tweets/{id}', self.read)
+        app.router.add_delete('/2/tweets/{id}', self.delete)
+        app.router.add_post('/1.1/media/upload.json', self.upload)
+        app.router.add_get('/1.1/media/upload.json', self.upload_status)
+
+    def _tweet(self, tweet_id, text=None):
+        return {
+            'id': tweet_id,
+            'text': text or f"Stand-in tweet {tweet_id}",
+            'edit_history_tweet_ids': [tweet_id],
+            # v2 timestamps carry milliseconds
+            'created_at': _timestamp().replace('Z', '.000Z'),
+            'public_metrics': {'retweet_count': 1, 'reply_count': 2, 'like_count': 10,
+                               'quote_count': 0, 'impression_count': 500},
+        }
+
+    async def me(self, request):
+        return web.json_response({'data': {
+            'id': self.user_id, 'name': 'Stand-in', 'username': 'standin',
+            'public_metrics': {'followers_count': 1000, 'following_count': 10, 'tweet_count': 50},
+        }})
+
+    async def user_tweets(self, request):
+        count = int(request.query.get('max_results', 10))
+        tweets = [self._tweet(str(i)) for i in range(1, count + 1)]
+        return web.json_response({'data': tweets, 'meta': {'result_count': count}})
+
+    async def lookup(self, request):
+        ids = request.query.get('ids', '').split(',')
+        return web.json_response({'data': [self._tweet(tweet_id) for tweet_id in ids if tweet_id]})
+
+    async def create(self, request):
+        body = await request.json()
+        tweet_id = self.next_id()
+        return web.json_response({'data': {'id': tweet_id, 'text': body.get('text', ''),
+                                           'edit_history_tweet_ids': [tweet_id]}}, status=201)
+
+    async def read(self, request):
+        return web.json_response({'data': self._tweet(request.match_info['id'])})
+
+    async def delete(self, request):
+        return web.json_response({'data': {'deleted': True}})
+
+    def _processing(self, media_id):
+        media = self.media[media_id]
+        if media['category'] == 'tweet_image':
+            return {'media_id_string': media_id}
+        if media['polls'] < self.processing_polls:
+            media['polls'] += 1
+            return {'media_id_string': media_id, 'processing_info': {'state': 'in_progress', 'check_after_secs': 0}}
+        return {'media_id_string': media_id, 'processing_info': {'state': 'succeeded'}}
+
+    async def upload(self, request):
+        data = await request.post()
+        command = data.get('command')
+        if command == 'INIT':
+            media_id = self.next_id()
+            self.media[media_id] = {'total': int(data['total_bytes']), 'received': 0,
+                                    'category': data.get('media_category', 'tweet_image'), 'polls': 0}
+            return web.json_response({'media_id_string': media_id, 'expires_after_secs': 86400}, status=202)
+        media = self.media.get(data.get('media_id'))
+        if media is None:
+            return self.error(400, "Unknown media_id")
+        if command == 'APPEND':
+            media['received'] += len(data['media'].file.read())
+            return web.Response(status=204)
+        if command == 'FINALIZE':
+            if media['received'] != media['total']:
+                return self.error(400, f"Received {media['received']} of {media['total']} bytes")
+            return web.json_response(self._processing(data['media_id']), status=201)
+        return self.error(400, f"Unknown command: {command}")
+
+    async def upload_status(self, request):
+        if request.query.get('media_id') not in self.media:
+            return self.error(404, "Unknown media_id")
+        return web.json_response(self._processing(request.query['media_id']))
+
+
+class RedditStandIn(StandInServer):
+    """Reddit OAuth endpoints used by RedditManager; serves as both reddit_url and oauth_url"""
+
+    username = 'standin'
+
+    def error(self, status, message):
+        return web.json_response({'message': message, 'error': status}, status=status)
+
+    def rate_limit_headers(self, remaining, reset):
+        return {
+            'x-ratelimit-used': str(self.rate_limit - remaining),
+            'x-ratelimit-remaining': str(remaining),
+            'x-ratelimit-reset': str(max(int(reset - time.time()), 0)),
+        }
+
+    def routes(self, app):
+        app.router.add_post('/api/v1/access_token', self.access_token)
+        app.router.add_get('/api/v1/me', self.me)
+        app.router.add_get('/comments/{id}/', self.comments)
+        app.router.add_get('/user/{name}/submitted', self.submitted)
+        # PRAW's paths end in a slash
+        for path, method, handler in (('/api/submit/', 'POST', self.submit), ('/api/editusertext/', 'POST', self.edit),
+                                      ('/api/del/', 'POST', self.delete), ('/api/info/', 'GET', self.info),
+                                      ('/user/{name}/submitted/', 'GET', self.submitted)):
+            app.router.add_route(method, path, handler)
+
+    def _post(self, post_id, title=None, selftext=''):
+        return {'kind': 't3', 'data': {
+            'id': post_id,
+            'name': f"t3_{post_id}",
+            'title': title or f"Stand-in post {post_id}",
+            'selftext': selftext,
+            'score': 10,
+            'num_comments': 2,
+            'url': f"https://www.reddit.com/r/test/comments/{post_id}/",
+            'permalink': f"/r/test/comments/{post_id}/",
+            'created_utc': time.time(),
+            'author': self.username,
+            'subreddit': 'test',
+        }}
+
+    @staticmethod
+    def _listing(children):
+        return {'kind': 'Listing', 'data': {'after': None, 'before': None, 'dist': len(children),
+                                            'children': children}}
+
+    async def access_token(self, request):
+        return web.json_response({'access_token': 'standin-token', 'token_type': 'bearer',
+                                  'expires_in': 86400, 'scope': '*'})
+
+    async def me(self, request):
+        return web.json_response({'name': self.username, 'id': 'standin', 'created_utc': time.time(),
+                                  'link_karma': 1, 'comment_karma': 1})
+
+    async def submit(self, request):
+        post_id = format(int(self.next_id()) + 36 ** 5, 'x')
+        return web.json_response({'json': {'errors': [], 'data': {
+            'id': post_id, 'name': f"t3_{post_id}", 'url': f"https://www.reddit.com/r/test/comments/{post_id}/",
+        }}})
+
+    async def edit(self, request):
+        data = await request.post()
+        post_id = data.get('thing_id', 't3_0').split('_', 1)[1]
+        return web.json_response({'json': {'errors': [], 'data': {
+            'things': [self._post(post_id, selftext=data.get('text', ''))]
+        }}})
+
+    async def delete(self, request):
+        return web.json_response({})
+
+    async def info(self, request):
+        fullnames = request.query.get('id', '').split(',')
+        return web.json_response(self._listing([self._post(name.split('_', 1)[1]) for name in fullnames if name]))
+
+    async def comments(self, request):
+        return web.json_response([self._listing([self._post(request.match_info['id'])]), self._listing([])])
+
+    async def submitted(self, request):
+        limit = min(int(request.query.get('limit', 25)), 100)
+        return web.json_response(self._listing([self._post(format(i, 'x')) for i in range(1, limit + 1)]))
+
+
+class YouTubeStandIn(StandInServer):
+    """YouTube Data API v3 endpoints used by YouTubeOperations, including resumable uploads"""
+
+    channel_id = 'UCstandin'
+    # Exhausted quota is a 403 with reason quotaExceeded
+    rate_limit_status = 403
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.uploads = {}
+
+    def error(self, status, message):
+        reason = 'quotaExceeded' if status == self.rate_limit_status else 'backendError'
+        return web.json_response({'error': {'code': status, 'message': message,
+                                            'errors': [{'message': message, 'domain': 'youtube', 'reason': reason}]}},
+                                 status=status)
+
+    def routes(self, app):
+        app.router.add_get('/youtube/v3/channels', self.channels)
+        app.router.add_get('/youtube/v3/videos', self.videos)
+        app.router.add_put('/youtube/v3/videos', self.update)
+        app.router.add_delete('/youtube/v3/videos', self.delete)
+        app.router.add_get('/youtube/v3/search', self.search)
+        app.router.add_get('/youtube/v3/playlistItems', self.playlist_items)
+        app.router.add_post('/upload/youtube/v3/videos', self.start_upload)
+        app.router.add_put('/upload/youtube/v3/videos', self.upload_chunk)
+
+    def _video(self, video_id, snippet=None):
+        return {
+            'kind': 'youtube#video',
+            'id': video_id,
+            'snippet': snippet or {'title': f"Stand-in video {video_id}", 'description': '',
+                                   'channelId': self.channel_id, 'publishedAt': _timestamp(), 'categoryId': '22'},
+            'contentDetails': {'duration': 'PT1M'},
+            'statistics': {'viewCount': '500', 'likeCount': '10', 'commentCount': '2'},
+            'status': {'privacyStatus': 'private'},
+        }
+
+    async def channels(self, request):
+        return web.json_response({'items': [{
+            'id': self.channel_id,
+            'snippet': {'title': 'Stand-in channel'},
+            'contentDetails': {'relatedPlaylists': {'uploads': 'UU' + self.channel_id[2:]}},
+            'statistics': {'subscriberCount': '1000', 'viewCount': '50000', 'videoCount': '25'},
+        }]})
+
+    async def videos(self, request):
+        ids = request.query.get('id', '').split(',')
+        return web.json_response({'items': [self._video(video_id) for video_id in ids if video_id]})
+
+    async def update(self, request):
+        body = await request.json()
+        return web.json_response(self._video(body['id'], body.get('snippet')))
+
+    async def delete(self, request):
+        return web.Response(status=204)
+
+    async def search(self, request):
+        count = int(request.query.get('maxResults', 5))
+        return web.json_response({'items': [
+            {'id': {'kind': 'youtube#video', 'videoId': f"v{i}"}, 'snippet': self._video(f"v{i}")['snippet']}
+            for i in range(count)
+        ]})
+
+    async def playlist_items(self, request):
+        count = int(request.query.get('maxResults', 5))
+        return web.json_response({'items': [
+            {'snippet': self._video(f"v{i}")['snippet'],
+             'contentDetails': {'videoId': f"v{i}", 'videoPublishedAt': _timestamp()}}
+            for i in range(count)
+        ], 'pageInfo': {'totalResults': 25, 'resultsPerPage': count}})
+
+    async def start_upload(self, request):
+        upload_id = self.next_id()
+        body = await request.read()
+        self.uploads[upload_id] = json.loads(body or b'{}')
+        return web.Response(headers={'Location': f"{self.url}/upload/youtube/v3/videos?upload_id={upload_id}"})
+
+    async def upload_chunk(self, request):
+        upload_id = request.query.get('upload_id')
+        if upload_id not in self.uploads:
+            return self.error(404, "Unknown upload")
+        await request.read()
+        # "bytes <first>-<last>/<total>"; the upload is done when the last byte arrives
+        first_last, _, total = request.headers.get('Content-Range', 'bytes 0-0/1')[6:].partition('/')
+        last = int(first_last.split('-')[1]) if '-' in first_last else -1
+        if total != '*' and last + 1 >= int(total):
+            body = self.uploads.pop(upload_id)
+            return web.json_response(self._video(f"up{upload_id}", body.get('snippet')))
+        return web.Response(status=308, headers={'Range': f"bytes=0-{last}"})
+
+
+class RedirectAdapter(requests.adapters.BaseAdapter):
+    """Sends requests for one host to another base URL, for clients with a hard-coded host (tweepy)"""
+
+    def __init__(self, base_url: str, adapter: Optional[requests.adapters.BaseAdapter] = None):
+        """
+        Args:
+            base_url: Where requests go instead
+            adapter: Adapter that sends the rewritten request (e.g. the one already mounted)
+        """
+        super().__init__()
+        self.base_url = base_url.rstrip('/')
+        self.adapter = adapter or requests.adapters.HTTPAdapter()
+
+    def send(self, request, **kwargs):
+        parts = urlsplit(request.url)
+        request.url = self.base_url + parts.path + (f"?{parts.query}" if parts.query else '')
+        return self.adapter.send(request, **kwargs)
+
+    def close(self):
+        self.adapter.close()
+
+
+def redirect_httplib2(http, base_url: str):
+    """
+    Send https requests for a stand-in's host over its own scheme
+
+    googleapiclient keeps the https scheme of the media upload URL when
+    api_endpoint points at a plain http server, so uploads need this.
+    """
+    base = urlsplit(base_url)
+    request = http.request
+
+    def rewritten(uri, *args, **kwargs):
+        parts = urlsplit(uri)
+        if parts.netloc == base.netloc:
+            uri = parts._replace(scheme=base.scheme).geturl()
+        return request(uri, *args, **kwargs)
+
+    http.request = rewritten
+
+
+STANDINS = {
+    'facebook': GraphAPIStandIn,
+    'twitter': TwitterStandIn,
+    'reddit': RedditStandIn,
+    'youtube': YouTubeStandIn,
+}
+
+
+def _serve_all(names, options, conn):
+    servers = {name: STANDINS[name](**options).start() for name in names}
+    conn.send({name: server.url for name, server in servers.items()})
+    # Block until the parent closes its end of the pipe
+    try:
+        conn.recv()
+    except EOFError:
+        pass
+    for server in servers.values():
+        server.stop()
+
+
+@contextmanager
+def run_standins(names=tuple(STANDINS), **options):
+    """
+    Start stand-ins in a child process
+
+    Args:
+        names: Keys of STANDINS to start ('facebook' also serves Instagram)
+        **options: StandInServer options shared by all servers
+
+    Yields:
+        Name -> root URL of the server
+    """
+    context = multiprocessing.get_context('spawn')
+    parent, child = context.Pipe()
+    process = context.Process(target=_serve_all, args=(list(names), options, child), daemon=True)
+    process.start()
+    child.close()
+    try:
+        yield parent.recv()
+    finally:
+        parent.close()
+        process.join(5)
+        if process.is_alive():
+            process.terminate()
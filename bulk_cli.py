@@ -0,0 +1,321 @@
+"""Headless bulk runner for create/update/delete operations across all platforms.
+
+Usage:
+    python bulk_cli.py manifest.jsonl --results results.jsonl
+    python bulk_cli.py manifest.csv --limit reddit=1 --limit twitter=8
+    python bulk_cli.py manifest.jsonl --plan
+
+Each JSONL line (or CSV row) names a platform, an action and that action's arguments:
+    {"platform": "reddit", "action": "create", "subreddit_name": "test", "title": "Hi", "content": "..."}
+    {"platform": "youtube", "action": "update", "video_id": "abc", "title": "New title"}
+    platform,action,tweet_id
+    twitter,delete,1234567890
+
+An optional "id" field is copied to the result log to correlate rows. Facebook rows
+with a "page_id" and Instagram rows with an "instagram_account_id" run against that
+page or account (any the user token manages) instead of the one in .env.
+
+Create rows may carry an "idempotency_key": re-running a manifest after a crash or
+timeout then skips rows that were already created, and looks on the platform before
+resending one whose outcome was unknown (see helpers/WriteAheadLog.py).
+
+YouTube rows use the token stored by signing in once from the app; without one
+they fail straight away instead of opening a browser.
+"""
+import argparse
+import csv
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Dict, Iterator, Tuple
+
+from helpers.Instrumentation import metrics
+
+# Concurrent operations per platform unless overridden with --limit
+DEFAULT_LIMITS = {'reddit': 2, 'youtube': 2, 'facebook': 4, 'instagram': 4, 'twitter': 4}
+
+# (platform, action) -> (manager method, argument names in positional order)
+OPERATIONS = {
+    ('reddit', 'create'): ('create_post', ['subreddit_name', 'title', 'content', 'post_type', 'idempotency_key']),
+    ('reddit', 'update'): ('update_post', ['post_id', 'new_content']),
+    ('reddit', 'delete'): ('delete_post', ['post_id']),
+    ('youtube', 'create'): ('create_video', ['title', 'description', 'privacy_status', 'file_path',
+                                          'idempotency_key']),
+    ('youtube', 'update'): ('update_video', ['video_id', 'title', 'description']),
+    ('youtube', 'delete'): ('delete_video', ['video_id']),
+    ('facebook', 'create'): ('create_post', ['message', 'idempotency_key']),
+    ('facebook', 'update'): ('update_post', ['post_id', 'new_message']),
+    ('facebook', 'delete'): ('delete_post', ['post_id']),
+    ('instagram', 'create'): ('create_post', ['image_url', 'caption', 'idempotency_key']),
+    ('instagram', 'delete'): ('delete_media', ['media_id']),
+    ('twitter', 'create'): ('create_tweet', ['text', 'idempotency_key']),
+    ('twitter', 'update'): ('update_tweet', ['tweet_id', 'new_text']),
+    ('twitter', 'delete'): ('delete_tweet', ['tweet_id']),
+}
+
+# YouTube API calls each action makes, for the --plan quota estimate
+QUOTA_METHODS = {
+    ('youtube', 'create'): ['youtube.videos.insert'],
+    ('youtube', 'update'): ['youtube.videos.list', 'youtube.videos.update'],
+    ('youtube', 'delete'): ['youtube.videos.delete'],
+}
+
+
+def authenticate(platform: str):
+    """
+    Sign in once before a platform's workers start
+
+    YouTube's first sign-in is an interactive browser flow, which must not start in
+    every worker thread; without a stored token the platform fails straight away.
+    """
+    if platform != 'youtube':
+        return
+    from helpers.CredentialStore import CredentialStore
+    from helpers.YouTubeOperations import YouTubeOperations
+    if CredentialStore.default().get('youtube') is None and not os.path.exists('token.pickle'):
+        raise RuntimeError("YouTube is not signed in; sign in once from the app first")
+    # Refreshes an expired token and verifies the channel, so the workers' lazy sign-ins reuse both
+    YouTubeOperations().authenticate()
+
+
+def create_manager(platform: str):
+    """Build a manager for one worker thread; authenticate() has already run"""
+    if platform == 'reddit':
+        from helpers.RedditManager import RedditManager
+        return RedditManager()
+    if platform == 'youtube':
+        from helpers.YouTubeOperations import YouTubeOperations
+        yt = YouTubeOperations()
+        yt.authenticate(lazy=True)
+        return yt
+    if platform == 'facebook':
+        from helpers.FacebookMinimal import FacebookMinimal
+        return FacebookMinimal()
+    if platform == 'instagram':
+        from helpers.InstagramAPI import InstagramAPI
+        return InstagramAPI()
+    if platform == 'twitter':
+        from helpers.TwitterManager import TwitterManager
+        return TwitterManager()
+    raise ValueError(f"Unknown platform: {platform}")
+
+
+_account_pool = None
+_account_pool_lock = threading.Lock()
+
+
+def pool_client(operation: dict):
+    """Client for the page or Instagram account a row names, or None to use the worker's manager"""
+    global _account_pool
+    platform = operation.get('platform')
+    if not ((platform == 'facebook' and 'page_id' in operation)
+            or (platform == 'instagram' and 'instagram_account_id' in operation)):
+        return None
+    with _account_pool_lock:
+        if _account_pool is None:
+            from helpers.GraphAccountPool import GraphAccountPool
+            _account_pool = GraphAccountPool()
+    if platform == 'facebook':
+        return _account_pool.facebook(operation['page_id'])
+    return _account_pool.instagram(operation['instagram_account_id'])
+
+
+def read_manifest(path: str) -> Iterator[Tuple[int, dict]]:
+    """Yield (line number, operation) one at a time, so memory use does not grow with the manifest"""
+    with open(path, newline='', encoding='utf-8') as f:
+        if path.endswith('.csv'):
+            for line_no, row in enumerate(csv.DictReader(f), start=2):
+                # Empty cells mean "not given", so optional arguments keep their defaults
+                yield line_no, {key: value for key, value in row.items() if value not in (None, '')}
+        else:
+            for line_no, line in enumerate(f, start=1):
+                if line.strip():
+                    try:
+                        operation = json.loads(line)
+                    except json.JSONDecodeError as e:
+                        operation = {'_error': f"Invalid JSON: {e}"}
+                    if not isinstance(operation, dict):
+                        operation = {'_error': "Expected a JSON object"}
+                    yield line_no, operation
+
+
+def execute(manager, operation: dict):
+    """Run one manifest operation against a manager and return its result"""
+    key = (operation.get('platform'), operation.get('action'))
+    if key not in OPERATIONS:
+        raise ValueError(f"Unsupported operation: {key[0]} {key[1]}")
+    method, arg_names = OPERATIONS[key]
+    kwargs = {name: operation[name] for name in arg_names if name in operation}
+    result = getattr(manager, method)(**kwargs)
+    # Reddit and Facebook signal failure with None/False instead of raising
+    if result is None or result is False:
+        raise RuntimeError(f"{method} failed")
+    return result
+
+
+class BulkRunner:
+    def __init__(self, results_file, limits: Dict[str, int]):
+        """
+        Bounded per-platform worker pools fed from a streaming manifest
+
+        Each platform gets `limit` worker threads (each with its own manager, since the
+        SDK clients are not thread-safe) and a queue holding at most 2 * limit pending
+        operations, so the reader blocks instead of buffering the manifest in memory.
+        """
+        self.results_file = results_file
+        self.limits = limits
+        self.queues = {platform: queue.Queue(maxsize=2 * limit) for platform, limit in limits.items()}
+        self.results = queue.Queue(maxsize=1000)
+        self.counts = {'ok': 0, 'error': 0}
+        self.workers = []
+        self.setup_errors: Dict[str, Exception] = {}
+        # Set when the run is interrupted; queued operations are then reported instead of run
+        self.cancelled = threading.Event()
+
+    def _worker(self, platform: str):
+        manager, manager_error = None, self.setup_errors.get(platform)
+        if manager_error is None:
+            try:
+                manager = create_manager(platform)
+            except Exception as e:
+                manager_error = e
+
+        while True:
+            item = self.queues[platform].get()
+            if item is None:
+                return
+            line_no, operation = item
+            started = time.perf_counter()
+            record = {'line': line_no, 'id': operation.get('id'), 'platform': platform,
+                      'action': operation.get('action')}
+            try:
+                if self.cancelled.is_set():
+                    raise RuntimeError("Cancelled before it started")
+                client = pool_client(operation)
+                if client is None and manager_error:
+                    raise RuntimeError(f"Failed to initialize {platform}: {manager_error}")
+                record['result'] = execute(client or manager, operation)
+                record['status'] = 'ok'
+            except Exception as e:
+                record['status'] = 'error'
+                record['error'] = f"{type(e).__name__}: {e}"
+            record['elapsed_ms'] = round((time.perf_counter() - started) * 1000, 1)
+            self.results.put(record)
+
+    def _writer(self):
+        while True:
+            record = self.results.get()
+            if record is None:
+                return
+            self.counts[record['status']] += 1
+            self.results_file.write(json.dumps(record, default=str) + '\n')
+            # Flush per record so the log is usable while the run is still going
+            self.results_file.flush()
+
+    def _start_workers(self, platform: str):
+        try:
+            authenticate(platform)
+        except Exception as e:
+            self.setup_errors[platform] = e
+        for i in range(self.limits[platform]):
+            worker = threading.Thread(target=self._worker, args=(platform,), name=f'bulk-{platform}-{i}')
+            worker.start()
+            self.workers.append(worker)
+
+    def run(self, operations: Iterator[Tuple[int, dict]]) -> Dict[str, int]:
+        writer = threading.Thread(target=self._writer, name='bulk-results')
+        writer.start()
+        started = set()
+
+        try:
+            for line_no, operation in operations:
+                platform = operation.get('platform')
+                if '_error' in operation or platform not in self.queues:
+                    self.results.put({'line': line_no, 'id': operation.get('id'), 'platform': platform,
+                                      'action': operation.get('action'), 'status': 'error',
+                                      'error': operation.get('_error', f"Unknown platform: {platform}")})
+                    continue
+                if platform not in started:
+                    # Managers are only built for platforms the manifest actually uses
+                    started.add(platform)
+                    self._start_workers(platform)
+                self.queues[platform].put((line_no, operation))
+        except BaseException:
+            # Ctrl-C or a failing manifest: let running operations finish, skip the queued ones
+            self.cancelled.set()
+            raise
+        finally:
+            # Always stop the workers, or the process hangs on their queues
+            for platform in started:
+                for _ in range(self.limits[platform]):
+                    self.queues[platform].put(None)
+            for worker in self.workers:
+                worker.join()
+            self.results.put(None)
+            writer.join()
+        return self.counts
+
+
+def plan_quota(operations: Iterator[Tuple[int, dict]]) -> dict:
+    """Estimate the YouTube quota a manifest needs against what is left today"""
+    from helpers.QuotaLedger import QuotaLedger
+
+    methods = (method for _, operation in operations
+               for method in QUOTA_METHODS.get((operation.get('platform'), operation.get('action')), []))
+    return QuotaLedger().plan(methods)
+
+
+def parse_limits(values) -> Dict[str, int]:
+    limits = dict(DEFAULT_LIMITS)
+    for value in values or []:
+        platform, _, limit = value.partition('=')
+        if platform not in limits or not limit.isdigit() or int(limit) < 1:
+            raise argparse.ArgumentTypeError(f"Invalid limit: {value} (expected platform=N)")
+        limits[platform] = int(limit)
+    return limits
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Run create/update/delete operations from a JSONL or CSV manifest")
+    parser.add_argument('manifest', help="Path to a .jsonl or .csv manifest")
+    parser.add_argument('--results', default='-', help="Result log path (JSONL, default: stdout)")
+    parser.add_argument('--limit', action='append', metavar='PLATFORM=N',
+                        help="Concurrent operations for a platform (repeatable)")
+    parser.add_argument('--metrics', help="Write per-request metrics in Prometheus text format to this path when done")
+    parser.add_argument('--plan', action='store_true',
+                        help="Only estimate the YouTube quota the manifest needs, without running it")
+    args = parser.parse_args(argv)
+
+    if args.plan:
+        plan = plan_quota(read_manifest(args.manifest))
+        print(f"YouTube quota: {plan['cost']} units needed, {plan['remaining']} left today", file=sys.stderr)
+        for method, hint in plan['suggestions'].items():
+            print(f"  {method}: {hint}", file=sys.stderr)
+        if not plan['fits']:
+            print("The manifest does not fit in today's YouTube quota or per-method budgets", file=sys.stderr)
+        return 0 if plan['fits'] else 1
+
+    try:
+        limits = parse_limits(args.limit)
+    except argparse.ArgumentTypeError as e:
+        parser.error(str(e))
+
+    results_file = sys.stdout if args.results == '-' else open(args.results, 'a', encoding='utf-8')
+    try:
+        counts = BulkRunner(results_file, limits).run(read_manifest(args.manifest))
+    finally:
+        if results_file is not sys.stdout:
+            results_file.close()
+        if args.metrics:
+            with open(args.metrics, 'w', encoding='utf-8') as f:
+                f.write(metrics.prometheus_text())
+
+    print(f"Done: {counts['ok']} succeeded, {counts['error']} failed", file=sys.stderr)
+    return 1 if counts['error'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,82 @@
+import pandas as pd
+import streamlit as st
+from helpers.Instrumentation import metrics
+from helpers.RateLimiter import RateLimiter
+from helpers.Resilience import breakers
+
+
+def _request_table(snapshot):
+    rows = []
+    for (platform, operation), series in sorted(snapshot.items()):
+        count = series['count']
+        rows.append({
+            'platform': platform,
+            'operation': operation,
+            'requests': count,
+            'errors': sum(series['errors'].values()),
+            'retries': series['retries'],
+            'mean ms': 1000 * series['sum'] / count if count else 0.0,
+            'p50 ms': 1000 * metrics.quantile(series['buckets'], 0.5),
+            'p95 ms': 1000 * metrics.quantile(series['buckets'], 0.95),
+            'p99 ms': 1000 * metrics.quantile(series['buckets'], 0.99),
+            'sent KiB': series['bytes_sent'] / 1024,
+            'received KiB': series['bytes_received'] / 1024,
+        })
+    return pd.DataFrame(rows)
+
+
+def run(operation):
+    # Metrics live in this server process, so they cover every session's requests since it started
+    snapshot = metrics.snapshot()
+
+    if not snapshot:
+        st.warning("No API requests recorded yet.")
+        return
+
+    # --- REQUESTS ---
+    if operation == "Requests":
+        st.header("API Requests by Operation")
+        st.caption("Percentiles are estimated from histogram buckets")
+        table = _request_table(snapshot)
+        platform = st.selectbox("Platform", ["All"] + sorted(table['platform'].unique()))
+        if platform != "All":
+            table = table[table['platform'] == platform]
+        st.dataframe(table.style.format(precision=1))
+
+    # --- ERRORS ---
+    elif operation == "Errors":
+        st.header("Failed Requests by Error Class")
+        errors = pd.DataFrame([
+            {'platform': platform, 'operation': operation, 'error': error, 'count': count}
+            for (platform, operation), series in sorted(snapshot.items())
+            for error, count in series['errors'].items()
+        ])
+        if errors.empty:
+            st.success("No failed requests.")
+        else:
+            st.dataframe(errors)
+            st.bar_chart(errors.pivot_table(index='platform', columns='error', values='count', aggfunc='sum'))
+
+    # --- CIRCUIT BREAKERS ---
+    elif operation == "Circuit Breakers":
+        st.header("Circuit Breakers")
+        st.dataframe(pd.DataFrame([
+            {'platform': platform, 'state': breaker.state, 'consecutive failures': breaker.failures}
+            for platform, breaker in sorted(breakers().items())
+        ]))
+
+    # --- RATE LIMITS ---
+    elif operation == "Rate Limits":
+        st.header("Rate-Limit Budgets")
+        st.caption("Shared by every process on this host; negative means requests are waiting")
+        st.dataframe(pd.DataFrame([
+            dict(zip(('platform', 'account', 'endpoint'), key.split(':', 2)), tokens=tokens)
+            for key, tokens in sorted(RateLimiter.default().budgets().items())
+        ]))
+
+    # --- PROMETHEUS EXPORT ---
+    elif operation == "Prometheus Export":
+        st.header("Prometheus Metrics")
+        text = metrics.prometheus_text()
+        st.download_button("Download", text, file_name="metrics.prom", mime="text/plain")
+        st.code(text, language="text")
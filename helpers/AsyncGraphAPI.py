@@ -0,0 +1,192 @@
+import asyncio
+import os
+from typing import Optional
+
+import aiohttp
+from dotenv import load_dotenv
+
+from helpers.FieldPresets import graph_fields
+from helpers.StructuredLog import get_logger
+
+# Load environment variables
+load_dotenv()
+
+DEFAULT_BASE_URL = 'https://graph.facebook.com/v18.0'
+
+log = get_logger(__name__, 'facebook')
+
+
+def create_session(max_connections: int = 100) -> aiohttp.ClientSession:
+    """Connection pool that several async Graph API clients can share"""
+    return aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=max_connections, ttl_dns_cache=300))
+
+
+class AsyncGraphAPI:
+    def __init__(self, access_token: Optional[str] = None, session: Optional[aiohttp.ClientSession] = None,
+                 max_concurrency: int = 100):
+        """
+        Coroutine-based Graph API client
+
+        All requests go through one aiohttp session (its connector is the connection
+        pool) and an asyncio.Semaphore that caps in-flight calls, so a single event
+        loop can drive thousands of calls without one thread per request.
+
+        Args:
+            access_token: Token sent with every request
+            session: Shared session from create_session(); a private one is created if omitted
+            max_concurrency: Maximum in-flight requests for this client
+        """
+        self.access_token = access_token
+        self.base_url = os.getenv('GRAPH_API_BASE_URL', DEFAULT_BASE_URL)
+        self._session = session
+        self._owns_session = session is None
+        self._max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        if self._session is None:
+            self._session = create_session(self._max_concurrency)
+        return self._session
+
+    async def _make_request(self, method, endpoint, params=None, data=None, access_token=None):
+        """Helper method to make API requests"""
+        params = dict(params or {})
+        params['access_token'] = access_token or self.access_token
+        async with self._semaphore:
+            async with self.session.request(method, f"{self.base_url}/{endpoint}", params=params, json=data) as response:
+                if response.status >= 400:
+                    text = await response.text()
+                    raise aiohttp.ClientResponseError(
+                        response.request_info, response.history, status=response.status, message=text
+                    )
+                return await response.json()
+
+    async def close(self):
+        if self._owns_session and self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+
+class AsyncFacebookMinimal(AsyncGraphAPI):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, max_concurrency: int = 100):
+        """Async counterpart of FacebookMinimal; call warmup() (or any method) to fetch the page token"""
+        self.user_token = os.getenv('FB_ACCESS_TOKEN')
+        self.page_id = os.getenv('FB_PAGE_ID')
+
+        # Verify credentials are loaded
+        if not self.user_token or not self.page_id:
+            raise ValueError("Missing credentials. Please check your .env file.")
+
+        super().__init__(None, session, max_concurrency)
+        self._token_lock = asyncio.Lock()
+
+    async def get_page_access_token(self):
+        """Convert user access token to page access token"""
+        try:
+            data = await self._make_request('GET', self.page_id, {'fields': 'access_token'},
+                                            access_token=self.user_token)
+            return data.get('access_token')
+        except aiohttp.ClientError as e:
+            log.error("Failed to get page access token: %s", e)
+            return None
+
+    async def warmup(self):
+        """Fetch the page access token once; concurrent callers share the request"""
+        async with self._token_lock:
+            if not self.access_token:
+                self.access_token = await self.get_page_access_token()
+                if not self.access_token:
+                    raise ValueError("Failed to get page access token")
+        return self.access_token
+
+    async def _page_request(self, method, endpoint, params=None):
+        if not self.access_token:
+            await self.warmup()
+        return await self._make_request(method, endpoint, params)
+
+    async def create_post(self, message):
+        """Create a simple post"""
+        try:
+            data = await self._page_request('POST', f'{self.page_id}/feed', {'message': message})
+            if 'error' in data:
+                log.error("API error: %s", data['error']['message'])
+                return None
+            return data
+        except aiohttp.ClientError as e:
+            log.error("Failed to create post: %s", e)
+            return None
+
+    async def read_post(self, post_id, fields=None):
+        """Read a post; `fields` is a preset ('minimal', 'display', 'analytics') or field names"""
+        try:
+            return await self._page_request('GET', post_id, graph_fields('facebook.post', fields))
+        except aiohttp.ClientError as e:
+            log.error("Failed to read post %s: %s", post_id, e)
+            return None
+
+    async def update_post(self, post_id, new_message):
+        """Update a post"""
+        try:
+            return await self._page_request('POST', post_id, {'message': new_message})
+        except aiohttp.ClientError as e:
+            log.error("Failed to update post %s: %s", post_id, e)
+            return None
+
+    async def delete_post(self, post_id):
+        """Delete a post"""
+        try:
+            return await self._page_request('DELETE', post_id)
+        except aiohttp.ClientError as e:
+            log.error("Failed to delete post %s: %s", post_id, e)
+            return None
+
+
+class AsyncInstagramAPI(AsyncGraphAPI):
+    def __init__(self, session: Optional[aiohttp.ClientSession] = None, max_concurrency: int = 100):
+        """Async counterpart of InstagramAPI; errors are raised like in the sync class"""
+        self.page_id = os.getenv('FACEBOOK_PAGE_ID')
+        self.instagram_account_id = os.getenv('INSTAGRAM_BUSINESS_ACCOUNT_ID')
+        super().__init__(os.getenv('FACEBOOK_ACCESS_TOKEN'), session, max_concurrency)
+
+    async def get_account_info(self, fields='display'):
+        """Get Instagram Business Account Information; `fields` is a preset or field names"""
+        return await self._make_request('GET', self.instagram_account_id, graph_fields('instagram.account', fields))
+
+    async def create_media_container(self, image_url, caption):
+        """Create a media container for posting"""
+        return await self._make_request('POST', f'{self.instagram_account_id}/media', data={
+            'image_url': image_url,
+            'caption': caption
+        })
+
+    async def publish_media(self, creation_id):
+        """Publish media using a creation ID"""
+        return await self._make_request('POST', f'{self.instagram_account_id}/media_publish', data={
+            'creation_id': creation_id
+        })
+
+    async def create_post(self, image_url, caption, wait: float = 5.0):
+        """Create and publish an Instagram post; the wait for processing does not block the loop"""
+        container = await self.create_media_container(image_url, caption)
+        creation_id = container.get('id')
+        if not creation_id:
+            raise ValueError("Failed to get creation ID")
+        await asyncio.sleep(wait)
+        return await self.publish_media(creation_id)
+
+    async def get_media_list(self, limit=25, fields='display'):
+        """Get list of media posts; fields='minimal' skips captions and media URLs"""
+        return await self._make_request('GET', f'{self.instagram_account_id}/media', {
+            **graph_fields('instagram.media', fields),
+            'limit': limit
+        })
+
+    async def delete_media(self, media_id):
+        """Delete a media post"""
+        return await self._make_request('DELETE', f'{media_id}')
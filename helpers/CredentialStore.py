@@ -0,0 +1,167 @@
+import fcntl
+import os
+import pickle
+import tempfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+from helpers.StructuredLog import get_logger
+
+# Load environment variables
+load_dotenv()
+
+log = get_logger(__name__)
+
+
+class CredentialStore:
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, root: Optional[str] = None, refresh_ahead: float = 300.0, interval: float = 60.0):
+        """
+        Process-wide credential cache backed by locked, atomically replaced pickle files
+
+        Reads are served from memory and only go back to disk when the file changed
+        (another process refreshed it). Writes go to a temp file that replaces the
+        old one, under an exclusive lock file, so readers never see a torn pickle
+        and concurrent refreshes do not race. Registered credentials are refreshed
+        on a background thread `refresh_ahead` seconds before they expire.
+
+        Args:
+            root: Directory for credential files (defaults to CREDENTIAL_STORE_DIR or ./credentials)
+            refresh_ahead: Refresh credentials this many seconds before expiry
+            interval: Seconds between background expiry checks
+        """
+        self.root = root or os.getenv('CREDENTIAL_STORE_DIR', 'credentials')
+        os.makedirs(self.root, mode=0o700, exist_ok=True)
+        self.refresh_ahead = refresh_ahead
+        self.interval = interval
+        self._lock = threading.RLock()
+        self._name_locks: Dict[str, threading.Lock] = {}
+        self._cache: Dict[str, Any] = {}
+        self._mtimes: Dict[str, int] = {}
+        self._refreshers: Dict[str, tuple] = {}
+        self._thread = None
+        self._stop = threading.Event()
+
+    @classmethod
+    def default(cls) -> 'CredentialStore':
+        """Shared store for this process"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.root, f'{name}.pickle')
+
+    @contextmanager
+    def locked(self, name: str):
+        """Exclusive cross-process lock for `name`, held for a read-modify-write"""
+        with self._lock:
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+        # Readers never take this lock, so a slow refresh only blocks other writers of `name`
+        with name_lock, open(os.path.join(self.root, f'{name}.lock'), 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def get(self, name: str) -> Any:
+        """Current credentials for `name`, or None"""
+        path = self._path(name)
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return self._cache.get(name)
+        if self._mtimes.get(name) == mtime:
+            return self._cache[name]
+        with self._lock:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+            cached = self._cache.get(name)
+            if cached is not None and type(cached) is type(value) and hasattr(cached, '__dict__'):
+                # Update in place so clients already holding the object see the new token
+                cached.__dict__.update(value.__dict__)
+                value = cached
+            self._cache[name] = value
+            self._mtimes[name] = mtime
+            return value
+
+    def put(self, name: str, value: Any):
+        """Persist credentials atomically and cache them in memory"""
+        with self.locked(name):
+            self._write(name, value)
+
+    def _write(self, name: str, value: Any):
+        # Caller holds locked(name)
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=f'.{name}.')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f)
+                f.flush()
+                os.fsync(f.fileno())
+            os.chmod(tmp, 0o600)
+            os.replace(tmp, self._path(name))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        with self._lock:
+            self._cache[name] = value
+            self._mtimes[name] = os.stat(self._path(name)).st_mtime_ns
+
+    def register(self, name: str, refresh: Callable[[Any], Any], expiry: Callable[[Any], Optional[datetime]]):
+        """
+        Keep `name` fresh in the background
+
+        Args:
+            name: Credential name
+            refresh: Called with the current credentials; returns the refreshed ones
+            expiry: Returns the naive UTC expiry time of credentials, or None if they do not expire
+        """
+        with self._lock:
+            self._refreshers[name] = (refresh, expiry)
+        self.start()
+
+    def _needs_refresh(self, name: str, value: Any) -> bool:
+        expires = self._refreshers[name][1](value) if value is not None else None
+        return expires is not None and expires - timedelta(seconds=self.refresh_ahead) <= datetime.utcnow()
+
+    def refresh_if_needed(self, name: str) -> Any:
+        """Refresh `name` if it is close to expiry, unless another process already did"""
+        if not self._needs_refresh(name, self.get(name)):
+            return self.get(name)
+        with self.locked(name):
+            # Re-read under the lock: a concurrent refresher may have won
+            value = self.get(name)
+            if self._needs_refresh(name, value):
+                value = self._refreshers[name][0](value)
+                self._write(name, value)
+            return value
+
+    def start(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._loop, name='credential-refresh', daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                names = list(self._refreshers)
+            for name in names:
+                try:
+                    self.refresh_if_needed(name)
+                except Exception as e:
+                    log.error("Background refresh failed for %s: %s", name, e)
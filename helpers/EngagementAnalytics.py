@@ -0,0 +1,185 @@
+import threading
+from typing import Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from helpers.MetricsStore import METRICS, PLATFORMS, MetricsStore
+
+DAY = 86400
+ENGAGEMENT_METRICS = [METRICS.index(m) for m in ('likes', 'comments', 'shares', 'score')]
+
+
+class EngagementAnalytics:
+    def __init__(self, store: Optional[MetricsStore] = None):
+        """
+        Incremental rollups over a MetricsStore
+
+        Only rows appended since the previous refresh() are read. They update a
+        dense (item x metric) matrix of latest values and a small table of
+        per-platform totals at the end of each day, from which every rollup is
+        derived with vectorized NumPy/pandas operations.
+
+        Args:
+            store: Store to read from (a default MetricsStore is created if omitted)
+        """
+        self.store = store if store is not None else MetricsStore()
+        self._lock = threading.Lock()
+        self._offset = 0
+        self._latest = np.zeros((0, len(METRICS)), dtype=np.int64)
+        self._latest_ts = np.zeros((0, len(METRICS)), dtype=np.int64)
+        # day -> (platform x metric) totals as of the end of that day
+        self._daily: Dict[int, np.ndarray] = {}
+        self._results: Dict[tuple, object] = {}
+
+    @property
+    def version(self) -> int:
+        """Number of store rows folded into the rollups so far"""
+        return self._offset
+
+    def refresh(self) -> int:
+        """
+        Fold rows appended since the last refresh into the rollup state
+
+        Returns:
+            Number of new rows processed
+        """
+        with self._lock:
+            # Rows are appended after their items are tracked, so reading the row count first
+            # guarantees every row up to it has a catalog entry after the refresh
+            stop = len(self.store)
+            n_items = self.store.refresh_items()
+            if n_items > len(self._latest):
+                grow = n_items - len(self._latest)
+                self._latest = np.vstack([self._latest, np.zeros((grow, len(METRICS)), dtype=np.int64)])
+                self._latest_ts = np.vstack([self._latest_ts, np.zeros((grow, len(METRICS)), dtype=np.int64)])
+            if stop <= self._offset:
+                return 0
+
+            cols = self.store.columns(self._offset, stop)
+            ts = np.asarray(cols['ts'])
+            order = np.argsort(ts, kind='stable')
+            ts = ts[order]
+            item = np.asarray(cols['item'])[order]
+            metric = np.asarray(cols['metric'])[order].astype(np.intp)
+            value = np.asarray(cols['value'])[order]
+
+            platform_of_item = self.store.items()['platform'].astype(np.intp)
+            days = ts // DAY
+            bounds = np.flatnonzero(np.diff(days)) + 1
+            for chunk in np.split(np.arange(len(ts)), bounds):
+                self._apply(ts[chunk], item[chunk], metric[chunk], value[chunk])
+                totals = np.zeros((len(PLATFORMS), len(METRICS)), dtype=np.int64)
+                np.add.at(totals, platform_of_item[:len(self._latest)], self._latest)
+                self._daily[int(days[chunk[0]])] = totals
+
+            processed = stop - self._offset
+            self._offset = stop
+            self._results.clear()
+            return processed
+
+    def _apply(self, ts, item, metric, value):
+        """Keep the newest value per (item, metric) from one time-ordered chunk"""
+        key = item.astype(np.int64) * len(METRICS) + metric
+        # Last occurrence of each key in time order is the first one in the reversed arrays
+        _, first_rev = np.unique(key[::-1], return_index=True)
+        last = len(key) - 1 - first_rev
+        newer = ts[last] >= self._latest_ts[item[last], metric[last]]
+        last = last[newer]
+        self._latest[item[last], metric[last]] = value[last]
+        self._latest_ts[item[last], metric[last]] = ts[last]
+
+    def _cached(self, key, compute):
+        # Results are dropped by refresh() whenever new rows arrive
+        if key not in self._results:
+            self._results[key] = compute()
+        return self._results[key]
+
+    # ROLLUPS
+    def platform_totals(self) -> pd.DataFrame:
+        """Sum of the latest value of every metric, per platform"""
+        def compute():
+            totals = np.zeros((len(PLATFORMS), len(METRICS)), dtype=np.int64)
+            platform = self.store.items()['platform'].astype(np.intp)[:len(self._latest)]
+            np.add.at(totals, platform, self._latest)
+            return pd.DataFrame(totals, index=list(PLATFORMS), columns=list(METRICS))
+        return self._cached(('totals',), compute)
+
+    def daily_totals(self, metric: str) -> pd.DataFrame:
+        """End-of-day totals of one metric, one column per platform"""
+        def compute():
+            days = sorted(self._daily)
+            values = np.array([self._daily[d][:, METRICS.index(metric)] for d in days]).reshape(len(days), len(PLATFORMS))
+            index = pd.to_datetime(np.array(days, dtype=np.int64) * DAY, unit='s')
+            return pd.DataFrame(values, index=index, columns=list(PLATFORMS))
+        return self._cached(('daily', metric), compute)
+
+    def growth_rates(self, metric: str = 'followers', window_days: int = 7) -> pd.Series:
+        """
+        Relative change of a platform total over the last `window_days` days
+
+        Returns:
+            Series indexed by platform; NaN where there is no baseline
+        """
+        def compute():
+            daily = self.daily_totals(metric)
+            if daily.empty:
+                return pd.Series(np.nan, index=list(PLATFORMS))
+            current = daily.iloc[-1]
+            cutoff = daily.index[-1] - pd.Timedelta(days=window_days)
+            baseline = daily[daily.index <= cutoff]
+            baseline = baseline.iloc[-1] if not baseline.empty else daily.iloc[0]
+            return (current - baseline) / baseline.replace(0, np.nan)
+        return self._cached(('growth', metric, window_days), compute)
+
+    def _engagement(self):
+        """Per-item engagement count and engagement rate (per view, or per follower when views are unknown)"""
+        items = self.store.items()
+        n = len(self._latest)
+        platform = items['platform'].astype(np.intp)[:n]
+        engagement = self._latest[:, ENGAGEMENT_METRICS].sum(axis=1)
+        views = self._latest[:, METRICS.index('views')]
+        followers_by_platform = np.zeros(len(PLATFORMS), dtype=np.int64)
+        np.maximum.at(followers_by_platform, platform, self._latest[:, METRICS.index('followers')])
+        denominator = np.where(views > 0, views, followers_by_platform[platform]).astype(np.float64)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            rate = np.where(denominator > 0, engagement / denominator, np.nan)
+        is_post = (self._latest[:, METRICS.index('followers')] == 0)
+        return items, platform, engagement, rate, is_post
+
+    def best_posting_hours(self) -> pd.DataFrame:
+        """Mean engagement of posts by UTC hour of publication, one column per platform"""
+        def compute():
+            items, platform, engagement, _, is_post = self._engagement()
+            created = items['created'][:len(platform)]
+            mask = is_post & (created > 0)
+            hour = (created[mask] % DAY) // 3600
+            cell = platform[mask] * 24 + hour
+            sums = np.bincount(cell, weights=engagement[mask], minlength=len(PLATFORMS) * 24)
+            counts = np.bincount(cell, minlength=len(PLATFORMS) * 24)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                means = (sums / counts).reshape(len(PLATFORMS), 24).T
+            return pd.DataFrame(means, index=pd.RangeIndex(24, name='hour'), columns=list(PLATFORMS))
+        return self._cached(('hours',), compute)
+
+    def top_posts(self, n: int = 10, platform: Optional[str] = None) -> pd.DataFrame:
+        """Top `n` posts by engagement rate, optionally for one platform"""
+        def compute():
+            items, item_platform, engagement, rate, is_post = self._engagement()
+            mask = is_post & ~np.isnan(rate)
+            if platform is not None:
+                mask &= item_platform == PLATFORMS.index(platform)
+            candidates = np.flatnonzero(mask)
+            k = min(n, len(candidates))
+            if k == 0:
+                return pd.DataFrame(columns=['platform', 'remote_id', 'engagement', 'engagement_rate'])
+            # argpartition picks the top k in linear time; only those k get sorted
+            top = candidates[np.argpartition(-rate[candidates], k - 1)[:k]]
+            top = top[np.argsort(-rate[top], kind='stable')]
+            return pd.DataFrame({
+                'platform': np.array(PLATFORMS)[item_platform[top]],
+                'remote_id': items['remote_id'][top],
+                'engagement': engagement[top],
+                'engagement_rate': rate[top],
+            })
+        return self._cached(('top', n, platform), compute)
@@ -2,31 +2,76 @@ import os
 from dotenv import load_dotenv
 import requests
 import json
+import hashlib
+import logging
+from helpers.CredentialStore import CredentialStore
+from helpers.Instrumentation import instrumented
+from helpers.FieldPresets import graph_fields
+from helpers.Models import loads, post_from_graph
+from helpers.Resilience import resilient_session
+from helpers.StructuredLog import get_logger
+from helpers.Verification import fingerprint, verification_cache
+from helpers.WriteAheadLog import IntentInFlightError, WriteAheadLog
 
 # Load .env file
 load_dotenv()
 
+log = get_logger(__name__, 'facebook')
+
 class FacebookMinimal:
-    def __init__(self):
-        self.user_token = os.getenv('FB_ACCESS_TOKEN')
-        self.page_id = os.getenv('FB_PAGE_ID')
-        self.base_url = 'https://graph.facebook.com/v18.0'
+    def __init__(self, lazy=False, page_id=None, user_token=None, page_token=None, session=None):
+        """
+        Load credentials; with lazy=True the page token is only fetched on first use (or warmup())
+
+        page_id and user_token default to FB_PAGE_ID and FB_ACCESS_TOKEN. A known page_token
+        and a shared session are passed in by GraphAccountPool.
+        """
+        self.user_token = user_token or os.getenv('FB_ACCESS_TOKEN')
+        self.page_id = page_id or os.getenv('FB_PAGE_ID')
+        self.base_url = os.getenv('GRAPH_API_BASE_URL', 'https://graph.facebook.com/v18.0')
         
         # Verify credentials are loaded
         if not self.user_token or not self.page_id:
             raise ValueError("Missing credentials. Please check your .env file.")
-        
-        # Get page access token
-        self.token = self.get_page_access_token()
-        if not self.token:
-            raise ValueError("Failed to get page access token")
+
+        # One pooled session for every request, timed per operation and retried on transient failures
+        self.session = session or resilient_session(requests.Session(), 'facebook', self.page_id)
+
+        self._token = page_token
+        if not lazy:
+            self.warmup()
             
-        print(f"Initialized with Page ID: {self.page_id}")
+        log.debug("Initialized with page ID %s", self.page_id)
+
+    @property
+    def token(self):
+        """Page access token, fetched on first use"""
+        if self._token is None:
+            self.warmup()
+        return self._token
 
+    @instrumented
+    def warmup(self):
+        """Get the page access token (once per TTL across all instances)"""
+        if self._token is None:
+            self._token = verification_cache.verify(
+                ('facebook', fingerprint(self.user_token, self.page_id)),
+                self._verify
+            )
+        return self._token
+
+    def _verify(self):
+        # Get page access token, reusing the one cached for this user token if there is one
+        token = self.get_cached_page_access_token()
+        if not token:
+            raise ValueError("Failed to get page access token")
+        return token
+
+    @instrumented
     def get_page_access_token(self):
         """Convert user access token to page access token"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.base_url}/{self.page_id}',
                 params={
                     'fields': 'access_token',
@@ -37,18 +82,36 @@ class FacebookMinimal:
             data = response.json()
             return data.get('access_token')
         except requests.exceptions.RequestException as e:
-            print(f"Failed to get page access token: {str(e)}")
-            if response.text:
-                print(f"API Response: {response.text}")
+            log.error("Failed to get page access token: %s", e)
+            # No response when the request never went out (e.g. an open circuit)
+            body = getattr(e.response, 'text', None)
+            if body:
+                log.debug("API response: %s", body)
             return None
         
 
         
 
+    def get_cached_page_access_token(self):
+        """Page access token from the credential store, fetched and stored on a miss"""
+        store = CredentialStore.default()
+        name = f'facebook_page_{self.page_id}'
+        # Page tokens derived from a long-lived user token do not expire, but a new user token invalidates them
+        user_token_sha256 = hashlib.sha256(self.user_token.encode()).hexdigest()
+        cached = store.get(name)
+        if cached and cached.get('user_token_sha256') == user_token_sha256:
+            return cached['token']
+
+        token = self.get_page_access_token()
+        if token:
+            store.put(name, {'user_token_sha256': user_token_sha256, 'token': token})
+        return token
+
+    @instrumented
     def verify_permissions(self):
         """Verify required permissions are granted"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.base_url}/me/permissions',
                 params={'access_token': self.user_token}
             )
@@ -69,58 +132,123 @@ class FacebookMinimal:
             missing_permissions = required_permissions - granted_permissions
             
             if missing_permissions:
-                print(f"Missing permissions: {missing_permissions}")
+                log.warning("Missing permissions: %s", missing_permissions)
                 return False
             return True
             
         except requests.exceptions.RequestException as e:
-            print(f"Failed to verify permissions: {str(e)}")
+            log.error("Failed to verify permissions: %s", e)
             return False
 
-    def create_post(self, message):
-        """Create a simple post"""
+    @instrumented
+    def create_post(self, message, idempotency_key=None):
+        """
+        Create a simple post
+
+        Posts with the same idempotency_key are made once (see WriteAheadLog); a retry after
+        a timeout first looks for the post among the page's latest.
+        """
         try:
-            response = requests.post(
-                f'{self.base_url}/{self.page_id}/feed',
-                params={
-                    'message': message,
-                    'access_token': self.token  # Using page access token
-                }
+            return WriteAheadLog.default().run(
+                'facebook', 'create_post', {'page_id': self.page_id, 'message': message},
+                send=lambda: self._send_post(message),
+                find=lambda since: self._find_post(message, since),
+                key=idempotency_key
             )
-            
-            # Print full response for debugging
-            print(f"API Response: {response.text}")
-            
-            # Check if request was successful
-            response.raise_for_status()
-            
-            data = response.json()
-            if 'error' in data:
-                print(f"API Error: {data['error']['message']}")
-                return None
-            return data
-            
+        except IntentInFlightError as e:
+            log.error("Failed to create post: %s", e)
+            return None
         except requests.exceptions.RequestException as e:
-            print(f"Request failed: {str(e)}")
+            log.error("Failed to create post: %s", e)
             return None
 
-    def read_post(self, post_id):
-        """Read a post"""
+    def _send_post(self, message):
+        response = self.session.post(
+            f'{self.base_url}/{self.page_id}/feed',
+            params={
+                'message': message,
+                'access_token': self.token  # Using page access token
+            }
+        )
+
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("API response: %s", response.text)
+
+        # Check if request was successful
+        response.raise_for_status()
+
+        data = response.json()
+        if 'error' in data:
+            log.error("API error: %s", data['error']['message'])
+            raise requests.exceptions.RequestException(data['error']['message'], response=response)
+        return data
+
+    def _find_post(self, message, since):
+        """The page post with this message made since `since` (Unix time), as create_post returns it"""
+        posts = self.list_posts(fields='display')
+        if posts is None:
+            # Resending without knowing could post twice
+            raise requests.exceptions.RequestException("Could not list posts to check for an earlier attempt")
+        for post in posts:
+            if post.text == message and (post.created_at or 0) >= since:
+                return {'id': post.id}
+        return None
+
+    @instrumented
+    def read_post(self, post_id, fields=None):
+        """Read a post; `fields` is a preset ('minimal', 'display', 'analytics') or field names"""
         try:
-            response = requests.get(
+            response = self.session.get(
                 f'{self.base_url}/{post_id}',
-                params={'access_token': self.token}  # Using page access token
+                params={**graph_fields('facebook.post', fields), 'access_token': self.token}  # Using page access token
             )
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Failed to read post: {str(e)}")
+            log.error("Failed to read post %s: %s", post_id, e)
+            return None
+
+    @instrumented
+    def list_posts(self, limit=25, fields='display'):
+        """The page's most recent posts as Post tuples; fields='analytics' includes engagement counts"""
+        try:
+            response = self.session.get(
+                f'{self.base_url}/{self.page_id}/posts',
+                params={**graph_fields('facebook.post', fields), 'limit': limit, 'access_token': self.token}
+            )
+            response.raise_for_status()
+            return [post_from_graph(post) for post in loads(response.content).get('data', [])]
+        except requests.exceptions.RequestException as e:
+            log.error("Failed to list posts: %s", e)
+            return None
+
+    @instrumented
+    def list_posts_page(self, limit=25, fields='display', after=None):
+        """
+        One page of the page's posts, newest first, as (Post tuples, cursor of the next page or None)
+
+        Returns None on error, like list_posts.
+        """
+        params = {**graph_fields('facebook.post', fields), 'limit': limit, 'access_token': self.token}
+        if after:
+            params['after'] = after
+        try:
+            response = self.session.get(f'{self.base_url}/{self.page_id}/posts', params=params)
+            response.raise_for_status()
+            page = loads(response.content)
+        except requests.exceptions.RequestException as e:
+            log.error("Failed to list posts: %s", e)
             return None
+        paging = page.get('paging', {})
+        # Graph API leaves out 'next' on the last page
+        cursor = paging.get('cursors', {}).get('after') if 'next' in paging else None
+        return [post_from_graph(post) for post in page.get('data', [])], cursor
 
+    @instrumented
     def update_post(self, post_id, new_message):
         """Update a post"""
         try:
-            response = requests.post(
+            response = self.session.post(
                 f'{self.base_url}/{post_id}',
                 params={
                     'message': new_message,
@@ -130,20 +258,62 @@ class FacebookMinimal:
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Failed to update post: {str(e)}")
+            log.error("Failed to update post %s: %s", post_id, e)
             return None
 
+    @instrumented
     def delete_post(self, post_id):
         """Delete a post"""
         try:
-            response = requests.delete(
+            response = self.session.delete(
                 f'{self.base_url}/{post_id}',
                 params={'access_token': self.token}  # Using page access token
             )
             response.raise_for_status()
             return response.json()
         except requests.exceptions.RequestException as e:
-            print(f"Failed to delete post: {str(e)}")
+            log.error("Failed to delete post %s: %s", post_id, e)
+            return None
+
+    @instrumented
+    def get_post_metrics(self, post_ids):
+        """Read engagement counts for many posts, 50 ids per multi-id request"""
+        metrics = {}
+        post_ids = list(post_ids)
+        try:
+            for i in range(0, len(post_ids), 50):
+                response = self.session.get(
+                    f'{self.base_url}/',
+                    params={
+                        'ids': ','.join(post_ids[i:i + 50]),
+                        'fields': 'shares,reactions.summary(total_count).limit(0),comments.summary(total_count).limit(0)',
+                        'access_token': self.token  # Using page access token
+                    }
+                )
+                response.raise_for_status()
+                for post_id, post in response.json().items():
+                    metrics[post_id] = {
+                        'likes': post.get('reactions', {}).get('summary', {}).get('total_count'),
+                        'comments': post.get('comments', {}).get('summary', {}).get('total_count'),
+                        'shares': post.get('shares', {}).get('count', 0),
+                    }
+            return metrics
+        except requests.exceptions.RequestException as e:
+            log.error("Failed to read post metrics: %s", e)
+            return metrics
+
+    @instrumented
+    def get_page_followers(self):
+        """Read the page follower count"""
+        try:
+            response = self.session.get(
+                f'{self.base_url}/{self.page_id}',
+                params={'fields': 'followers_count', 'access_token': self.token}
+            )
+            response.raise_for_status()
+            return response.json().get('followers_count')
+        except requests.exceptions.RequestException as e:
+            log.error("Failed to read page followers: %s", e)
             return None
 
 
@@ -0,0 +1,61 @@
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+
+# resource -> preset -> fields the API is asked for. 'minimal' is enough to list and
+# track items, 'display' to render them, 'analytics' to read their engagement counts.
+FIELD_PRESETS: Dict[str, Dict[str, Tuple[str, ...]]] = {
+    'facebook.post': {
+        'minimal': ('id', 'created_time'),
+        'display': ('id', 'message', 'created_time', 'permalink_url', 'full_picture'),
+        'analytics': ('id', 'created_time', 'shares', 'reactions.summary(total_count).limit(0)',
+                      'comments.summary(total_count).limit(0)'),
+    },
+    'instagram.account': {
+        'minimal': ('id', 'username'),
+        'display': ('username', 'profile_picture_url', 'followers_count', 'media_count'),
+        'analytics': ('id', 'followers_count', 'media_count'),
+    },
+    'instagram.media': {
+        'minimal': ('id', 'timestamp'),
+        'display': ('id', 'caption', 'media_type', 'media_url', 'permalink', 'thumbnail_url', 'timestamp', 'username'),
+        'analytics': ('id', 'timestamp', 'media_type', 'like_count', 'comments_count'),
+    },
+    # Twitter always returns id and text; these are the extra tweet_fields
+    'twitter.tweet': {
+        'minimal': ('created_at',),
+        'display': ('created_at', 'author_id', 'conversation_id', 'entities', 'attachments'),
+        'analytics': ('created_at', 'public_metrics'),
+    },
+}
+
+Fields = Optional[Union[str, Iterable[str]]]
+
+
+def select_fields(resource: str, fields: Fields) -> Optional[List[str]]:
+    """
+    Resolve a field projection for `resource`
+
+    Args:
+        resource: Key of FIELD_PRESETS, e.g. 'instagram.media'
+        fields: A preset name, a comma-separated string or a list of field names;
+            None leaves the choice to the API
+
+    Returns:
+        The field names to request, or None for the API's default set
+    """
+    if fields is None:
+        return None
+    if isinstance(fields, str):
+        presets = FIELD_PRESETS[resource]
+        if fields in presets:
+            return list(presets[fields])
+        fields = fields.split(',')
+    selected = [field.strip() for field in fields if field.strip()]
+    if not selected:
+        raise ValueError(f"No fields selected for {resource}")
+    return selected
+
+
+def graph_fields(resource: str, fields: Fields) -> Dict[str, str]:
+    """`fields` request parameter for a Graph API read (empty for the API's default set)"""
+    selected = select_fields(resource, fields)
+    return {'fields': ','.join(selected)} if selected else {}
@@ -0,0 +1,139 @@
+import hashlib
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional
+
+import requests
+from dotenv import load_dotenv
+
+from helpers.CredentialStore import CredentialStore
+from helpers.FacebookMinimal import FacebookMinimal
+from helpers.Instrumentation import instrumented
+from helpers.InstagramAPI import InstagramAPI
+from helpers.Models import loads
+from helpers.Resilience import ResilientAdapter
+
+# Load environment variables
+load_dotenv()
+
+# Pages per /me/accounts response; more are followed through the paging links
+PAGE_SIZE = 100
+ACCOUNT_FIELDS = 'id,name,access_token,instagram_business_account{id,username}'
+
+
+class PageAccount(NamedTuple):
+    page_id: str
+    name: str
+    token: str
+    instagram_id: Optional[str] = None
+    instagram_username: Optional[str] = None
+
+
+class GraphAccountPool:
+    def __init__(self, user_token: Optional[str] = None, base_url: Optional[str] = None, pool_size: int = 32):
+        """
+        Every Facebook page (and linked Instagram business account) the user manages
+
+        Pages, their tokens and their Instagram accounts come from /me/accounts with
+        field expansion, so discovery is one request per PAGE_SIZE pages instead of one
+        per page. The result is kept in the credential store and reused until the user
+        token changes, so later startups make no requests at all. Clients handed out by
+        facebook() and instagram() share one connection pool.
+
+        Args:
+            user_token: User access token (defaults to FB_ACCESS_TOKEN)
+            base_url: Graph API base URL (defaults to GRAPH_API_BASE_URL)
+            pool_size: Connections kept open per host, shared by all clients
+        """
+        self.user_token = user_token or os.getenv('FB_ACCESS_TOKEN')
+        if not self.user_token:
+            raise ValueError("Missing credentials. Please check your .env file.")
+        self.base_url = base_url or os.getenv('GRAPH_API_BASE_URL', 'https://graph.facebook.com/v18.0')
+        # Rate limits of /me/accounts count against the user, not a page
+        self._adapter = ResilientAdapter('facebook', 'me', pool_connections=4, pool_maxsize=pool_size)
+        self.session = self._session(self._adapter)
+        self._accounts: Optional[Dict[str, PageAccount]] = None
+        self._clients: Dict[tuple, object] = {}
+        self._lock = threading.Lock()
+
+    def _session(self, adapter) -> requests.Session:
+        session = requests.Session()
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        return session
+
+    def _client_session(self, platform: str, account: str) -> requests.Session:
+        # Own adapter for per-account metrics and rate limits, but the pool's connections
+        adapter = ResilientAdapter(platform, account)
+        adapter.poolmanager = self._adapter.poolmanager
+        return self._session(adapter)
+
+    @instrumented
+    def discover(self) -> List[PageAccount]:
+        """Fetch every page the user manages from /me/accounts, ignoring the cache"""
+        accounts = []
+        url, params = f'{self.base_url}/me/accounts', {
+            'fields': ACCOUNT_FIELDS, 'limit': PAGE_SIZE, 'access_token': self.user_token
+        }
+        while url:
+            response = self.session.get(url, params=params)
+            response.raise_for_status()
+            data = loads(response.content)
+            for page in data.get('data', []):
+                instagram = page.get('instagram_business_account') or {}
+                accounts.append(PageAccount(page['id'], page.get('name', ''), page['access_token'],
+                                            instagram.get('id'), instagram.get('username')))
+            # The next link already carries the fields, cursor and token
+            url, params = data.get('paging', {}).get('next'), None
+        return accounts
+
+    def accounts(self, refresh: bool = False) -> Dict[str, PageAccount]:
+        """Page id -> PageAccount, from memory, the credential store or /me/accounts"""
+        with self._lock:
+            if self._accounts is not None and not refresh:
+                return self._accounts
+            store = CredentialStore.default()
+            # A new user token invalidates the page tokens derived from it
+            fingerprint = hashlib.sha256(self.user_token.encode()).hexdigest()
+            cached = None if refresh else store.get('facebook_accounts')
+            if cached and cached.get('user_token_sha256') == fingerprint:
+                accounts = [PageAccount(*account) for account in cached['accounts']]
+            else:
+                accounts = self.discover()
+                store.put('facebook_accounts', {'user_token_sha256': fingerprint,
+                                                'accounts': [tuple(account) for account in accounts]})
+            self._accounts = {account.page_id: account for account in accounts}
+            self._clients.clear()
+            return self._accounts
+
+    def instagram_accounts(self) -> Dict[str, PageAccount]:
+        """Instagram business account id -> PageAccount of its linked page"""
+        return {account.instagram_id: account for account in self.accounts().values() if account.instagram_id}
+
+    def facebook(self, page_id: str) -> FacebookMinimal:
+        """Client for one page, with its token already set"""
+        account = self.accounts().get(str(page_id))
+        if account is None:
+            raise KeyError(f"Page {page_id} is not managed by this user")
+        with self._lock:
+            key = ('facebook', account.page_id)
+            if key not in self._clients:
+                self._clients[key] = FacebookMinimal(
+                    lazy=True, page_id=account.page_id, user_token=self.user_token, page_token=account.token,
+                    session=self._client_session('facebook', account.page_id)
+                )
+            return self._clients[key]
+
+    def instagram(self, account_id: str) -> InstagramAPI:
+        """Client for one Instagram business account, using its page's token"""
+        account = self.instagram_accounts().get(str(account_id))
+        if account is None:
+            raise KeyError(f"Instagram account {account_id} is not linked to a managed page")
+        with self._lock:
+            key = ('instagram', account.instagram_id)
+            if key not in self._clients:
+                self._clients[key] = InstagramAPI(
+                    instagram_account_id=account.instagram_id, access_token=account.token, page_id=account.page_id,
+                    session=self._client_session('instagram', account.instagram_id)
+                )
+            return self._clients[key]
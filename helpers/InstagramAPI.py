@@ -1,22 +1,43 @@
 # instagram_api.py
 import os
+import time
 import requests
 from datetime import datetime
 from dotenv import load_dotenv
 import json
+from helpers.Instrumentation import instrumented
+from helpers.FieldPresets import graph_fields
+from helpers.Models import loads, media_from_instagram
+from helpers.Resilience import resilient_session
+from helpers.StructuredLog import get_logger
+from helpers.Verification import fingerprint, verification_cache
+from helpers.WriteAheadLog import WriteAheadLog
+
+log = get_logger(__name__, 'instagram')
 
 class InstagramAPI:
-    def __init__(self):
+    def __init__(self, instagram_account_id=None, access_token=None, page_id=None, session=None):
         # Load environment variables
         load_dotenv()
         
-        # Initialize credentials from .env file
-        self.page_id = os.getenv('FACEBOOK_PAGE_ID')
-        self.access_token = os.getenv('FACEBOOK_ACCESS_TOKEN')
-        self.instagram_account_id = os.getenv('INSTAGRAM_BUSINESS_ACCOUNT_ID')
+        # Initialize credentials from .env file unless given (GraphAccountPool passes them in)
+        self.page_id = page_id or os.getenv('FACEBOOK_PAGE_ID')
+        self.access_token = access_token or os.getenv('FACEBOOK_ACCESS_TOKEN')
+        self.instagram_account_id = instagram_account_id or os.getenv('INSTAGRAM_BUSINESS_ACCOUNT_ID')
         
         # Base URL for Graph API
-        self.base_url = 'https://graph.facebook.com/v18.0'
+        self.base_url = os.getenv('GRAPH_API_BASE_URL', 'https://graph.facebook.com/v18.0')
+
+        # One pooled session for every request, timed per operation and retried on transient failures
+        self.session = session or resilient_session(requests.Session(), 'instagram', self.instagram_account_id)
+
+    @instrumented
+    def warmup(self):
+        """Verify the access token and account ID (once per TTL across all instances)"""
+        return verification_cache.verify(
+            ('instagram', fingerprint(self.access_token, self.instagram_account_id)),
+            lambda: self._make_request('GET', self.instagram_account_id, {'fields': 'id'})
+        )
         
     def _make_request(self, method, endpoint, params=None, data=None):
         """Helper method to make API requests"""
@@ -29,21 +50,21 @@ class InstagramAPI:
         params['access_token'] = self.access_token
         
         try:
-            response = requests.request(method, url, params=params, json=data)
+            response = self.session.request(method, url, params=params, json=data)
             response.raise_for_status()
-            return response.json()
+            return loads(response.content)
         except requests.exceptions.RequestException as e:
-            print(f"Error making request: {e}")
+            log.error("Error making request to %s: %s", endpoint, e)
             if hasattr(e.response, 'text'):
-                print(f"Response: {e.response.text}")
+                log.debug("API response: %s", e.response.text)
             raise
 
-    def get_account_info(self):
-        """Get Instagram Business Account Information"""
-        return self._make_request('GET', self.instagram_account_id, {
-            'fields': 'username,profile_picture_url,followers_count,media_count'
-        })
+    @instrumented
+    def get_account_info(self, fields='display'):
+        """Get Instagram Business Account Information; `fields` is a preset or field names"""
+        return self._make_request('GET', self.instagram_account_id, graph_fields('instagram.account', fields))
 
+    @instrumented
     def create_media_container(self, image_url, caption):
         """Create a media container for posting"""
         return self._make_request('POST', f'{self.instagram_account_id}/media', data={
@@ -51,44 +72,100 @@ class InstagramAPI:
             'caption': caption
         })
 
+    @instrumented
     def publish_media(self, creation_id):
         """Publish media using a creation ID"""
         return self._make_request('POST', f'{self.instagram_account_id}/media_publish', data={
             'creation_id': creation_id
         })
 
-    def create_post(self, image_url, caption):
-        """Create and publish an Instagram post"""
+    @instrumented
+    def create_post(self, image_url, caption, idempotency_key=None):
+        """
+        Create and publish an Instagram post
+
+        Posts with the same idempotency_key are published once (see WriteAheadLog); a retry
+        after a timeout first looks for the post among the account's latest media.
+        """
         try:
-            # First, create a media container
-            container = self.create_media_container(image_url, caption)
-            creation_id = container.get('id')
-            
-            if not creation_id:
-                raise ValueError("Failed to get creation ID")
-            
-            # Wait for media to be ready (in production, you should implement proper polling)
-            import time
-            time.sleep(5)
-            
-            # Then publish it
-            return self.publish_media(creation_id)
-            
+            return WriteAheadLog.default().run(
+                'instagram', 'create_post',
+                {'account_id': self.instagram_account_id, 'image_url': image_url, 'caption': caption},
+                send=lambda: self._publish_post(image_url, caption),
+                find=lambda since: self._find_media(caption, since),
+                key=idempotency_key
+            )
         except Exception as e:
-            print(f"Error creating post: {e}")
+            log.error("Error creating post: %s", e)
             raise
 
-    def get_media_list(self, limit=25):
-        """Get list of media posts"""
+    def _publish_post(self, image_url, caption):
+        # First, create a media container
+        container = self.create_media_container(image_url, caption)
+        creation_id = container.get('id')
+
+        if not creation_id:
+            raise ValueError("Failed to get creation ID")
+
+        # Wait for media to be ready (in production, you should implement proper polling)
+        time.sleep(5)
+
+        # Then publish it
+        return self.publish_media(creation_id)
+
+    def _find_media(self, caption, since):
+        """The media with this caption published since `since` (Unix time), as create_post returns it"""
+        for media in self.list_media(limit=25, fields=['id', 'caption', 'timestamp']):
+            if (media.title or '') == (caption or '') and (media.created_at or 0) >= since:
+                return {'id': media.id}
+        return None
+
+    @instrumented
+    def get_media_list(self, limit=25, fields='display'):
+        """Get list of media posts; fields='minimal' skips captions and media URLs"""
         return self._make_request('GET', f'{self.instagram_account_id}/media', {
-            'fields': 'id,caption,media_type,media_url,permalink,thumbnail_url,timestamp,username',
+            **graph_fields('instagram.media', fields),
             'limit': limit
         })
 
+    @instrumented
+    def list_media(self, limit=25, fields='display'):
+        """Media posts as MediaItem tuples"""
+        return [media_from_instagram(media) for media in self.get_media_list(limit, fields).get('data', [])]
+
+    @instrumented
+    def list_media_page(self, limit=25, fields='display', after=None):
+        """One page of media posts, newest first, as (MediaItem tuples, cursor of the next page or None)"""
+        params = {**graph_fields('instagram.media', fields), 'limit': limit}
+        if after:
+            params['after'] = after
+        page = self._make_request('GET', f'{self.instagram_account_id}/media', params)
+        paging = page.get('paging', {})
+        cursor = paging.get('cursors', {}).get('after') if 'next' in paging else None
+        return [media_from_instagram(media) for media in page.get('data', [])], cursor
+
+    @instrumented
     def delete_media(self, media_id):
         """Delete a media post"""
         return self._make_request('DELETE', f'{media_id}')
 
+    @instrumented
+    def get_media_metrics(self, media_ids):
+        """Get like and comment counts for many media posts, 50 ids per multi-id request"""
+        metrics = {}
+        media_ids = list(media_ids)
+        for i in range(0, len(media_ids), 50):
+            response = self._make_request('GET', '', {
+                'ids': ','.join(media_ids[i:i + 50]),
+                'fields': 'like_count,comments_count'
+            })
+            for media_id, media in response.items():
+                metrics[media_id] = {
+                    'likes': media.get('like_count'),
+                    'comments': media.get('comments_count')
+                }
+        return metrics
+
 # Main execution example
 if __name__ == "__main__":
     try:
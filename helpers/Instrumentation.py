@@ -0,0 +1,331 @@
+import bisect
+import contextvars
+import functools
+import logging
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+
+from helpers.TrafficRecorder import traffic_recorder
+
+# Load environment variables
+load_dotenv()
+
+# Upper bounds in seconds of the request latency histogram buckets
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Name of the manager method that is making requests, set by @instrumented
+current_operation = contextvars.ContextVar('current_operation', default=None)
+
+# Records go through helpers.StructuredLog's handler (operation latencies at DEBUG)
+_log = logging.getLogger('helpers.Instrumentation')
+
+
+class _Series:
+    __slots__ = ('buckets', 'count', 'sum', 'bytes_sent', 'bytes_received', 'retries', 'errors')
+
+    def __init__(self, size):
+        self.buckets = [0] * size
+        self.count = 0
+        self.sum = 0.0
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+        self.errors: Dict[str, int] = {}
+
+
+class MetricsRegistry:
+    def __init__(self, buckets=BUCKETS):
+        """
+        In-process request metrics per (platform, operation)
+
+        Recording is one lock acquisition, a bisect and a few integer updates,
+        so it is cheap enough to stay on for every request.
+        """
+        self.bucket_bounds = tuple(buckets)
+        self._lock = threading.Lock()
+        self._series: Dict[Tuple[str, str], _Series] = {}
+
+    def _get(self, platform, operation):
+        key = (platform, operation or 'other')
+        series = self._series.get(key)
+        if series is None:
+            series = self._series.setdefault(key, _Series(len(self.bucket_bounds) + 1))
+        return series
+
+    def observe(self, platform: str, operation: Optional[str], seconds: float,
+                sent: int = 0, received: int = 0, error: Optional[str] = None):
+        """Record one outbound request"""
+        index = bisect.bisect_left(self.bucket_bounds, seconds)
+        with self._lock:
+            series = self._get(platform, operation)
+            series.buckets[index] += 1
+            series.count += 1
+            series.sum += seconds
+            series.bytes_sent += sent
+            series.bytes_received += received
+            if error:
+                series.errors[error] = series.errors.get(error, 0) + 1
+
+    def retry(self, platform: str, operation: Optional[str] = None):
+        """Record a retried request (defaults to the current operation)"""
+        with self._lock:
+            self._get(platform, operation or current_operation.get()).retries += 1
+
+    def snapshot(self) -> Dict[Tuple[str, str], dict]:
+        """Copy of every series as plain dicts"""
+        with self._lock:
+            return {
+                key: {
+                    'buckets': list(series.buckets),
+                    'count': series.count,
+                    'sum': series.sum,
+                    'bytes_sent': series.bytes_sent,
+                    'bytes_received': series.bytes_received,
+                    'retries': series.retries,
+                    'errors': dict(series.errors),
+                }
+                for key, series in self._series.items()
+            }
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def quantile(self, buckets, q: float) -> float:
+        """Estimate a latency quantile from bucket counts, interpolating inside the bucket"""
+        total = sum(buckets)
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for i, count in enumerate(buckets):
+            if count and seen + count >= rank:
+                lower = self.bucket_bounds[i - 1] if i else 0.0
+                upper = self.bucket_bounds[i] if i < len(self.bucket_bounds) else self.bucket_bounds[-1]
+                return lower + (upper - lower) * (rank - seen) / count
+            seen += count
+        return self.bucket_bounds[-1]
+
+    def prometheus_text(self) -> str:
+        """All series in the Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = [
+            '# HELP social_request_duration_seconds Outbound API request latency',
+            '# TYPE social_request_duration_seconds histogram',
+        ]
+        for (platform, operation), series in sorted(snapshot.items()):
+            labels = f'platform="{platform}",operation="{operation}"'
+            cumulative = 0
+            for bound, count in zip(self.bucket_bounds + (float('inf'),), series['buckets']):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'social_request_duration_seconds_bucket{{{labels},le="{le}"}} {cumulative}')
+            lines.append(f'social_request_duration_seconds_sum{{{labels}}} {series["sum"]}')
+            lines.append(f'social_request_duration_seconds_count{{{labels}}} {series["count"]}')
+
+        for name, field, help_text in (
+            ('social_request_sent_bytes_total', 'bytes_sent', 'Request body bytes sent'),
+            ('social_request_received_bytes_total', 'bytes_received', 'Response body bytes received'),
+            ('social_request_retries_total', 'retries', 'Requests retried after a failure or rate limit'),
+        ):
+            lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+            for (platform, operation), series in sorted(snapshot.items()):
+                lines.append(f'{name}{{platform="{platform}",operation="{operation}"}} {series[field]}')
+
+        lines += ['# HELP social_request_errors_total Failed requests by error class',
+                  '# TYPE social_request_errors_total counter']
+        for (platform, operation), series in sorted(snapshot.items()):
+            for error, count in sorted(series['errors'].items()):
+                lines.append(f'social_request_errors_total{{platform="{platform}",operation="{operation}",'
+                             f'error="{error}"}} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+metrics = MetricsRegistry()
+
+
+def instrumented(method):
+    """Label requests made inside `method` with its name (the outermost instrumented call wins)"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        if current_operation.get() is not None:
+            return method(*args, **kwargs)
+        token = current_operation.set(method.__name__)
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            current_operation.reset(token)
+            if _log.isEnabledFor(logging.DEBUG):
+                _log.debug("Finished %s", method.__qualname__, extra={
+                    'operation': method.__name__,
+                    'latency_ms': round((time.perf_counter() - start) * 1000, 3),
+                })
+    return wrapper
+
+
+def error_class(status: int) -> Optional[str]:
+    """Error label for an HTTP status, or None for a success"""
+    if status == 429:
+        return 'rate_limited'
+    if status >= 500:
+        return 'server_error'
+    if status >= 400:
+        return 'client_error'
+    return None
+
+
+def _size(body) -> int:
+    if isinstance(body, (bytes, bytearray, str)):
+        return len(body)
+    return 0
+
+
+class InstrumentedAdapter(HTTPAdapter):
+    def __init__(self, platform: str, registry: MetricsRegistry = metrics, **kwargs):
+        """
+        Transport adapter that records every request sent through a requests.Session
+
+        With TRAFFIC_TRACE set, each request and response is also written to that trace.
+        """
+        super().__init__(**kwargs)
+        self.platform = platform
+        self.registry = registry
+        self.recorder = traffic_recorder()
+
+    def send(self, request, stream=False, **kwargs):
+        started = time.time()
+        start = time.perf_counter()
+        operation = current_operation.get()
+        try:
+            response = super().send(request, stream=stream, **kwargs)
+            # Session.send reads the body right after this anyway; reading it here includes it in the timing
+            received = int(response.headers.get('Content-Length', 0)) if stream else len(response.content)
+        except Exception as e:
+            latency = time.perf_counter() - start
+            self.registry.observe(self.platform, operation, latency, _size(request.body), 0, type(e).__name__)
+            if self.recorder:
+                self.recorder.record(self.platform, operation, request.method, request.url, started, latency,
+                                     request_body=request.body, request_type=request.headers.get('Content-Type'),
+                                     error=type(e).__name__)
+            raise
+        latency = time.perf_counter() - start
+        self.registry.observe(self.platform, operation, latency, _size(request.body), received,
+                              error_class(response.status_code))
+        if self.recorder:
+            self.recorder.record(self.platform, operation, request.method, request.url, started, latency,
+                                 response.status_code, request.body, request.headers.get('Content-Type'),
+                                 response.headers, None if stream else response.content)
+        return response
+
+
+def instrument_session(session, platform: str, registry: MetricsRegistry = metrics):
+    """Route all of `session`'s requests through an InstrumentedAdapter"""
+    adapter = InstrumentedAdapter(platform, registry)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class InstrumentedHttp:
+    def __init__(self, http, platform: str, registry: MetricsRegistry = metrics):
+        """Wraps an httplib2.Http (as used by googleapiclient) and records (and traces) every request"""
+        self.http = http
+        self.platform = platform
+        self.registry = registry
+        self.recorder = traffic_recorder()
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        started = time.time()
+        start = time.perf_counter()
+        operation = current_operation.get()
+        try:
+            response, content = self.http.request(uri, method, body, headers, *args, **kwargs)
+        except Exception as e:
+            latency = time.perf_counter() - start
+            self.registry.observe(self.platform, operation, latency, _size(body), 0, type(e).__name__)
+            if self.recorder:
+                self._record(operation, method, uri, body, headers, started, latency, error=type(e).__name__)
+            raise
+        latency = time.perf_counter() - start
+        self.registry.observe(self.platform, operation, latency, _size(body), len(content or b''),
+                              error_class(response.status))
+        if self.recorder:
+            self._record(operation, method, uri, body, headers, started, latency, response, content)
+        return response, content
+
+    def _record(self, operation, method, uri, body, headers, started, latency, response=None, content=None,
+                error=None):
+        headers = {key.lower(): value for key, value in (headers or {}).items()}
+        # Upload chunks are streamed, so their size is only in the headers
+        size = headers.get('content-length')
+        self.recorder.record(self.platform, operation, method, uri, started, latency,
+                             response.status if response else None, body, headers.get('content-type'),
+                             response, content, error, int(size) if size else None)
+
+    def __getattr__(self, name):
+        return getattr(self.http, name)
+
+
+class _RetryLogFilter(logging.Filter):
+    """Counts the retries SDKs only report through their loggers"""
+
+    def __init__(self, platform, prefix, registry):
+        super().__init__()
+        self.platform = platform
+        self.prefix = prefix
+        self.registry = registry
+
+    def filter(self, record):
+        if isinstance(record.msg, str) and record.msg.startswith(self.prefix):
+            self.registry.retry(self.platform)
+        return True
+
+
+for _logger, _platform, _prefix in (
+    ('prawcore', 'reddit', 'Retrying due to'),
+    ('tweepy.client', 'twitter', 'Rate limit exceeded'),
+    ('googleapiclient.http', 'youtube', 'Sleeping'),
+):
+    logging.getLogger(_logger).addFilter(_RetryLogFilter(_platform, _prefix, metrics))
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = metrics
+
+    def do_GET(self):
+        body = self.registry.prometheus_text().encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port: Optional[int] = None, host: str = '0.0.0.0') -> Optional[ThreadingHTTPServer]:
+    """
+    Serve the Prometheus text export on a background thread
+
+    Args:
+        port: Port to listen on (defaults to METRICS_PORT; nothing is started if neither is set)
+        host: Interface to bind
+
+    Returns:
+        The running server, or None
+    """
+    port = port or int(os.getenv('METRICS_PORT', '0'))
+    if not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, name='metrics', daemon=True).start()
+    _log.info("Serving metrics on http://%s:%d/metrics", host, port)
+    return server
@@ -0,0 +1,135 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from helpers.StructuredLog import get_logger
+
+
+def _youtube_listings(yt, details):
+    videos = yt.list_my_videos(max_results=5)
+    yield 'videos', videos
+    ids = [item['id']['videoId'] for item in videos.get('items', [])[:details]]
+    if ids:
+        # One videos.list call (1 quota unit) covers every speculative detail fetch
+        response = yt.read_video(','.join(ids))
+        for item in response.get('items', []):
+            yield f"video:{item['id']}", {'items': [item]}
+
+
+def _reddit_listings(reddit, details):
+    posts = reddit.get_recent_posts(limit=10)
+    yield 'recent_posts', posts
+    for post in posts[:details]:
+        yield f"post:{post['id']}", reddit.read_post(post['id'])
+
+
+def _instagram_listings(api, details):
+    yield 'account_info', api.get_account_info()
+    yield 'media_list', api.get_media_list(limit=5)
+
+
+def _twitter_listings(twitter, details):
+    yield 'my_tweets', twitter.get_my_tweets(max_results=5)
+
+
+# platform -> generator of (key, value) pairs, listings before the details they enable
+LISTINGS = {
+    'youtube': _youtube_listings,
+    'reddit': _reddit_listings,
+    'instagram': _instagram_listings,
+    'twitter': _twitter_listings,
+}
+
+log = get_logger(__name__)
+
+
+class ListingPrefetcher:
+    def __init__(self, factories: Dict[str, Callable[[], Any]], ttl: float = 60.0, details: int = 3):
+        """
+        Fetch platform listings and item details in the background
+
+        Each platform gets a single worker thread that owns its own manager (built by
+        `factories[platform]` on that thread), so prefetching never shares an SDK
+        client with the page that is rendering.
+
+        Args:
+            factories: Platform name -> callable returning a ready-to-use manager
+            ttl: Seconds a prefetched result stays fresh
+            details: Number of listed items whose details are fetched speculatively
+        """
+        self.factories = factories
+        self.ttl = ttl
+        self.details = details
+        self._lock = threading.Lock()
+        self._executors: Dict[str, ThreadPoolExecutor] = {}
+        self._managers: Dict[str, Any] = {}
+        # platform -> {'started': monotonic time, 'done': bool, 'futures': {key: Future}}
+        self._runs: Dict[str, dict] = {}
+
+    def _fresh(self, platform: str) -> Optional[dict]:
+        run = self._runs.get(platform)
+        if run and time.monotonic() - run['started'] < self.ttl:
+            return run
+        return None
+
+    def prefetch(self, platform: str):
+        """Start fetching `platform`'s listings unless a fresh fetch is already running or done"""
+        if platform not in LISTINGS or platform not in self.factories:
+            return
+        with self._lock:
+            if self._fresh(platform):
+                return
+            run = {'started': time.monotonic(), 'done': False, 'futures': {}}
+            self._runs[platform] = run
+            if platform not in self._executors:
+                self._executors[platform] = ThreadPoolExecutor(1, thread_name_prefix=f'prefetch-{platform}')
+            self._executors[platform].submit(self._run, platform, run)
+
+    def _run(self, platform: str, run: dict):
+        try:
+            if platform not in self._managers:
+                self._managers[platform] = self.factories[platform]()
+            for key, value in LISTINGS[platform](self._managers[platform], self.details):
+                with self._lock:
+                    future = run['futures'].setdefault(key, Future())
+                future.set_result(value)
+        except Exception as e:
+            log.warning("Prefetch failed for %s: %s", platform, e, extra={'platform': platform})
+            with self._lock:
+                # Let the next prefetch() retry instead of serving the failure for the whole TTL
+                if self._runs.get(platform) is run:
+                    del self._runs[platform]
+        finally:
+            with self._lock:
+                run['done'] = True
+                pending = [future for future in run['futures'].values() if not future.done()]
+            # Waiters for keys this run did not produce fall back to a direct call
+            for future in pending:
+                future.set_result(None)
+
+    def get(self, platform: str, key: str, timeout: Optional[float] = 10.0):
+        """
+        Prefetched value for `key`, waiting up to `timeout` seconds for a fetch in progress
+
+        Returns:
+            The value, or None if it was not prefetched (callers then fetch it directly)
+        """
+        with self._lock:
+            run = self._fresh(platform)
+            if run is None:
+                return None
+            future = run['futures'].get(key)
+            if future is None:
+                if run['done']:
+                    return None
+                future = run['futures'][key] = Future()
+        try:
+            return future.result(timeout)
+        except Exception:
+            return None
+
+    def invalidate(self, platform: str):
+        """Drop `platform`'s prefetched data, e.g. after a create, update or delete"""
+        with self._lock:
+            self._runs.pop(platform, None)
@@ -0,0 +1,256 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+from PIL import Image, ImageCms, ImageOps
+
+# Load environment variables
+load_dotenv()
+
+# Upload limits per target. Changing a spec changes its cache key, so old outputs are never reused.
+PLATFORM_SPECS = {
+    'reddit_image': {'kind': 'image', 'format': 'JPEG', 'max_side': 4096, 'max_bytes': 20 * 1024 * 1024, 'quality': 90},
+    'facebook_image': {'kind': 'image', 'format': 'JPEG', 'max_side': 2048, 'max_bytes': 4 * 1024 * 1024, 'quality': 85},
+    'instagram_image': {'kind': 'image', 'format': 'JPEG', 'max_side': 1440, 'max_bytes': 8 * 1024 * 1024, 'quality': 85,
+                        'min_aspect': 4 / 5, 'max_aspect': 1.91},
+    'twitter_image': {'kind': 'image', 'format': 'JPEG', 'max_side': 4096, 'max_bytes': 5 * 1024 * 1024, 'quality': 85},
+    # YouTube transcodes everything itself, so only the container and metadata are rewritten
+    'youtube_video': {'kind': 'video', 'reencode': False},
+    'twitter_video': {'kind': 'video', 'reencode': True, 'max_height': 720, 'crf': 23, 'max_seconds': 140},
+    'reddit_video': {'kind': 'video', 'reencode': True, 'max_height': 1080, 'crf': 23, 'max_seconds': 900},
+}
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Part of every cache key; bump it when processing changes, so outputs made the old way are not reused
+OUTPUT_VERSION = 3
+
+# Images still over max_bytes at this quality are scaled down instead
+MIN_QUALITY = 40
+# ...by this factor at a time, but not below this many pixels on the longer side
+DOWNSCALE = 0.75
+MIN_SIDE = 320
+
+
+def hash_file(path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """SHA-256 of a file, read in fixed-size chunks so memory use does not depend on file size"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def spec_key(spec: dict) -> str:
+    """Short stable hash of a target spec"""
+    return hashlib.sha256(json.dumps([OUTPUT_VERSION, spec], sort_keys=True).encode()).hexdigest()[:16]
+
+
+def _to_rgb(image: Image.Image, profile: Optional[bytes]) -> Tuple[Image.Image, Optional[bytes]]:
+    """`image` in RGB, and the ICC profile that describes it afterwards (None for sRGB)"""
+    if profile:
+        try:
+            source = ImageCms.ImageCmsProfile(io.BytesIO(profile))
+            if source.profile.xcolor_space.strip() != 'RGB':
+                # A CMYK or greyscale profile would mislabel the RGB pixels, so map them onto sRGB
+                return ImageCms.profileToProfile(image, source, ImageCms.createProfile('sRGB'), outputMode='RGB'), None
+        except (OSError, ImageCms.PyCMSError):
+            return image.convert('RGB'), None
+    return image.convert('RGB'), profile
+
+
+def _process_image(source: str, destination: str, target: str) -> str:
+    spec = PLATFORM_SPECS[target]
+    with Image.open(source) as original:
+        # Apply the EXIF rotation before the metadata is dropped
+        image = ImageOps.exif_transpose(original)
+
+        min_aspect, max_aspect = spec.get('min_aspect'), spec.get('max_aspect')
+        if min_aspect or max_aspect:
+            width, height = image.size
+            aspect = width / height
+            if min_aspect and aspect < min_aspect:
+                new_height = int(width / min_aspect)
+                top = (height - new_height) // 2
+                image = image.crop((0, top, width, top + new_height))
+            elif max_aspect and aspect > max_aspect:
+                new_width = int(height * max_aspect)
+                left = (width - new_width) // 2
+                image = image.crop((left, 0, left + new_width, height))
+
+        if max(image.size) > spec['max_side']:
+            image.thumbnail((spec['max_side'], spec['max_side']), Image.LANCZOS)
+
+        # The encoder only writes metadata passed to save(), so EXIF/XMP/comments are dropped;
+        # the colour profile is passed on so colours render the same
+        profile = original.info.get('icc_profile')
+        if spec['format'] == 'JPEG' and image.mode != 'RGB':
+            image, profile = _to_rgb(image, profile)
+        options = {'icc_profile': profile} if profile else {}
+
+        quality = spec.get('quality', 85)
+        tmp = f"{destination}.{os.getpid()}.tmp"
+        try:
+            while True:
+                image.save(tmp, format=spec['format'], quality=quality, optimize=True, **options)
+                if os.path.getsize(tmp) <= spec['max_bytes']:
+                    break
+                if quality > MIN_QUALITY:
+                    quality = max(quality - 10, MIN_QUALITY)
+                    continue
+                if max(image.size) * DOWNSCALE < MIN_SIDE:
+                    raise ValueError(f"{source} does not fit {target}'s {spec['max_bytes']} byte limit, "
+                                     f"even at {image.size[0]}x{image.size[1]} and quality {quality}")
+                image = image.resize((max(1, round(image.size[0] * DOWNSCALE)),
+                                      max(1, round(image.size[1] * DOWNSCALE))), Image.LANCZOS)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+        os.replace(tmp, destination)
+    return destination
+
+
+def _process_video(source: str, destination: str, target: str) -> str:
+    spec = PLATFORM_SPECS[target]
+    tmp = f"{destination}.{os.getpid()}.tmp.mp4"
+    command = ['ffmpeg', '-y', '-loglevel', 'error', '-i', source, '-map_metadata', '-1']
+    if spec.get('reencode'):
+        command += [
+            '-vf', f"scale=-2:'min({spec['max_height']},ih)'",
+            '-c:v', 'libx264', '-preset', 'veryfast', '-crf', str(spec['crf']), '-pix_fmt', 'yuv420p',
+            '-c:a', 'aac', '-b:a', '128k',
+        ]
+        if spec.get('max_seconds'):
+            command += ['-t', str(spec['max_seconds'])]
+    else:
+        command += ['-c', 'copy']
+    command += ['-movflags', '+faststart', tmp]
+
+    result = subprocess.run(command, capture_output=True, text=True)
+    if result.returncode != 0:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.strip()}")
+    os.replace(tmp, destination)
+    return destination
+
+
+def _process(source: str, destination: str, target: str) -> str:
+    if PLATFORM_SPECS[target]['kind'] == 'image':
+        return _process_image(source, destination, target)
+    return _process_video(source, destination, target)
+
+
+class MediaPreprocessor:
+    def __init__(self, cache_dir: Optional[str] = None, max_workers: Optional[int] = None):
+        """
+        Resize, re-encode and strip metadata from media before upload
+
+        Work runs in a process pool. Outputs are cached on disk under the SHA-256 of
+        the source bytes plus a hash of the target spec, so preparing the same asset
+        for the same target again (for another platform account or campaign) is a
+        cache hit, and identical jobs submitted concurrently share one worker.
+
+        Args:
+            cache_dir: Output cache directory (defaults to MEDIA_CACHE_DIR or ./media_cache)
+            max_workers: Process pool size (defaults to the CPU count)
+        """
+        self.cache_dir = cache_dir or os.getenv('MEDIA_CACHE_DIR', 'media_cache')
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.max_workers = max_workers
+        self._pool = None
+        self._lock = threading.RLock()
+        self._in_flight: Dict[str, Future] = {}
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._pool is None:
+                # spawn keeps the workers independent of Streamlit's threads
+                self._pool = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+            return self._pool
+
+    def cache_path(self, content_hash: str, target: str) -> str:
+        spec = PLATFORM_SPECS[target]
+        extension = 'jpg' if spec['kind'] == 'image' else 'mp4'
+        return os.path.join(self.cache_dir, content_hash[:2], f"{content_hash}-{spec_key(spec)}.{extension}")
+
+    def submit(self, path: str, target: str) -> Future:
+        """
+        Schedule `path` for preprocessing for `target` (a key of PLATFORM_SPECS)
+
+        Returns:
+            Future resolving to the path of the processed file
+        """
+        if target not in PLATFORM_SPECS:
+            raise ValueError(f"Unknown target: {target}. Must be one of {', '.join(PLATFORM_SPECS)}")
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Media file not found: {path}")
+
+        destination = self.cache_path(hash_file(path), target)
+        if os.path.exists(destination):
+            future = Future()
+            future.set_result(destination)
+            return future
+
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        with self._lock:
+            if destination in self._in_flight:
+                return self._in_flight[destination]
+            future = self.pool.submit(_process, path, destination, target)
+            self._in_flight[destination] = future
+        future.add_done_callback(lambda _: self._forget(destination))
+        return future
+
+    def _forget(self, destination: str):
+        with self._lock:
+            self._in_flight.pop(destination, None)
+
+    def prepare(self, path: str, target: str) -> str:
+        """Preprocess one file and return the path of the processed copy"""
+        return self.submit(path, target).result()
+
+    def prepare_many(self, jobs: Iterable[Tuple[str, str]]) -> List[str]:
+        """
+        Preprocess many (path, target) pairs in parallel
+
+        Returns:
+            Processed file paths, in the order of `jobs`
+        """
+        futures = [self.submit(path, target) for path, target in jobs]
+        return [future.result() for future in futures]
+
+    def prepare_url(self, url: str, target: str) -> str:
+        """
+        Download a remote asset into the cache and preprocess it
+
+        The Instagram Graph API only accepts an `image_url`, so the returned file
+        still has to be published somewhere reachable before it can be posted.
+        """
+        downloads = os.path.join(self.cache_dir, 'downloads')
+        os.makedirs(downloads, exist_ok=True)
+        with requests.get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            with tempfile.NamedTemporaryFile(dir=downloads, delete=False) as f:
+                for chunk in response.iter_content(HASH_CHUNK_SIZE):
+                    f.write(chunk)
+        try:
+            return self.prepare(f.name, target)
+        finally:
+            os.remove(f.name)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None:
+                self._pool.shutdown()
+                self._pool = None
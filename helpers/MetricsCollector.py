@@ -0,0 +1,221 @@
+import argparse
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from helpers.MetricsStore import PLATFORMS, MetricsStore
+from helpers.StructuredLog import get_logger
+
+log = get_logger(__name__)
+
+
+class MetricsCollector:
+    def __init__(self, store: Optional[MetricsStore] = None, reddit=None, youtube=None,
+                 facebook=None, instagram=None, twitter=None):
+        """
+        Poll engagement metrics for every tracked item and append them to a MetricsStore
+
+        Each platform is polled through its bulk endpoint (YouTube videos.list,
+        Twitter tweet lookup, Reddit /api/info, Graph API multi-id reads), so one
+        poll costs a handful of requests regardless of how many items are tracked.
+        Managers that are not passed in are skipped.
+
+        Args:
+            store: Destination store (a default MetricsStore is created if omitted)
+            reddit: RedditManager instance
+            youtube: Authenticated YouTubeOperations instance
+            facebook: FacebookMinimal instance
+            instagram: InstagramAPI instance
+            twitter: TwitterManager instance
+        """
+        self.store = store if store is not None else MetricsStore()
+        self.reddit = reddit
+        self.youtube = youtube
+        self.facebook = facebook
+        self.instagram = instagram
+        self.twitter = twitter
+        self._stop = threading.Event()
+        self._thread = None
+
+    def discover(self, limit: int = 50) -> int:
+        """
+        Track the most recent items listed by every configured platform
+
+        A platform whose listing fails is logged and skipped.
+
+        Returns:
+            Number of items now tracked
+        """
+        listings = {
+            'reddit': lambda: self.reddit.list_posts(limit=limit),
+            'youtube': lambda: self.youtube.list_videos(max_results=min(limit, 50)),
+            'twitter': lambda: self.twitter.list_tweets(max_results=max(5, min(limit, 100))),
+            'facebook': lambda: self.facebook.list_posts(limit=limit, fields='minimal') or [],
+            'instagram': lambda: self.instagram.list_media(limit=limit, fields='minimal'),
+        }
+        for platform, listing in listings.items():
+            if not getattr(self, platform):
+                continue
+            try:
+                items = listing()
+            except Exception as e:
+                log.error("Listing %s items failed: %s", platform, e, extra={'platform': platform})
+                continue
+            # Post and MediaItem share the fields needed here
+            for item in items:
+                self.store.track(item.platform, item.id, item.created_at)
+        return len(self.store.tracked())
+
+    def poll(self) -> List[Tuple[str, str, str, int]]:
+        """
+        Fetch current metrics for all tracked items on every configured platform
+
+        A platform that fails is logged and left out; the others' samples are still returned.
+
+        Returns:
+            List of (platform, remote_id, metric, value) samples
+        """
+        samples = []
+        pollers = {
+            'youtube': self._poll_youtube,
+            'twitter': self._poll_twitter,
+            'reddit': self._poll_reddit,
+            'facebook': self._poll_facebook,
+            'instagram': self._poll_instagram,
+        }
+        for platform, poll in pollers.items():
+            if not getattr(self, platform):
+                continue
+            try:
+                metrics_by_id = poll()
+            except Exception as e:
+                log.error("Polling %s metrics failed: %s", platform, e, extra={'platform': platform})
+                continue
+            for remote_id, metrics in metrics_by_id.items():
+                for metric, value in metrics.items():
+                    samples.append((platform, str(remote_id), metric, value))
+        return samples
+
+    def _poll_youtube(self) -> Dict[str, dict]:
+        channel_id = self.youtube.channel_id
+        video_ids = [rid for rid in self.store.tracked('youtube') if rid != channel_id]
+        metrics = self.youtube.get_video_statistics(video_ids)
+        channel = self.youtube.get_channel_statistics()
+        if channel and channel_id:
+            metrics[channel_id] = {'followers': channel.get('followers')}
+        return metrics
+
+    def _poll_twitter(self) -> Dict[str, dict]:
+        me = self.twitter.get_follower_count()
+        tweet_ids = [rid for rid in self.store.tracked('twitter') if rid != me['id']]
+        metrics = self.twitter.get_tweet_metrics(tweet_ids)
+        metrics[me['id']] = {'followers': me.get('followers')}
+        return metrics
+
+    def _poll_reddit(self) -> Dict[str, dict]:
+        return self.reddit.get_post_metrics(self.store.tracked('reddit'))
+
+    def _poll_facebook(self) -> Dict[str, dict]:
+        post_ids = [rid for rid in self.store.tracked('facebook') if rid != self.facebook.page_id]
+        metrics = self.facebook.get_post_metrics(post_ids)
+        metrics[self.facebook.page_id] = {'followers': self.facebook.get_page_followers()}
+        return metrics
+
+    def _poll_instagram(self) -> Dict[str, dict]:
+        account_id = self.instagram.instagram_account_id
+        media_ids = [rid for rid in self.store.tracked('instagram') if rid != account_id]
+        metrics = self.instagram.get_media_metrics(media_ids)
+        account = self.instagram.get_account_info()
+        metrics[account_id] = {'followers': account.get('followers_count')}
+        return metrics
+
+    def collect(self) -> int:
+        """
+        Poll once and append the samples to the store
+
+        Returns:
+            Number of samples written
+        """
+        ts = int(datetime.now().timestamp())
+        samples = self.poll()
+        self.store.append_samples(samples, ts=ts)
+        return len(samples)
+
+    def start(self, interval: float = 900.0):
+        """Collect every `interval` seconds on a daemon thread until stop() is called"""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.is_set():
+                try:
+                    self.collect()
+                except Exception as e:
+                    log.error("Metrics collection failed: %s", e)
+                self._stop.wait(interval)
+
+        self._thread = threading.Thread(target=loop, name='metrics-collector', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+
+
+def _manager(platform: str):
+    if platform == 'reddit':
+        from helpers.RedditManager import RedditManager
+        return RedditManager()
+    if platform == 'youtube':
+        from helpers.YouTubeOperations import YouTubeOperations
+        yt = YouTubeOperations()
+        yt.authenticate()
+        return yt
+    if platform == 'facebook':
+        from helpers.FacebookMinimal import FacebookMinimal
+        return FacebookMinimal()
+    if platform == 'instagram':
+        from helpers.InstagramAPI import InstagramAPI
+        return InstagramAPI()
+    from helpers.TwitterManager import TwitterManager
+    return TwitterManager()
+
+
+if __name__ == '__main__':
+    # python -m helpers.MetricsCollector, from the repository root so .env and the store paths resolve
+    parser = argparse.ArgumentParser(description="Collect engagement metrics into the store the Analytics pages read")
+    parser.add_argument('--platform', action='append', choices=PLATFORMS,
+                        help="Platform to collect (repeatable, default: every platform that can be set up)")
+    parser.add_argument('--interval', type=float, default=900.0, help="Seconds between collections")
+    parser.add_argument('--discover', type=int, default=50, metavar='N',
+                        help="Track each platform's N most recent items before every collection")
+    parser.add_argument('--once', action='store_true', help="Collect once and exit")
+    args = parser.parse_args()
+
+    managers = {}
+    for platform in args.platform or PLATFORMS:
+        try:
+            managers[platform] = _manager(platform)
+        except Exception as e:
+            log.warning("Not collecting %s metrics: %s", platform, e, extra={'platform': platform})
+    if not managers:
+        parser.error("No platform could be set up; check the credentials in .env")
+
+    collector = MetricsCollector(**managers)
+    try:
+        while True:
+            try:
+                tracked = collector.discover(args.discover)
+                log.info("Collected %d samples for %d tracked items", collector.collect(), tracked)
+            except Exception as e:
+                log.error("Metrics collection failed: %s", e)
+                if args.once:
+                    raise SystemExit(1)
+            if args.once:
+                break
+            time.sleep(args.interval)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,227 @@
+import fcntl
+import os
+import threading
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+PLATFORMS = ('reddit', 'youtube', 'facebook', 'instagram', 'twitter')
+METRICS = ('views', 'likes', 'comments', 'shares', 'followers', 'score')
+
+# One file per column; every file grows by exactly one element per sample
+COLUMNS = {
+    'ts': np.dtype('<i8'),
+    'item': np.dtype('<i4'),
+    'metric': np.dtype('u1'),
+    'value': np.dtype('<i8'),
+}
+
+
+class MetricsStore:
+    def __init__(self, root: Optional[str] = None):
+        """
+        Append-only, columnar time-series store for engagement metrics
+
+        Every sample is one (timestamp, item, metric, value) row spread over
+        four flat binary column files, so reads are plain memory maps and
+        queries are vectorized NumPy operations.
+
+        Args:
+            root: Directory holding the column files (defaults to METRICS_STORE_DIR or ./metrics_store)
+        """
+        self.root = root or os.getenv('METRICS_STORE_DIR', 'metrics_store')
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._items_path = os.path.join(self.root, 'items.tsv')
+
+        # Item catalog: index in these lists is the item id stored in the 'item' column
+        self._item_keys: List[Tuple[str, str]] = []
+        self._item_created: List[int] = []
+        self._item_index: Dict[Tuple[str, str], int] = {}
+        self._items_offset = 0
+        self.refresh_items()
+
+    def _column_path(self, name: str) -> str:
+        return os.path.join(self.root, f'{name}.{COLUMNS[name].str.lstrip("<|")}')
+
+    def refresh_items(self) -> int:
+        """
+        Load catalog entries appended since the last refresh (possibly by another process)
+
+        Returns:
+            Number of tracked items
+        """
+        if not os.path.exists(self._items_path):
+            return len(self._item_keys)
+        with open(self._items_path, 'rb') as f:
+            f.seek(self._items_offset)
+            for line in f:
+                if not line.endswith(b'\n'):
+                    break
+                self._items_offset += len(line)
+                platform, remote_id, created = line.decode('utf-8').rstrip('\n').split('\t')
+                self._item_index[(platform, remote_id)] = len(self._item_keys)
+                self._item_keys.append((platform, remote_id))
+                self._item_created.append(int(created))
+        return len(self._item_keys)
+
+    # ITEMS
+    def track(self, platform: str, remote_id: str, created_at: Union[datetime, float, None] = None) -> int:
+        """
+        Register an item to collect metrics for
+
+        Args:
+            platform: One of PLATFORMS
+            remote_id: Platform id of the post, video, tweet or account
+            created_at: When the item was published (a datetime or Unix time), if known
+
+        Returns:
+            Integer item id used in the 'item' column
+        """
+        if platform not in PLATFORMS:
+            raise ValueError(f"Unknown platform: {platform}")
+        key = (platform, str(remote_id))
+        if key in self._item_index:
+            return self._item_index[key]
+        created = int(created_at.timestamp() if isinstance(created_at, datetime) else created_at or 0)
+        with self._lock, open(self._items_path, 'a', encoding='utf-8') as f:
+            # Item ids are line numbers, so catch up with other writers before appending
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                self.refresh_items()
+                if key not in self._item_index:
+                    f.write(f"{platform}\t{key[1]}\t{created}\n")
+                    f.flush()
+                    self.refresh_items()
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+        return self._item_index[key]
+
+    def item_id(self, platform: str, remote_id: str) -> Optional[int]:
+        """Item id for a tracked item, or None"""
+        return self._item_index.get((platform, str(remote_id)))
+
+    def tracked(self, platform: Optional[str] = None) -> List[str]:
+        """Remote ids of all tracked items, optionally for a single platform"""
+        return [rid for p, rid in self._item_keys if platform is None or p == platform]
+
+    def items(self) -> Dict[str, np.ndarray]:
+        """Item catalog as arrays indexed by item id"""
+        return {
+            'platform': np.array([PLATFORMS.index(p) for p, _ in self._item_keys], dtype='u1'),
+            'remote_id': np.array([rid for _, rid in self._item_keys], dtype=object),
+            'created': np.array(self._item_created, dtype='<i8'),
+        }
+
+    # WRITE
+    def append(self, ts: int, item_ids: Sequence[int], metrics: Sequence[str], values: Sequence[int]):
+        """
+        Append one batch of samples taken at the same timestamp
+
+        Args:
+            ts: Unix timestamp (seconds) of the poll
+            item_ids: Item id per sample
+            metrics: Metric name per sample (one of METRICS)
+            values: Metric value per sample
+        """
+        n = len(item_ids)
+        if not n:
+            return
+        columns = {
+            'ts': np.full(n, ts, dtype=COLUMNS['ts']),
+            'item': np.asarray(item_ids, dtype=COLUMNS['item']),
+            'metric': np.array([METRICS.index(m) for m in metrics], dtype=COLUMNS['metric']),
+            'value': np.asarray(values, dtype=COLUMNS['value']),
+        }
+        with self._lock, open(os.path.join(self.root, '.append.lock'), 'a') as lock:
+            # Rows must land in all four columns together, even with several writer processes
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                for name, data in columns.items():
+                    with open(self._column_path(name), 'ab') as f:
+                        f.write(data.tobytes())
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def append_samples(self, samples: Iterable[Tuple[str, str, str, int]], ts: Optional[int] = None):
+        """
+        Append (platform, remote_id, metric, value) samples, tracking unknown items on the way
+
+        Args:
+            samples: Iterable of (platform, remote_id, metric, value)
+            ts: Unix timestamp for the batch (defaults to now)
+        """
+        item_ids, metrics, values = [], [], []
+        for platform, remote_id, metric, value in samples:
+            if value is None:
+                continue
+            item_ids.append(self.track(platform, remote_id))
+            metrics.append(metric)
+            values.append(int(value))
+        self.append(ts if ts is not None else int(datetime.now().timestamp()), item_ids, metrics, values)
+
+    # READ
+    def __len__(self) -> int:
+        sizes = [
+            os.path.getsize(self._column_path(name)) // dtype.itemsize
+            if os.path.exists(self._column_path(name)) else 0
+            for name, dtype in COLUMNS.items()
+        ]
+        # A torn append leaves some columns longer; only complete rows count
+        return min(sizes)
+
+    def column(self, name: str, start: int = 0, stop: Optional[int] = None) -> np.ndarray:
+        """
+        Memory-mapped, read-only view of one column
+
+        Args:
+            name: One of 'ts', 'item', 'metric', 'value'
+            start: First row to include
+            stop: Row to stop at (defaults to the number of complete rows)
+        """
+        stop = len(self) if stop is None else stop
+        if stop <= start:
+            return np.empty(0, dtype=COLUMNS[name])
+        data = np.memmap(self._column_path(name), dtype=COLUMNS[name], mode='r', shape=(stop,))
+        return data[start:stop]
+
+    def columns(self, start: int = 0, stop: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """All four columns over the same row range"""
+        stop = len(self) if stop is None else stop
+        return {name: self.column(name, start, stop) for name in COLUMNS}
+
+    def series(self, metric: str, platform: Optional[str] = None, remote_ids: Optional[Sequence[str]] = None,
+               since: Optional[int] = None) -> Dict[str, np.ndarray]:
+        """
+        Time series of one metric, filtered with vectorized masks
+
+        Args:
+            metric: One of METRICS
+            platform: Restrict to items of this platform
+            remote_ids: Restrict to these items (requires platform)
+            since: Only samples at or after this Unix timestamp
+
+        Returns:
+            Dictionary of equally long 'ts', 'item' and 'value' arrays
+        """
+        cols = self.columns()
+        # Catch up with items tracked by other processes, or their rows index past the catalog
+        self.refresh_items()
+        mask = cols['metric'] == METRICS.index(metric)
+        if since is not None:
+            mask &= cols['ts'] >= since
+        if remote_ids is not None:
+            if platform is None:
+                raise ValueError("platform is required when filtering by remote_ids")
+            ids = [self.item_id(platform, rid) for rid in remote_ids]
+            mask &= np.isin(cols['item'], np.array([i for i in ids if i is not None], dtype=COLUMNS['item']))
+        elif platform is not None:
+            item_platform = self.items()['platform']
+            mask &= item_platform[cols['item']] == PLATFORMS.index(platform)
+        return {'ts': np.asarray(cols['ts'][mask]), 'item': np.asarray(cols['item'][mask]),
+                'value': np.asarray(cols['value'][mask])}
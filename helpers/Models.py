@@ -0,0 +1,121 @@
+import json
+from datetime import datetime
+from typing import Any, NamedTuple, Optional
+
+try:
+    # orjson decodes Graph API and Twitter payloads several times faster than json
+    import orjson
+    loads = orjson.loads
+except ImportError:
+    loads = json.loads
+
+
+class Post(NamedTuple):
+    """A Reddit post, tweet or Facebook page post; tuples keep large listings compact"""
+    platform: str
+    id: str
+    created_at: Optional[float] = None  # Unix time
+    title: Optional[str] = None
+    text: Optional[str] = None
+    author: Optional[str] = None
+    url: Optional[str] = None
+    likes: Optional[int] = None
+    comments: Optional[int] = None
+    shares: Optional[int] = None
+
+
+class MediaItem(NamedTuple):
+    """An Instagram media post or YouTube video"""
+    platform: str
+    id: str
+    created_at: Optional[float] = None  # Unix time
+    media_type: Optional[str] = None
+    title: Optional[str] = None  # Instagram caption or YouTube title
+    media_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    url: Optional[str] = None
+    views: Optional[int] = None
+    likes: Optional[int] = None
+    comments: Optional[int] = None
+
+
+def _timestamp(value: Optional[str]) -> Optional[float]:
+    """Unix time of an ISO-8601 timestamp as used by the Graph API, Twitter and YouTube"""
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def _int(value: Any) -> Optional[int]:
+    # YouTube sends counts as strings
+    return int(value) if value is not None else None
+
+
+def post_from_reddit(submission) -> Post:
+    """Post from a PRAW Submission"""
+    return Post(
+        'reddit', submission.id, submission.created_utc,
+        title=submission.title,
+        text=submission.selftext or None,
+        author=str(submission.author) if submission.author else None,
+        url=f"https://www.reddit.com{submission.permalink}",
+        likes=submission.score,
+        comments=submission.num_comments,
+    )
+
+
+def post_from_tweet(tweet) -> Post:
+    """Post from a Twitter API v2 tweet object (a dict or a tweepy Tweet)"""
+    data = getattr(tweet, 'data', tweet)
+    public_metrics = data.get('public_metrics') or {}
+    return Post(
+        'twitter', str(data['id']), _timestamp(data.get('created_at')),
+        text=data.get('text'),
+        author=data.get('author_id'),
+        url=f"https://twitter.com/i/web/status/{data['id']}",
+        likes=public_metrics.get('like_count'),
+        comments=public_metrics.get('reply_count'),
+        shares=(public_metrics['retweet_count'] + public_metrics.get('quote_count', 0)
+                if 'retweet_count' in public_metrics else None),
+    )
+
+
+def post_from_graph(post: dict) -> Post:
+    """Post from a Graph API page post"""
+    return Post(
+        'facebook', post['id'], _timestamp(post.get('created_time')),
+        text=post.get('message'),
+        url=post.get('permalink_url'),
+        likes=post.get('reactions', {}).get('summary', {}).get('total_count'),
+        comments=post.get('comments', {}).get('summary', {}).get('total_count'),
+        shares=post['shares'].get('count') if 'shares' in post else None,
+    )
+
+
+def media_from_instagram(media: dict) -> MediaItem:
+    """MediaItem from a Graph API Instagram media object"""
+    return MediaItem(
+        'instagram', media['id'], _timestamp(media.get('timestamp')),
+        media_type=media.get('media_type'),
+        title=media.get('caption'),
+        media_url=media.get('media_url'),
+        thumbnail_url=media.get('thumbnail_url'),
+        url=media.get('permalink'),
+        likes=media.get('like_count'),
+        comments=media.get('comments_count'),
+    )
+
+
+def media_from_youtube(item: dict) -> MediaItem:
+    """MediaItem from a YouTube video resource or search result"""
+    video_id = item['id']['videoId'] if isinstance(item['id'], dict) else item['id']
+    snippet = item.get('snippet', {})
+    statistics = item.get('statistics', {})
+    return MediaItem(
+        'youtube', video_id, _timestamp(snippet.get('publishedAt')),
+        media_type='VIDEO',
+        title=snippet.get('title'),
+        thumbnail_url=snippet.get('thumbnails', {}).get('default', {}).get('url'),
+        url=f"https://www.youtube.com/watch?v={video_id}",
+        views=_int(statistics.get('viewCount')),
+        likes=_int(statistics.get('likeCount')),
+        comments=_int(statistics.get('commentCount')),
+    )
@@ -0,0 +1,273 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Optional
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+from googleapiclient.http import HttpRequest
+
+from helpers.StructuredLog import get_logger
+
+# Load environment variables
+load_dotenv()
+
+log = get_logger(__name__, 'youtube')
+
+# YouTube Data API quota units per call; the daily quota resets at midnight Pacific time
+QUOTA_COSTS = {
+    'youtube.search.list': 100,
+    'youtube.videos.insert': 1600,
+    'youtube.videos.update': 50,
+    'youtube.videos.delete': 50,
+    'youtube.videos.rate': 50,
+    'youtube.videos.list': 1,
+    'youtube.channels.list': 1,
+    'youtube.playlistItems.list': 1,
+    'youtube.playlists.list': 1,
+    'youtube.commentThreads.list': 1,
+    'youtube.thumbnails.set': 50,
+}
+QUOTA_TIMEZONE = ZoneInfo('America/Los_Angeles')
+
+# Expensive calls and the cheaper way to get the same data
+CHEAPER_EQUIVALENTS = {
+    'youtube.search.list': (
+        'youtube.playlistItems.list',
+        "To list your own videos, page through the channel's uploads playlist with playlistItems.list "
+        "(1 unit instead of 100); list_my_videos() already does this",
+    ),
+    'youtube.videos.insert': (
+        'youtube.videos.list',
+        "Pass on_duplicate='reuse' to create_video() so a file that was uploaded before is looked up "
+        "with videos.list (1 unit) instead of uploaded again (1600)",
+    ),
+}
+
+# Methods whose cheaper equivalent has already been pointed out in this process
+_suggested = set()
+
+
+def quota_cost(method_id: str) -> int:
+    """Quota units of one call; unlisted list calls cost 1 and other calls 50"""
+    return QUOTA_COSTS.get(method_id, 1 if method_id.endswith('.list') else 50)
+
+
+def _parse_budgets(value: str) -> Dict[str, int]:
+    """Per-method budgets from a YOUTUBE_QUOTA_BUDGETS string like "search.list=1000,videos.insert=4800" """
+    budgets = {}
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        method, _, units = entry.partition('=')
+        method = method.strip()
+        budgets[method if method.startswith('youtube.') else f'youtube.{method}'] = int(units)
+    return budgets
+
+
+class QuotaExceededError(Exception):
+    """Raised instead of making a call that would go over a daily quota budget"""
+
+    def __init__(self, method_id: str, cost: int, remaining: int, resets_at: datetime, hint: Optional[str] = None):
+        message = (f"{method_id} costs {cost} quota units but only {remaining} are left today; "
+                   f"quota resets at {resets_at.astimezone():%Y-%m-%d %H:%M}")
+        super().__init__(f"{message}. {hint}" if hint else message)
+        self.method_id = method_id
+        self.cost = cost
+        self.remaining = remaining
+        self.resets_at = resets_at
+
+
+class QuotaLedger:
+    def __init__(self, project: Optional[str] = None, path: Optional[str] = None, daily_quota: Optional[int] = None,
+                 budgets: Optional[Dict[str, int]] = None, policy: Optional[str] = None,
+                 max_defer: Optional[float] = None):
+        """
+        Persistent record of the YouTube quota units spent per day, shared by all processes
+
+        Every call is charged before it is sent. A call that would take the day's total
+        over `daily_quota`, or its method over its own budget, is rejected with
+        QuotaExceededError, or with policy='defer' held until the quota resets (if that
+        is at most `max_defer` seconds away).
+
+        Args:
+            project: Whose quota this is, normally the OAuth client ID (defaults to CLIENT_ID)
+            path: SQLite database file (defaults to QUOTA_LEDGER_PATH or ./quota_ledger.db)
+            daily_quota: Units per day (defaults to YOUTUBE_DAILY_QUOTA or 10000)
+            budgets: Method ID -> units per day (defaults to YOUTUBE_QUOTA_BUDGETS)
+            policy: 'reject' or 'defer' (defaults to YOUTUBE_QUOTA_POLICY or 'reject')
+            max_defer: Longest wait for a reset in seconds (defaults to YOUTUBE_QUOTA_MAX_DEFER or 86400)
+        """
+        self.project = project or os.getenv('CLIENT_ID') or 'default'
+        self.path = path or os.getenv('QUOTA_LEDGER_PATH', 'quota_ledger.db')
+        self.daily_quota = daily_quota or int(os.getenv('YOUTUBE_DAILY_QUOTA', '10000'))
+        self.budgets = budgets if budgets is not None else _parse_budgets(os.getenv('YOUTUBE_QUOTA_BUDGETS', ''))
+        self.policy = policy or os.getenv('YOUTUBE_QUOTA_POLICY', 'reject')
+        if self.policy not in ('reject', 'defer'):
+            raise ValueError(f"Unknown quota policy: {self.policy} (expected 'reject' or 'defer')")
+        self.max_defer = max_defer if max_defer is not None else float(os.getenv('YOUTUBE_QUOTA_MAX_DEFER', '86400'))
+        self._lock = threading.Lock()
+        # Autocommit mode, so checking the budget and charging it is one BEGIN IMMEDIATE transaction
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS usage ('
+            ' day TEXT NOT NULL, project TEXT NOT NULL, method TEXT NOT NULL,'
+            ' calls INTEGER NOT NULL, units INTEGER NOT NULL, PRIMARY KEY (day, project, method))'
+        )
+
+    @staticmethod
+    def day(now: Optional[datetime] = None) -> str:
+        """The quota day (Pacific time) that `now` falls in"""
+        return (now or datetime.now(QUOTA_TIMEZONE)).astimezone(QUOTA_TIMEZONE).date().isoformat()
+
+    @staticmethod
+    def resets_at(now: Optional[datetime] = None) -> datetime:
+        """Next midnight Pacific time"""
+        now = (now or datetime.now(QUOTA_TIMEZONE)).astimezone(QUOTA_TIMEZONE)
+        return datetime.combine(now.date() + timedelta(days=1), datetime.min.time(), QUOTA_TIMEZONE)
+
+    def _remaining(self, day: str, method_id: str) -> int:
+        total, method_units = self._conn.execute(
+            'SELECT COALESCE(SUM(units), 0), COALESCE(SUM(CASE WHEN method = ? THEN units END), 0)'
+            ' FROM usage WHERE day = ? AND project = ?', (method_id, day, self.project)
+        ).fetchone()
+        remaining = self.daily_quota - total
+        if method_id in self.budgets:
+            remaining = min(remaining, self.budgets[method_id] - method_units)
+        return remaining
+
+    def charge(self, method_id: str) -> int:
+        """
+        Record one call, raising QuotaExceededError (or waiting, with policy='defer') if it is over budget
+
+        Returns:
+            Units charged
+        """
+        cost = quota_cost(method_id)
+        self._suggest(method_id)
+        while True:
+            with self._lock:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    day = self.day()
+                    remaining = self._remaining(day, method_id)
+                    if remaining >= cost:
+                        self._conn.execute(
+                            'INSERT INTO usage VALUES (?, ?, ?, 1, ?) ON CONFLICT (day, project, method)'
+                            ' DO UPDATE SET calls = calls + 1, units = units + excluded.units',
+                            (day, self.project, method_id, cost)
+                        )
+                    self._conn.execute('COMMIT')
+                except BaseException:
+                    self._conn.execute('ROLLBACK')
+                    raise
+            if remaining >= cost:
+                return cost
+
+            resets_at = self.resets_at()
+            wait = (resets_at - datetime.now(QUOTA_TIMEZONE)).total_seconds()
+            if self.policy != 'defer' or wait > self.max_defer:
+                raise QuotaExceededError(method_id, cost, max(remaining, 0), resets_at,
+                                         CHEAPER_EQUIVALENTS.get(method_id, (None, None))[1])
+            log.warning("YouTube quota exhausted; deferring %s until %s", method_id, f"{resets_at.astimezone():%H:%M}")
+            time.sleep(max(wait, 0) + 1)
+
+    def _suggest(self, method_id: str):
+        # Point out a cheaper equivalent the first time the method is used in this process
+        if method_id in CHEAPER_EQUIVALENTS and method_id not in _suggested:
+            _suggested.add(method_id)
+            log.info("Quota hint: %s costs %d units. %s", method_id, quota_cost(method_id),
+                     CHEAPER_EQUIVALENTS[method_id][1])
+
+    def usage(self, day: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+        """Calls and units per method on `day` (defaults to today)"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT method, calls, units FROM usage WHERE day = ? AND project = ? ORDER BY units DESC',
+                (day or self.day(), self.project)
+            ).fetchall()
+        return {method: {'calls': calls, 'units': units} for method, calls, units in rows}
+
+    def history(self, days: int = 30) -> Dict[str, int]:
+        """Units spent per day over the last `days` days"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT day, SUM(units) FROM usage WHERE project = ? GROUP BY day ORDER BY day DESC LIMIT ?',
+                (self.project, days)
+            ).fetchall()
+        return dict(reversed(rows))
+
+    def forecast(self, now: Optional[datetime] = None) -> dict:
+        """
+        Today's spend so far and when the quota runs out at today's average rate
+
+        Returns:
+            Dict with used, remaining, daily_quota, units_per_hour, exhausts_at
+            (None if the quota lasts until the reset) and resets_at
+        """
+        now = (now or datetime.now(QUOTA_TIMEZONE)).astimezone(QUOTA_TIMEZONE)
+        used = sum(entry['units'] for entry in self.usage(self.day(now)).values())
+        resets_at = self.resets_at(now)
+        hours = max((now - (resets_at - timedelta(days=1))).total_seconds() / 3600, 1 / 60)
+        rate = used / hours
+        remaining = max(self.daily_quota - used, 0)
+        exhausts_at = now + timedelta(hours=remaining / rate) if rate else None
+        return {
+            'used': used,
+            'remaining': remaining,
+            'daily_quota': self.daily_quota,
+            'units_per_hour': rate,
+            'exhausts_at': exhausts_at if exhausts_at and exhausts_at < resets_at else None,
+            'resets_at': resets_at,
+        }
+
+    def plan(self, method_ids: Iterable[str]) -> dict:
+        """
+        Cost of a batch of calls before making any of them
+
+        Returns:
+            Dict with cost, remaining, fits (whether the batch fits today's remaining
+            quota and per-method budgets) and suggestions for cheaper equivalents
+        """
+        counts: Dict[str, int] = {}
+        for method_id in method_ids:
+            counts[method_id] = counts.get(method_id, 0) + 1
+        cost = sum(quota_cost(method_id) * count for method_id, count in counts.items())
+        with self._lock:
+            day = self.day()
+            remaining = self._remaining(day, '')
+            fits = cost <= remaining and all(
+                quota_cost(method_id) * count <= self._remaining(day, method_id)
+                for method_id, count in counts.items()
+            )
+        return {
+            'cost': cost,
+            'remaining': remaining,
+            'fits': fits,
+            'suggestions': {method_id: CHEAPER_EQUIVALENTS[method_id][1]
+                            for method_id in counts if method_id in CHEAPER_EQUIVALENTS},
+        }
+
+
+class MeteredRequest(HttpRequest):
+    """googleapiclient request that is charged to a QuotaLedger once, before it is first sent"""
+
+    def __init__(self, *args, ledger: QuotaLedger, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.ledger = ledger
+        self._charged = False
+
+    def _charge(self):
+        if not self._charged:
+            self.ledger.charge(self.methodId)
+            self._charged = True
+
+    def execute(self, http=None, num_retries=0):
+        self._charge()
+        return super().execute(http=http, num_retries=num_retries)
+
+    def next_chunk(self, http=None, num_retries=0):
+        # A resumable upload sends many chunks but is charged as one videos.insert
+        self._charge()
+        return super().next_chunk(http=http, num_retries=num_retries)
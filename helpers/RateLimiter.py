@@ -0,0 +1,191 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+import requests
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+# (platform, endpoint class) -> (requests, per seconds); 0 requests means unlimited
+DEFAULT_LIMITS: Dict[Tuple[str, str], Tuple[int, float]] = {
+    ('reddit', 'api'): (100, 60),          # 100 queries per minute per OAuth client
+    ('facebook', 'api'): (200, 3600),      # Graph API: 200 calls per user per hour
+    ('instagram', 'api'): (200, 3600),
+    ('twitter', 'read'): (900, 900),       # 900 lookups per 15 minutes per user
+    ('twitter', 'write'): (200, 900),      # 200 tweets per 15 minutes per user
+    ('twitter', 'media'): (500, 900),      # Chunked media uploads, limited apart from tweets
+    ('youtube', 'api'): (0, 1),            # Bounded by daily quota rather than request rate
+}
+
+# How long to hold off when the Graph API reports 100% usage without saying when it resets
+GRAPH_COOLDOWN = 300
+
+
+class RateLimitExceeded(requests.exceptions.RequestException):
+    """Raised when a request would have to wait longer than the limiter's max_wait"""
+
+    def __init__(self, key: str, wait: float):
+        super().__init__(f"Rate limit for {key} exhausted; next request allowed in {wait:.0f}s")
+        self.key = key
+        self.wait = wait
+
+
+def endpoint_class(platform: str, method: str, url: str = '') -> str:
+    """Which of a platform's budgets a request draws from"""
+    if platform == 'twitter':
+        # One video is over a hundred APPENDs; they must not use up the budget for tweets
+        if '/media/upload' in url:
+            return 'media'
+        return 'read' if method in ('GET', 'HEAD') else 'write'
+    return 'api'
+
+
+def parse_limits(value: str) -> Dict[Tuple[str, str], Tuple[int, float]]:
+    """
+    Limits from a RATE_LIMITS string like "reddit=60/60,twitter.write=17/86400,youtube=0"
+
+    A bare platform name applies to all of that platform's endpoint classes.
+    """
+    limits = dict(DEFAULT_LIMITS)
+    for entry in filter(None, (part.strip() for part in value.split(','))):
+        name, _, spec = entry.partition('=')
+        platform, _, endpoint = name.strip().partition('.')
+        count, _, seconds = spec.partition('/')
+        keys = [(platform, endpoint)] if endpoint else [key for key in limits if key[0] == platform] or [(platform, 'api')]
+        for key in keys:
+            limits[key] = (int(count), float(seconds or 1))
+    return limits
+
+
+def _header_budget(platform: str, headers, capacity: int) -> Optional[Tuple[float, float]]:
+    """(requests remaining, seconds until reset) from a platform's rate-limit headers"""
+    if platform == 'twitter' and 'x-rate-limit-remaining' in headers:
+        return float(headers['x-rate-limit-remaining']), float(headers.get('x-rate-limit-reset', 0)) - time.time()
+    if platform == 'reddit' and 'x-ratelimit-remaining' in headers:
+        return float(headers['x-ratelimit-remaining']), float(headers.get('x-ratelimit-reset', 0))
+    if platform in ('facebook', 'instagram'):
+        usage = headers.get('x-app-usage') or headers.get('x-business-use-case-usage')
+        if usage:
+            try:
+                usage = json.loads(usage)
+            except ValueError:
+                return None
+            if 'call_count' not in usage:
+                # Business use case usage is keyed by object ID
+                usage = next((entries[0] for entries in usage.values() if entries), {})
+            percent = max(usage.get('call_count', 0), usage.get('total_time', 0), usage.get('total_cputime', 0))
+            return capacity * max(0, 100 - percent) / 100, GRAPH_COOLDOWN
+    return None
+
+
+class RateLimiter:
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, limits: Optional[Dict] = None, max_wait: Optional[float] = None):
+        """
+        Token buckets keyed by (platform, account, endpoint class), shared by every process on the host
+
+        Buckets live in SQLite, so all Streamlit sessions, CLI workers and collectors
+        using the same account draw from one budget. A request reserves a token even
+        if the bucket is empty and then waits until its token has refilled, so waiting
+        callers are served in arrival order. Budgets are tightened from the platform's
+        rate-limit headers when it sends them.
+
+        Args:
+            path: SQLite database file (defaults to RATE_LIMIT_DB or ./rate_limits.db)
+            limits: (platform, endpoint class) -> (requests, seconds); defaults to RATE_LIMITS over DEFAULT_LIMITS
+            max_wait: Raise RateLimitExceeded instead of waiting longer than this (defaults to RATE_LIMIT_MAX_WAIT)
+        """
+        self.path = path or os.getenv('RATE_LIMIT_DB', 'rate_limits.db')
+        self.limits = limits or parse_limits(os.getenv('RATE_LIMITS', ''))
+        self.max_wait = max_wait if max_wait is not None else float(os.getenv('RATE_LIMIT_MAX_WAIT', '300'))
+        self._lock = threading.Lock()
+        # Autocommit mode, so each bucket update can be its own BEGIN IMMEDIATE transaction
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            ' key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)'
+        )
+
+    @classmethod
+    def default(cls) -> 'RateLimiter':
+        """Shared limiter for this process"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def _update(self, key: str, capacity: int, window: float, change):
+        """
+        Refill `key`'s bucket and apply `change` to it in one transaction
+
+        change(tokens, rate) returns the new token count and the result to return.
+        """
+        rate = capacity / window
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                now = time.time()
+                row = self._conn.execute('SELECT tokens, updated FROM buckets WHERE key = ?', (key,)).fetchone()
+                tokens = min(capacity, row[0] + (now - row[1]) * rate) if row else capacity
+                tokens, result = change(tokens, rate)
+                self._conn.execute('INSERT OR REPLACE INTO buckets VALUES (?, ?, ?)', (key, tokens, now))
+                self._conn.execute('COMMIT')
+                return result
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+
+    def acquire(self, platform: str, account: str, method: str = 'GET', url: str = '') -> float:
+        """
+        Take a token for one request, sleeping until it is available
+
+        Returns:
+            Seconds waited
+        """
+        endpoint = endpoint_class(platform, method, url)
+        capacity, window = self.limits.get((platform, endpoint), (0, 1))
+        if not capacity:
+            return 0.0
+        key = f'{platform}:{account}:{endpoint}'
+
+        def reserve(tokens, rate):
+            wait = max(0.0, (1 - tokens) / rate)
+            if wait > self.max_wait:
+                raise RateLimitExceeded(key, wait)
+            return tokens - 1, wait
+
+        wait = self._update(key, capacity, window, reserve)
+        if wait:
+            time.sleep(wait)
+        return wait
+
+    def observe(self, platform: str, account: str, method: str, headers, url: str = ''):
+        """Tighten the bucket to what the platform's rate-limit headers say is left"""
+        endpoint = endpoint_class(platform, method, url)
+        capacity, window = self.limits.get((platform, endpoint), (0, 1))
+        if not capacity:
+            return
+        budget = _header_budget(platform, headers, capacity)
+        if budget is None:
+            return
+        remaining, reset_in = budget
+
+        def tighten(tokens, rate):
+            # Nothing left: go into debt so the next request waits until the reset
+            floor = remaining if remaining > 0 else -rate * max(reset_in, 0)
+            return min(tokens, floor), None
+
+        self._update(f'{platform}:{account}:{endpoint}', capacity, window, tighten)
+
+    def budgets(self) -> Dict[str, float]:
+        """Stored token count of every bucket (negative while requests are queued)"""
+        with self._lock:
+            return dict(self._conn.execute('SELECT key, tokens FROM buckets').fetchall())
@@ -1,13 +1,38 @@
+import itertools
 import praw
-import logging
-from typing import Optional, List
+import requests
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, NamedTuple, Optional, List, Tuple, Union
 from datetime import datetime
 from dotenv import load_dotenv
 import os
+from helpers.Instrumentation import current_operation, instrumented
+from helpers.Models import Post, post_from_reddit
+from helpers.Resilience import resilient_session
+from helpers.StructuredLog import get_logger
+from helpers.UploadIndex import UploadIndex
+from helpers.Verification import fingerprint, verification_cache
+from helpers.WriteAheadLog import WriteAheadLog
 
 # Load environment variables
 load_dotenv()
 
+log = get_logger(__name__, 'reddit')
+
+# Allowance for Reddit's clock when matching a submitted media post to the user's listing
+CLOCK_SKEW = 60
+
+
+class _PendingMedia(NamedTuple):
+    future: Future
+    subreddit: str
+    title: str
+    is_video: bool
+    submitted_at: float
+    content_hash: Optional[str]
+
 class RedditManager:
     def __init__(self):
         """
@@ -28,51 +53,279 @@ class RedditManager:
             raise ValueError(f"Missing required environment variables: {', '.join(missing_vars)}")
 
         # Initialize Reddit instance
-        self.reddit = praw.Reddit(
+        self.reddit = self._build_reddit()
+        self.upload_index = UploadIndex()
+
+        # Background media submissions (submit_media)
+        self.media_workers = int(os.getenv('REDDIT_MEDIA_WORKERS', '4'))
+        self.media_poll_interval = float(os.getenv('REDDIT_MEDIA_POLL_INTERVAL', '3'))
+        self.media_timeout = float(os.getenv('REDDIT_MEDIA_TIMEOUT', '600'))
+        self._media_lock = threading.Lock()
+        self._media_pool = None
+        self._media_poller = None
+        self._pending_media: List[_PendingMedia] = []
+        # Posts already matched to a submission, so two with the same title never resolve to one post
+        self._claimed_media: Dict[str, float] = {}
+        self._local = threading.local()
+        
+        self.logger = log
+        self.logger.debug("Reddit Manager initialized")
+
+    def _build_reddit(self) -> praw.Reddit:
+        # Optional endpoint overrides, e.g. to run against a local stand-in server
+        endpoints = {
+            setting: os.getenv(var)
+            for setting, var in (('oauth_url', 'REDDIT_OAUTH_URL'), ('reddit_url', 'REDDIT_URL'))
+            if os.getenv(var)
+        }
+        return praw.Reddit(
             client_id=self.client_id,
             client_secret=self.client_secret,
             user_agent=self.user_agent,
             username=self.username,
-            password=self.password
+            password=self.password,
+            requestor_kwargs={'session': resilient_session(requests.Session(), 'reddit', self.client_id)},
+            **endpoints
         )
-        
-        # Set up logging
-        logging.basicConfig(level=logging.INFO)
-        self.logger = logging.getLogger(__name__)
-        self.logger.info("Reddit Manager initialized successfully")
 
-    def create_post(self, subreddit_name: str, title: str, content: str, post_type: str = 'text') -> Optional[str]:
+    def _thread_reddit(self) -> praw.Reddit:
+        """A PRAW client for the calling background thread; PRAW clients are not thread-safe"""
+        reddit = getattr(self._local, 'reddit', None)
+        if reddit is None:
+            reddit = self._local.reddit = self._build_reddit()
+        return reddit
+
+    @instrumented
+    def warmup(self) -> str:
+        """
+        Fetch an OAuth token and verify the account (once per TTL across all instances).
+
+        PRAW itself is lazy, so without this the first API call pays for both.
+
+        Returns:
+            The authenticated username
+        """
+        return verification_cache.verify(
+            ('reddit', fingerprint(self.client_id, self.username)),
+            lambda: str(self.reddit.user.me())
+        )
+
+    @instrumented
+    def create_post(self, subreddit_name: str, title: str, content: str, post_type: str = 'text',
+                    on_duplicate: str = 'upload', idempotency_key: Optional[str] = None) -> Optional[str]:
         """
         Create a new Reddit post
+
+        Posts with the same idempotency_key are made once (see WriteAheadLog); a retry after
+        a timeout first looks for the post among your newest submissions.
         
         Args:
             subreddit_name: Name of the subreddit without 'r/'
             title: Title of the post
             content: Content of the post
             post_type: Type of post ('text', 'link', 'image')
+            on_duplicate: For image posts, what to do if the same image was uploaded before:
+                'upload' sends it again, 'reuse' links the already-hosted i.redd.it image,
+                'confirm' raises DuplicateUploadError
+            idempotency_key: Key identifying this post across retries
             
         Returns:
             Post ID if successful, None if failed
         """
-        try:
+        content_hash, existing = None, None
+        if post_type == 'image':
+            # Raised outside the try below so callers can ask the user to confirm
+            content_hash, existing = self.upload_index.check(content, 'reddit', on_duplicate)
+
+        def send():
             subreddit = self.reddit.subreddit(subreddit_name)
             
             if post_type == 'text':
                 post = subreddit.submit(title=title, selftext=content)
             elif post_type == 'link':
                 post = subreddit.submit(title=title, url=content)
+            elif post_type == 'image' and existing:
+                self.logger.info(f"Reusing uploaded image: {existing.remote_id}")
+                post = subreddit.submit(title=title, url=existing.remote_id)
             elif post_type == 'image':
                 post = subreddit.submit_image(title=title, image_path=content)
+                # The hosted image URL is what a later post can link to instead of re-uploading
+                self.upload_index.record(content_hash, 'reddit', post.url)
             else:
                 raise ValueError("Invalid post type. Must be 'text', 'link', or 'image'")
                 
             self.logger.info(f"Created post: {post.id}")
             return post.id
-            
+
+        def find(since):
+            for post in self.reddit.redditor(self.username).submissions.new(limit=25):
+                if post.created_utc < since:
+                    return None
+                if str(post.subreddit).lower() == subreddit_name.lower() and post.title == title:
+                    if post_type == 'image' and not existing:
+                        self.upload_index.record(content_hash, 'reddit', post.url)
+                    return post.id
+            return None
+
+        try:
+            return WriteAheadLog.default().run(
+                'reddit', 'create_post',
+                {'subreddit': subreddit_name, 'title': title, 'content': content, 'post_type': post_type},
+                send, find, key=idempotency_key
+            )
         except Exception as e:
             self.logger.error(f"Error creating post: {str(e)}")
             return None
 
+    def submit_media(self, subreddit_name: str, title: str, media: Union[str, List], post_type: str = 'image',
+                     on_duplicate: str = 'upload', **options) -> Future:
+        """
+        Submit an image, video or gallery post in the background
+
+        submit_image and submit_video normally wait on Reddit's websocket until the
+        post exists, which takes many seconds per post. Here the upload and submit run
+        on a worker thread without the websocket, and the post is found afterwards by
+        polling the user's newest submissions (one listing request per poll for all
+        posts in flight), so many media posts can be in flight at once.
+
+        Args:
+            subreddit_name: Name of the subreddit without 'r/'
+            title: Title of the post
+            media: Image or video path; for a gallery a list of image paths or of
+                {'image_path', 'caption', 'outbound_url'} dicts
+            post_type: 'image', 'video' or 'gallery'
+            on_duplicate: For images, as in create_post
+            **options: Passed on to PRAW's submit_image, submit_video or submit_gallery
+                (e.g. nsfw, flair_id, thumbnail_path)
+
+        Returns:
+            Future resolving to the post ID; it fails if the upload or submit fails, or
+            with TimeoutError if the post does not show up within REDDIT_MEDIA_TIMEOUT
+        """
+        if post_type not in ('image', 'video', 'gallery'):
+            raise ValueError("Invalid media post type. Must be 'image', 'video' or 'gallery'")
+        if post_type == 'gallery':
+            media = [{'image_path': item} if isinstance(item, str) else item for item in media]
+            paths = [item['image_path'] for item in media]
+        else:
+            paths = [media]
+        for path in paths:
+            if not os.path.exists(path):
+                raise FileNotFoundError(f"Media file not found: {path}")
+
+        content_hash, existing = None, None
+        if post_type == 'image':
+            # Raised here rather than from the future so callers can ask the user to confirm
+            content_hash, existing = self.upload_index.check(media, 'reddit', on_duplicate)
+
+        future = Future()
+        with self._media_lock:
+            if self._media_pool is None:
+                self._media_pool = ThreadPoolExecutor(self.media_workers, thread_name_prefix='reddit-media')
+            self._media_pool.submit(self._send_media, future, subreddit_name, title, media, post_type,
+                                    existing, content_hash, options)
+        return future
+
+    def _send_media(self, future: Future, subreddit_name: str, title: str, media, post_type: str,
+                    existing, content_hash: Optional[str], options: dict):
+        if not future.set_running_or_notify_cancel():
+            return
+        # Worker threads start with an empty context; label their requests like the caller's
+        token = current_operation.set('submit_media')
+        try:
+            self._submit_media(future, subreddit_name, title, media, post_type, existing, content_hash, options)
+        finally:
+            current_operation.reset(token)
+
+    def _submit_media(self, future: Future, subreddit_name: str, title: str, media, post_type: str,
+                      existing, content_hash: Optional[str], options: dict):
+        try:
+            subreddit = self._thread_reddit().subreddit(subreddit_name)
+            if existing:
+                self.logger.info(f"Reusing uploaded image: {existing.remote_id}")
+                future.set_result(subreddit.submit(title=title, url=existing.remote_id).id)
+                return
+            if post_type == 'gallery':
+                # Gallery submissions answer with the post itself
+                future.set_result(subreddit.submit_gallery(title, media, **options).id)
+                return
+
+            submitted_at = time.time()
+            if post_type == 'image':
+                subreddit.submit_image(title, media, without_websockets=True, **options)
+            else:
+                subreddit.submit_video(title, media, without_websockets=True, **options)
+        except Exception as e:
+            self.logger.error(f"Error submitting {post_type} post: {str(e)}")
+            future.set_exception(e)
+            return
+
+        with self._media_lock:
+            self._pending_media.append(_PendingMedia(future, subreddit_name.lower(), title, post_type == 'video',
+                                                     submitted_at, content_hash))
+            if self._media_poller is None:
+                self._media_poller = threading.Thread(target=self._poll_media, name='reddit-media-poller',
+                                                      daemon=True)
+                self._media_poller.start()
+
+    def _poll_media(self):
+        """Resolve pending media submissions from the user's newest posts until none are left"""
+        token = current_operation.set('submit_media')
+        try:
+            self._resolve_media()
+        finally:
+            current_operation.reset(token)
+
+    def _resolve_media(self):
+        while True:
+            time.sleep(self.media_poll_interval)
+            with self._media_lock:
+                pending = list(self._pending_media)
+            # Page back only as far as the oldest submission in flight; usually a single request
+            oldest = min(entry.submitted_at for entry in pending) - CLOCK_SKEW
+            try:
+                listing = self._thread_reddit().redditor(self.username).submissions.new(limit=None)
+                newest = list(itertools.takewhile(lambda post: post.created_utc >= oldest, listing))
+            except Exception as e:
+                self.logger.warning(f"Error polling for submitted media posts: {str(e)}")
+                newest = []
+
+            resolved = []
+            # Oldest first on both sides, so posts with the same title resolve in submission order
+            for entry in sorted(pending, key=lambda entry: entry.submitted_at):
+                match = next((post for post in reversed(newest)
+                              if post.id not in self._claimed_media
+                              and str(post.subreddit).lower() == entry.subreddit
+                              and post.title == entry.title
+                              and bool(getattr(post, 'is_video', False)) == entry.is_video
+                              and post.created_utc >= entry.submitted_at - CLOCK_SKEW), None)
+                if match is not None:
+                    self._claimed_media[match.id] = match.created_utc
+                    if entry.content_hash:
+                        # The hosted image URL is what a later post can link to instead of re-uploading
+                        self.upload_index.record(entry.content_hash, 'reddit', match.url)
+                    self.logger.info(f"Created post: {match.id}")
+                    entry.future.set_result(match.id)
+                    resolved.append(entry)
+                elif time.time() - entry.submitted_at > self.media_timeout:
+                    entry.future.set_exception(TimeoutError(
+                        f"Post '{entry.title}' did not appear in r/{entry.subreddit} "
+                        f"within {self.media_timeout:.0f}s"))
+                    resolved.append(entry)
+
+            # No submission still waiting (nor one just timed out) can match a post older than this
+            cutoff = min(oldest, time.time() - self.media_timeout - CLOCK_SKEW)
+            self._claimed_media = {post_id: created for post_id, created in self._claimed_media.items()
+                                   if created >= cutoff}
+
+            with self._media_lock:
+                for entry in resolved:
+                    self._pending_media.remove(entry)
+                if not self._pending_media:
+                    self._media_poller = None
+                    return
+
+    @instrumented
     def read_post(self, post_id: str) -> Optional[dict]:
         """
         Read a Reddit post by ID
@@ -101,6 +354,7 @@ class RedditManager:
             self.logger.error(f"Error reading post: {str(e)}")
             return None
 
+    @instrumented
     def update_post(self, post_id: str, new_content: str) -> bool:
         """
         Update a Reddit post's content
@@ -122,6 +376,7 @@ class RedditManager:
             self.logger.error(f"Error updating post: {str(e)}")
             return False
 
+    @instrumented
     def delete_post(self, post_id: str) -> bool:
         """
         Delete a Reddit post
@@ -144,6 +399,7 @@ class RedditManager:
         
 
 
+    @instrumented
     def get_recent_posts(self, limit=10):
         """
         Fetches recent posts from the authenticated user's account.
@@ -168,6 +424,70 @@ class RedditManager:
             self.logger.error(f"Error fetching user's recent posts: {str(e)}")
             return []
 
+    @instrumented
+    def list_posts(self, limit=100) -> List[Post]:
+        """
+        Fetches recent posts from the authenticated user's account as Post tuples.
+
+        Args:
+            limit (int): The number of recent posts to fetch.
+
+        Returns:
+            List[Post]: The posts, newest first; empty on error.
+        """
+        try:
+            return [post_from_reddit(post) for post in self.reddit.user.me().submissions.new(limit=limit)]
+        except Exception as e:
+            self.logger.error(f"Error listing user's posts: {str(e)}")
+            return []
+
+    @instrumented
+    def list_posts_page(self, limit=100, after: Optional[str] = None) -> Tuple[List[Post], Optional[str]]:
+        """
+        One page of the user's posts, newest first.
+
+        Args:
+            limit (int): Posts per page (at most 100).
+            after (str): Fullname of the last post of the previous page.
+
+        Returns:
+            Tuple[List[Post], Optional[str]]: The posts and the `after` of the next page (None on the
+            last page); empty on error.
+        """
+        try:
+            # By username rather than user.me(), which would cost a request per page
+            listing = self.reddit.redditor(self.username).submissions.new(
+                limit=limit, params={'after': after} if after else {})
+            posts = [post_from_reddit(post) for post in listing]
+        except Exception as e:
+            self.logger.error(f"Error listing user's posts: {str(e)}")
+            return [], None
+        return posts, f"t3_{posts[-1].id}" if len(posts) == limit else None
+
+    @instrumented
+    def get_post_metrics(self, post_ids: List[str]) -> dict:
+        """
+        Fetches score and comment counts for many posts at once.
+
+        Uses the /api/info endpoint, which PRAW batches 100 fullnames per request.
+
+        Args:
+            post_ids: Reddit post IDs (without the 't3_' prefix)
+
+        Returns:
+            Dictionary mapping post ID to {'score': int, 'comments': int}
+        """
+        try:
+            fullnames = [f"t3_{post_id}" for post_id in post_ids]
+            return {
+                post.id: {'score': post.score, 'comments': post.num_comments}
+                for post in self.reddit.info(fullnames=fullnames)
+            }
+
+        except Exception as e:
+            self.logger.error(f"Error fetching post metrics: {str(e)}")
+            return {}
+
 
 
 
@@ -0,0 +1,330 @@
+import json
+import os
+import random
+import socket
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Callable, Dict, Optional
+
+import httplib2
+import requests
+import urllib3
+from dotenv import load_dotenv
+
+from helpers.Instrumentation import InstrumentedAdapter, InstrumentedHttp, metrics
+from helpers.RateLimiter import RateLimiter
+from helpers.StructuredLog import get_logger
+
+# Load environment variables
+load_dotenv()
+
+log = get_logger(__name__)
+
+# Safe to send twice: a retry after the request may have been processed does no harm
+IDEMPOTENT_METHODS = frozenset({'GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE'})
+SERVER_ERRORS = frozenset({500, 502, 503, 504, 520, 522})
+
+
+class CircuitOpenError(requests.exceptions.RequestException):
+    """
+    Raised instead of sending a request while a platform's circuit is open
+
+    A requests exception, so the managers' existing handlers treat it like any
+    other failed request (and prawcore does not retry it).
+    """
+
+    def __init__(self, platform: str, retry_in: float):
+        super().__init__(f"{platform} API circuit open after repeated failures; retrying in {retry_in:.0f}s")
+        self.platform = platform
+        self.retry_in = retry_in
+
+
+class CircuitBreaker:
+    CLOSED, OPEN, HALF_OPEN = 'closed', 'open', 'half_open'
+
+    def __init__(self, platform: str, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        Stops requests to a platform that keeps failing
+
+        After `failure_threshold` consecutive failures the circuit opens and
+        requests fail immediately. After `reset_timeout` seconds one probe
+        request is let through: success closes the circuit, failure opens it again.
+        """
+        self.platform = platform
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Raise CircuitOpenError unless a request may be sent now"""
+        with self._lock:
+            if self.state == self.CLOSED:
+                return
+            retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+            if self.state == self.OPEN and retry_in <= 0:
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return
+        raise CircuitOpenError(self.platform, max(retry_in, 0))
+
+    def record_success(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def release(self):
+        """End a probe that neither succeeded nor failed (e.g. a programming error)"""
+        with self._lock:
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probing = False
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    log.warning("%s API circuit opened after %d failures", self.platform, self.failures,
+                                extra={'platform': self.platform})
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+
+
+class RetryPolicy:
+    def __init__(self, attempts: int = 4, base_delay: float = 0.5, max_delay: float = 30.0, deadline: float = 60.0):
+        """
+        Args:
+            attempts: Maximum tries per request, including the first
+            base_delay: Backoff before the first retry; doubles with each retry
+            max_delay: Cap on a single backoff
+            deadline: No retry is started that would end later than this many seconds after the first try
+        """
+        self.attempts = attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, retry: int) -> float:
+        """Full-jitter exponential backoff before retry number `retry` (0-based)"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** retry))
+
+
+def _graph_throttled(status, body) -> bool:
+    # Graph API throttling: application (4), user (17), page (32) and API-specific (613) limits
+    if status not in (400, 403):
+        return False
+    try:
+        return json.loads(body).get('error', {}).get('code') in (4, 17, 32, 613)
+    except (ValueError, AttributeError):
+        return False
+
+
+def _youtube_rate_limited(status, body) -> bool:
+    # Per-second limits are worth retrying; an exhausted daily quota is not
+    if status != 403:
+        return False
+    try:
+        errors = json.loads(body).get('error', {}).get('errors', [])
+    except (ValueError, AttributeError):
+        return False
+    return any(error.get('reason') in ('rateLimitExceeded', 'userRateLimitExceeded') for error in errors)
+
+
+# Platform-specific ways of saying "slow down" besides a 429
+THROTTLE_CHECKS: Dict[str, Callable] = {
+    'facebook': _graph_throttled,
+    'instagram': _graph_throttled,
+    'youtube': _youtube_rate_limited,
+}
+
+
+def _retry_after(headers) -> Optional[float]:
+    """Seconds the server asked us to wait, from Retry-After or the platform's rate-limit reset header"""
+    value = headers.get('retry-after')
+    if value:
+        try:
+            return float(value)
+        except ValueError:
+            try:
+                return parsedate_to_datetime(value).timestamp() - time.time()
+            except (TypeError, ValueError):
+                return None
+    if headers.get('x-rate-limit-reset'):  # Twitter: epoch seconds
+        return float(headers['x-rate-limit-reset']) - time.time()
+    if headers.get('x-ratelimit-reset'):  # Reddit: seconds from now
+        return float(headers['x-ratelimit-reset'])
+    return None
+
+
+class Resilience:
+    def __init__(self, platform: str, policy: RetryPolicy, breaker: CircuitBreaker):
+        """Retry and circuit-breaker decisions shared by the requests and httplib2 transports"""
+        self.platform = platform
+        self.policy = policy
+        self.breaker = breaker
+
+    def classify_response(self, method, status, headers, body) -> Optional[str]:
+        """'throttled' or 'failed' if the response should be retried, otherwise None"""
+        check = THROTTLE_CHECKS.get(self.platform)
+        if status == 429 or (check and check(status, body)):
+            return 'throttled'
+        if status in SERVER_ERRORS and method in IDEMPOTENT_METHODS:
+            return 'failed'
+        return None
+
+    @staticmethod
+    def transport_error(error) -> bool:
+        """Whether `error` means the platform could not be reached or did not answer"""
+        return isinstance(error, (
+            requests.exceptions.ConnectionError, requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError, httplib2.ServerNotFoundError,
+            ConnectionError, TimeoutError, socket.timeout, socket.gaierror,
+        ))
+
+    @classmethod
+    def retryable_exception(cls, method, error) -> bool:
+        # Failures to connect happen before anything was sent; anything later only for idempotent requests
+        if isinstance(error, (requests.exceptions.ConnectTimeout, ConnectionRefusedError,
+                              httplib2.ServerNotFoundError, socket.gaierror)):
+            return True
+        # requests wraps a refused connection as ConnectionError(MaxRetryError(reason=NewConnectionError))
+        reason = getattr(error.args[0], 'reason', None) if error.args else None
+        if isinstance(reason, urllib3.exceptions.NewConnectionError):
+            return True
+        return method in IDEMPOTENT_METHODS and cls.transport_error(error)
+
+    def call(self, method: str, send: Callable, replayable: bool = True):
+        """
+        Send through `send()` (which returns (status, headers, body, result)) with retries
+
+        Returns the last result; re-raises the last exception.
+        """
+        started = time.monotonic()
+        retry = 0
+        while True:
+            self.breaker.before_request()
+            try:
+                status, headers, body, result = send()
+            except Exception as e:
+                if not self.transport_error(e):
+                    self.breaker.release()
+                    raise
+                self.breaker.record_failure()
+                delay = self._next_delay(retry, started, None, replayable) \
+                    if self.retryable_exception(method, e) else None
+                if delay is None:
+                    raise
+            else:
+                outcome = self.classify_response(method, status, headers, body)
+                if outcome is None:
+                    if status >= 500:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    return result
+                if outcome == 'failed':
+                    self.breaker.record_failure()
+                else:
+                    # A throttled answer still shows the platform is up, and ends a half-open probe
+                    self.breaker.record_success()
+                delay = self._next_delay(retry, started, _retry_after(headers), replayable)
+                if delay is None:
+                    return result
+            metrics.retry(self.platform)
+            time.sleep(delay)
+            retry += 1
+
+    def _next_delay(self, retry, started, retry_after, replayable) -> Optional[float]:
+        """Backoff before the next try, or None if there should not be one"""
+        if not replayable or retry + 1 >= self.policy.attempts:
+            return None
+        delay = self.policy.backoff(retry)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        if time.monotonic() - started + delay > self.policy.deadline:
+            return None
+        return delay
+
+
+def _policy(platform: str) -> RetryPolicy:
+    # prawcore already retries server errors three times, so Reddit gets a smaller budget of its own
+    attempts = int(os.getenv('RETRY_ATTEMPTS', '2' if platform == 'reddit' else '4'))
+    return RetryPolicy(attempts=attempts, deadline=float(os.getenv('RETRY_DEADLINE_SECONDS', '60')))
+
+
+_layers: Dict[str, Resilience] = {}
+_layers_lock = threading.Lock()
+
+
+def resilience(platform: str) -> Resilience:
+    """The process-wide retry policy and circuit breaker for `platform`"""
+    with _layers_lock:
+        if platform not in _layers:
+            _layers[platform] = Resilience(platform, _policy(platform), CircuitBreaker(
+                platform,
+                failure_threshold=int(os.getenv('BREAKER_FAILURES', '5')),
+                reset_timeout=float(os.getenv('BREAKER_RESET_SECONDS', '30')),
+            ))
+        return _layers[platform]
+
+
+def breakers() -> Dict[str, CircuitBreaker]:
+    """Circuit breaker of every platform that has made requests"""
+    with _layers_lock:
+        return {platform: layer.breaker for platform, layer in _layers.items()}
+
+
+class ResilientAdapter(InstrumentedAdapter):
+    """InstrumentedAdapter that retries transient failures and honours the platform's circuit breaker and rate limits"""
+
+    def __init__(self, platform: str, account: str = 'default', **kwargs):
+        super().__init__(platform, **kwargs)
+        self.account = account
+
+    def send(self, request, stream=False, **kwargs):
+        limiter = RateLimiter.default()
+
+        def attempt():
+            # Every try, retries included, spends a token from the host-wide budget
+            limiter.acquire(self.platform, self.account, request.method, request.url)
+            response = InstrumentedAdapter.send(self, request, stream=stream, **kwargs)
+            limiter.observe(self.platform, self.account, request.method, response.headers, request.url)
+            return response.status_code, response.headers, b'' if stream else response.content, response
+
+        # A streamed body (an open file) cannot be sent twice
+        replayable = request.body is None or isinstance(request.body, (bytes, str))
+        return resilience(self.platform).call(request.method, attempt, replayable)
+
+
+def resilient_session(session, platform: str, account: str = 'default'):
+    """Route all of `session`'s requests through a ResilientAdapter drawing on `account`'s rate limits"""
+    adapter = ResilientAdapter(platform, account)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+
+class ResilientHttp(InstrumentedHttp):
+    """InstrumentedHttp (for googleapiclient) with the same retries, circuit breaker and rate limits"""
+
+    def __init__(self, http, platform: str, account: str = 'default', **kwargs):
+        super().__init__(http, platform, **kwargs)
+        self.account = account
+
+    def request(self, uri, method='GET', body=None, headers=None, *args, **kwargs):
+        limiter = RateLimiter.default()
+
+        def attempt():
+            limiter.acquire(self.platform, self.account, method, uri)
+            response, content = InstrumentedHttp.request(self, uri, method, body, headers, *args, **kwargs)
+            limiter.observe(self.platform, self.account, method, response, uri)
+            return response.status, response, content, (response, content)
+
+        replayable = body is None or isinstance(body, (bytes, str))
+        return resilience(self.platform).call(method, attempt, replayable)
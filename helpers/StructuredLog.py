@@ -0,0 +1,170 @@
+import atexit
+import copy
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+from datetime import datetime, timezone
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from helpers.Instrumentation import current_operation
+
+# Load environment variables
+load_dotenv()
+
+# Every helper logs below this logger, so one handler covers them all
+ROOT_LOGGER = 'helpers'
+
+# Attributes every LogRecord has; anything else was passed through `extra`
+_RECORD_ATTRIBUTES = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'sample'}
+
+_lock = threading.Lock()
+_listener: Optional[logging.handlers.QueueListener] = None
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line with time, level, logger, platform, operation, latency and extra fields"""
+
+    def format(self, record):
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for key, value in vars(record).items():
+            if key not in _RECORD_ATTRIBUTES and value is not None:
+                entry[key] = value
+        if record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    # The stock prepare() formats the whole record on the calling thread; only resolve what can't wait
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+
+class _ContextFilter(logging.Filter):
+    # Runs on the caller's thread, where the operation contextvar is still set
+    def filter(self, record):
+        if getattr(record, 'operation', None) is None:
+            record.operation = current_operation.get()
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def __init__(self, every: int):
+        """
+        Pass one in `every` records logged with extra={'sample': key}, per logger and key
+
+        The first record of each key always passes. Records without a sample key are
+        never dropped.
+        """
+        super().__init__()
+        self.every = max(every, 1)
+        self._counts = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, 'sample', None)
+        if key is None or self.every == 1:
+            return True
+        with self._lock:
+            count = self._counts.get((record.name, key), 0)
+            self._counts[(record.name, key)] = count + 1
+        return count % self.every == 0
+
+
+class _PlatformAdapter(logging.LoggerAdapter):
+    # Merge the platform into the caller's extra instead of replacing it
+    def process(self, msg, kwargs):
+        kwargs['extra'] = {**self.extra, **kwargs.get('extra', {})}
+        return msg, kwargs
+
+
+def configure(level: Optional[str] = None, fmt: Optional[str] = None, sample_every: Optional[int] = None,
+              stream=None):
+    """
+    Send every helper's log records through a queue to one background writer
+
+    Callers only build a record and put it on the queue; formatting and console I/O
+    happen on the listener thread. Safe to call more than once; later calls replace
+    the configuration.
+
+    Args:
+        level: Minimum level name (defaults to LOG_LEVEL or INFO)
+        fmt: 'json' or 'text' (defaults to LOG_FORMAT or json)
+        sample_every: Keep one in this many per-item and per-chunk records (defaults to LOG_SAMPLE_EVERY or 20)
+        stream: Where records are written (defaults to stderr)
+    """
+    global _listener
+    level = (level or os.getenv('LOG_LEVEL', 'INFO')).upper()
+    fmt = fmt or os.getenv('LOG_FORMAT', 'json')
+    sample_every = sample_every or int(os.getenv('LOG_SAMPLE_EVERY', '20'))
+
+    output = logging.StreamHandler(stream or sys.stderr)
+    output.setFormatter(JsonFormatter() if fmt == 'json' else
+                        logging.Formatter('%(asctime)s %(levelname)s %(name)s: %(message)s'))
+    records = queue.SimpleQueue()
+    handler = _QueueHandler(records)
+    handler.addFilter(SamplingFilter(sample_every))
+    handler.addFilter(_ContextFilter())
+
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+        logger = logging.getLogger(ROOT_LOGGER)
+        for old in list(logger.handlers):
+            logger.removeHandler(old)
+        logger.addHandler(handler)
+        logger.setLevel(level)
+        logger.propagate = False
+        _listener = logging.handlers.QueueListener(records, output)
+        _listener.start()
+
+
+def flush():
+    """Write out every queued record (the listener keeps running)"""
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener.start()
+
+
+def get_logger(name: str, platform: Optional[str] = None) -> logging.LoggerAdapter:
+    """
+    Logger for a helper module, configured on first use
+
+    Args:
+        name: Module name, normally __name__ (e.g. 'helpers.TwitterManager')
+        platform: Added to every record as the platform field
+    """
+    if not name.startswith(ROOT_LOGGER + '.'):
+        # Also when a helper is run as a script and __name__ is '__main__'
+        name = f'{ROOT_LOGGER}.{name.rpartition(".")[2]}'
+    with _lock:
+        configured = _listener is not None
+    if not configured:
+        configure()
+    return _PlatformAdapter(logging.getLogger(name), {'platform': platform})
+
+
+@atexit.register
+def _stop():
+    # Drain the queue before the interpreter exits
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
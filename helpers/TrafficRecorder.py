@@ -0,0 +1,156 @@
+import atexit
+import json
+import os
+import re
+import threading
+from typing import Any, Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+REDACTED = '[redacted]'
+# Query parameters, form fields, JSON keys and headers whose values never reach a trace
+SENSITIVE = re.compile(r'token|secret|password|passwd|authorization|cookie|signature|api_?key|^code$|^key$', re.I)
+# Response headers a replay needs: content type, pagination, upload sessions and rate-limit state
+KEPT_HEADERS = re.compile(r'^(content-type|location|range|x-goog-upload-.*|x-rate-?limit-.*|x-app-usage|'
+                          r'x-business-use-case-usage|x-ratelimit-.*|retry-after)$', re.I)
+
+
+def redact_url(url: str) -> str:
+    """`url` with the values of sensitive query parameters replaced"""
+    parts = urlsplit(url)
+    if not parts.query:
+        return url
+    query = [(key, REDACTED if SENSITIVE.search(key) else value)
+             for key, value in parse_qsl(parts.query, keep_blank_values=True)]
+    return parts._replace(query=urlencode(query, safe='[],{}().')).geturl()
+
+
+def _redact_json(value: Any) -> Any:
+    if isinstance(value, dict):
+        return {key: REDACTED if SENSITIVE.search(key) else _redact_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_redact_json(item) for item in value]
+    if isinstance(value, str) and value.startswith('http') and '?' in value:
+        # Paging links carry the access token
+        return redact_url(value)
+    return value
+
+
+def redact_body(body, content_type: Optional[str], max_body: int, size: Optional[int] = None) -> Optional[dict]:
+    """
+    A request or response body as it is written to a trace
+
+    JSON and form bodies keep their structure with sensitive values replaced. Binary
+    bodies (media uploads) and bodies over `max_body` bytes keep only their size, so
+    a replay can send or serve the same number of bytes; `size` is that number for a
+    body that is a stream.
+    """
+    if body is None:
+        return None
+    if isinstance(body, str):
+        body = body.encode()
+    if not isinstance(body, (bytes, bytearray)):
+        # A file or generator being streamed
+        return {'size': size}
+    if not body:
+        return None
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    if len(body) <= max_body:
+        if content_type.endswith('json') or body[:1] in (b'{', b'['):
+            try:
+                return {'json': _redact_json(json.loads(body))}
+            except ValueError:
+                pass
+        if content_type == 'application/x-www-form-urlencoded':
+            return {'form': [(key, REDACTED if SENSITIVE.search(key) else value)
+                             for key, value in parse_qsl(body.decode(), keep_blank_values=True)]}
+    return {'size': len(body)}
+
+
+class TrafficRecorder:
+    def __init__(self, path: str, max_body: Optional[int] = None):
+        """
+        Appends every outbound request and its response to a JSONL trace
+
+        One line per request with the wall-clock start time, platform, operation,
+        method, URL, status and latency. Bodies and headers are redacted first:
+        tokens, secrets and passwords never reach the file, request headers are
+        dropped and only the response headers a replay needs are kept. Several
+        processes can record into the same file.
+
+        Args:
+            path: JSONL file to append to
+            max_body: Largest body in bytes that is kept whole (defaults to TRAFFIC_TRACE_MAX_BODY or 64 KiB)
+        """
+        self.path = path
+        self.max_body = max_body or int(os.getenv('TRAFFIC_TRACE_MAX_BODY', str(64 * 1024)))
+        self._lock = threading.Lock()
+        # Whole lines are written with single appends, so processes sharing the file never split a line
+        self._file = open(path, 'ab', buffering=0)
+        self._pending = []
+        self._pending_size = 0
+        atexit.register(self.close)
+
+    def record(self, platform: str, operation: Optional[str], method: str, url: str, started: float,
+               latency: float, status: Optional[int] = None, request_body=None, request_type: Optional[str] = None,
+               response_headers: Optional[Dict[str, str]] = None, response_body=None, error: Optional[str] = None,
+               request_size: Optional[int] = None):
+        """Write one request/response pair; `started` is epoch seconds and `latency` seconds"""
+        headers = {key.lower(): value for key, value in (response_headers or {}).items() if KEPT_HEADERS.match(key)}
+        if 'location' in headers:
+            headers['location'] = redact_url(headers['location'])
+        entry = {
+            'time': round(started, 6),
+            'platform': platform,
+            'operation': operation,
+            'method': method,
+            'url': redact_url(url),
+            'request': redact_body(request_body, request_type, self.max_body, request_size),
+            'status': status,
+            'headers': headers,
+            'response': redact_body(response_body, headers.get('content-type'), self.max_body),
+            'latency': round(latency, 6),
+        }
+        if error:
+            entry['error'] = error
+        line = (json.dumps(entry, separators=(',', ':'), default=str) + '\n').encode()
+        with self._lock:
+            self._pending.append(line)
+            self._pending_size += len(line)
+            if self._pending_size >= 256 * 1024:
+                self._write()
+
+    def _write(self):
+        if self._pending and not self._file.closed:
+            self._file.write(b''.join(self._pending))
+        self._pending.clear()
+        self._pending_size = 0
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        with self._lock:
+            self._write()
+            self._file.close()
+
+
+_recorder: Optional[TrafficRecorder] = None
+_recorder_lock = threading.Lock()
+
+
+def traffic_recorder() -> Optional[TrafficRecorder]:
+    """The process's recorder if TRAFFIC_TRACE names a trace file, else None"""
+    global _recorder
+    path = os.getenv('TRAFFIC_TRACE')
+    if not path:
+        return None
+    with _recorder_lock:
+        if _recorder is None or _recorder.path != path:
+            _recorder = TrafficRecorder(path)
+        return _recorder
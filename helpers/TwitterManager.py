@@ -1,15 +1,53 @@
+import html
+import logging
+import math
+import mimetypes
 import os
-from typing import Dict, Any, List
+import re
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
 from dotenv import load_dotenv
 import tweepy
+from helpers.Instrumentation import current_operation, instrumented
+from helpers.FieldPresets import select_fields
+from helpers.Models import Post, loads, post_from_tweet
+from helpers.Resilience import resilient_session
+from helpers.StructuredLog import get_logger
+from helpers.Verification import fingerprint, verification_cache, verified
+from helpers.WriteAheadLog import WriteAheadLog
 
 # Load environment variables from .env file
 load_dotenv()
 
+log = get_logger(__name__, 'twitter')
+
+# Chunked media upload (v1.1); media_category by the file's MIME type
+MEDIA_CATEGORIES = {'image/gif': 'tweet_gif', 'image': 'tweet_image', 'video': 'tweet_video'}
+# tweepy raises these for the matching statuses of its own requests
+UPLOAD_ERRORS = {400: tweepy.BadRequest, 401: tweepy.Unauthorized, 403: tweepy.Forbidden, 404: tweepy.NotFound,
+                 429: tweepy.TooManyRequests}
+URL = re.compile(r'https?://\S+')
+
+
+def _comparable(text: Optional[str]) -> str:
+    """
+    Tweet text as sent and as read back alike
+
+    Twitter shortens links to t.co, appends a t.co link for attached media and
+    HTML-escapes &, < and > in the text it returns, so those are left out.
+    """
+    return ' '.join(URL.sub('', html.unescape(text or '')).split())
+
+
 class TwitterManager:
-    def __init__(self):
+    def __init__(self, lazy: bool = False):
         """
         Initialize Twitter API credentials from environment variables
+
+        With lazy=True no request is made here; credentials are verified by
+        warmup() or on the first API call instead.
         """
         # Get credentials from environment variables
         client_id = os.getenv('TWITTER_CLIENT_ID')
@@ -31,73 +69,251 @@ class TwitterManager:
             access_token_secret=access_token_secret,
             wait_on_rate_limit=True
         )
+        self.user_id = None
+        self._credentials_key = ('twitter', fingerprint(client_id, access_token))
+
+        self.upload_url = os.getenv('TWITTER_UPLOAD_URL', 'https://upload.twitter.com/1.1/media/upload.json')
+        # APPEND segments are at most 5 MB
+        self.upload_chunk_size = int(os.getenv('TWITTER_UPLOAD_CHUNK_SIZE', str(4 * 1024 * 1024)))
+        self.upload_concurrency = int(os.getenv('TWITTER_UPLOAD_CONCURRENCY', '4'))
+        self._upload_lock = threading.Lock()
+        self._media_pool = None
+        self._segment_pool = None
+        # Twitter's limits are per user, so the rate-limit budget is keyed by the same fingerprint
+        resilient_session(self.client.session, 'twitter', self._credentials_key[1])
 
-        # Verify credentials
+        if not lazy:
+            self.warmup()
+
+    @instrumented
+    def warmup(self) -> str:
+        """
+        Verify credentials (once per TTL across all instances) and return the user ID
+        """
+        if self.user_id is None:
+            self.user_id = verification_cache.verify(self._credentials_key, self._verify)
+        return self.user_id
+
+    def _verify(self) -> str:
         try:
-            self.client.get_me()
-            print("Twitter API v2 authentication successful!")
+            me = self.client.get_me()
+            log.info("Twitter API v2 authentication successful")
+            return str(me.data.id)
         except tweepy.TweepyException as e:
-            print(f"Error authenticating with Twitter: {str(e)}")
+            log.error("Error authenticating with Twitter: %s", e)
             raise
 
     # CREATE
-    def create_tweet(self, text: str) -> Dict[str, Any]:
+    @instrumented
+    @verified
+    def create_tweet(self, text: str, idempotency_key: str = None,
+                     media_paths: Optional[List[str]] = None) -> Dict[str, Any]:
         """
-        Create a new tweet
+        Create a new tweet, optionally with up to four images or one GIF or video
+
+        Media files are uploaded in parallel before the tweet is sent. Tweets with the
+        same idempotency_key are sent once (see WriteAheadLog); a retry after a timeout
+        first looks for the tweet among your latest.
         """
-        try:
-            response = self.client.create_tweet(text=text)
+        def send():
+            media_ids = None
+            if media_paths:
+                uploads = [self.submit_media_upload(path) for path in media_paths]
+                media_ids = [upload.result() for upload in uploads]
+            response = self.client.create_tweet(text=text, media_ids=media_ids)
             tweet_id = response.data['id']
-            print(f"Tweet created successfully! Tweet ID: {tweet_id}")
-            return response.data
+            log.info("Tweet created: %s", tweet_id, extra={'tweet_id': tweet_id})
+            return dict(response.data)
+
+        def find(since):
+            sent = _comparable(text)
+            for tweet in self.list_tweets(max_results=20):
+                if _comparable(tweet.text) == sent and (tweet.created_at or 0) >= since:
+                    return {'id': tweet.id, 'text': tweet.text}
+            return None
+
+        try:
+            return WriteAheadLog.default().run('twitter', 'create_tweet', {'text': text, 'media': media_paths or []},
+                                               send, find, key=idempotency_key)
         except tweepy.TweepyException as e:
-            print(f"Error creating tweet: {str(e)}")
+            log.error("Error creating tweet: %s", e)
             raise
 
+    def submit_media_upload(self, path: str, media_category: Optional[str] = None) -> Future:
+        """
+        Start a chunked media upload (INIT, APPEND, FINALIZE, STATUS) in the background
+
+        The file is read from disk one chunk (TWITTER_UPLOAD_CHUNK_SIZE) at a time, and
+        up to TWITTER_UPLOAD_CONCURRENCY APPEND segments are sent at once. Videos and
+        GIFs are then polled until Twitter has processed them, without holding up
+        other uploads.
+
+        Args:
+            path: Image, GIF or video file
+            media_category: 'tweet_image', 'tweet_gif' or 'tweet_video' (defaults by MIME type)
+
+        Returns:
+            Future resolving to the media ID
+        """
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"Media file not found: {path}")
+        with self._upload_lock:
+            if self._media_pool is None:
+                self._media_pool = ThreadPoolExecutor(self.upload_concurrency, thread_name_prefix='twitter-media')
+                self._segment_pool = ThreadPoolExecutor(self.upload_concurrency, thread_name_prefix='twitter-append')
+        # Worker threads start with an empty context; label their requests like the caller's
+        operation = current_operation.get() or 'upload_media'
+        return self._media_pool.submit(self._upload_media, path, media_category, operation)
+
+    @instrumented
+    def upload_media(self, path: str, media_category: Optional[str] = None) -> str:
+        """Upload one media file and return its media ID"""
+        return self.submit_media_upload(path, media_category).result()
+
+    def _upload(self, method: str, **kwargs) -> dict:
+        """One media/upload.json request with user auth, failing like tweepy's own requests"""
+        auth = tweepy.OAuth1UserHandler(self.client.consumer_key, self.client.consumer_secret,
+                                        self.client.access_token, self.client.access_token_secret).apply_auth()
+        response = self.client.session.request(method, self.upload_url, auth=auth, **kwargs)
+        if response.status_code >= 500:
+            raise tweepy.TwitterServerError(response)
+        if not 200 <= response.status_code < 300:
+            raise UPLOAD_ERRORS.get(response.status_code, tweepy.HTTPException)(response)
+        return response.json() if response.content else {}
+
+    def _upload_media(self, path: str, media_category: Optional[str], operation: str) -> str:
+        token = current_operation.set(operation)
+        try:
+            size = os.path.getsize(path)
+            media_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+            category = media_category or MEDIA_CATEGORIES.get(media_type) or \
+                MEDIA_CATEGORIES.get(media_type.split('/')[0], 'tweet_image')
+            media_id = self._upload('POST', data={'command': 'INIT', 'total_bytes': size, 'media_type': media_type,
+                                                  'media_category': category})['media_id_string']
+
+            segments = [self._segment_pool.submit(self._append, path, media_id, index, operation)
+                        for index in range(max(1, math.ceil(size / self.upload_chunk_size)))]
+            try:
+                for segment in segments:
+                    segment.result()
+            except Exception:
+                for segment in segments:
+                    segment.cancel()
+                raise
+
+            info = self._upload('POST', data={'command': 'FINALIZE', 'media_id': media_id}).get('processing_info')
+            while info and info.get('state') in ('pending', 'in_progress'):
+                time.sleep(info.get('check_after_secs', 1))
+                info = self._upload('GET', params={'command': 'STATUS', 'media_id': media_id}).get('processing_info')
+            if info and info.get('state') == 'failed':
+                raise tweepy.TweepyException(
+                    f"Processing {path} failed: {info.get('error', {}).get('message', 'unknown error')}")
+
+            log.info("Media uploaded: %s", media_id, extra={'media_id': media_id, 'bytes': size})
+            return media_id
+        except tweepy.TweepyException as e:
+            log.error("Error uploading %s: %s", path, e)
+            raise
+        finally:
+            current_operation.reset(token)
+
+    def _append(self, path: str, media_id: str, index: int, operation: str):
+        token = current_operation.set(operation)
+        try:
+            with open(path, 'rb') as f:
+                f.seek(index * self.upload_chunk_size)
+                chunk = f.read(self.upload_chunk_size)
+            self._upload('POST', data={'command': 'APPEND', 'media_id': media_id, 'segment_index': index},
+                         files={'media': chunk})
+            log.info("Uploaded segment %d of %s", index, media_id,
+                     extra={'media_id': media_id, 'bytes_sent': len(chunk), 'sample': 'chunk'})
+        finally:
+            current_operation.reset(token)
+
     # READ
-    def get_tweet(self, tweet_id: str) -> Dict[str, Any]:
+    @instrumented
+    @verified
+    def get_tweet(self, tweet_id: str, fields='analytics') -> Dict[str, Any]:
         """
         Get a specific tweet by its ID
+
+        `fields` is a preset ('minimal', 'display', 'analytics') or a list of tweet fields.
         """
         try:
             response = self.client.get_tweet(
                 id=tweet_id,
-                tweet_fields=['created_at', 'public_metrics']
+                tweet_fields=select_fields('twitter.tweet', fields)
             )
             if response.data:
-                print(f"Tweet fetched successfully! Content: {response.data['text']}")
+                log.debug("Tweet fetched: %s", tweet_id, extra={'tweet_id': tweet_id})
             return response.data
         except tweepy.TweepyException as e:
-            print(f"Error fetching tweet: {str(e)}")
+            log.error("Error fetching tweet %s: %s", tweet_id, e)
             raise
 
-    def get_my_tweets(self, max_results: int = 5) -> List[Dict[str, Any]]:
+    @instrumented
+    @verified
+    def get_my_tweets(self, max_results: int = 5, fields='minimal') -> List[Dict[str, Any]]:
         """
-        Get your own tweets
+        Get your own tweets, with the tweet fields of a preset or a list
         """
         try:
-            # First get your user ID
-            me = self.client.get_me()
-            user_id = me.data.id
+            # The user ID was looked up (and cached) when credentials were verified
+            user_id = self.user_id
             
-            # Then get your tweets
+            # Get your tweets
             response = self.client.get_users_tweets(
                 id=user_id,
                 max_results=max_results,
-                tweet_fields=['created_at']
+                tweet_fields=select_fields('twitter.tweet', fields)
             )
             if response.data:
-                print(f"Retrieved {len(response.data)} tweets")
-                for tweet in response.data:
-                    print(f"Tweet ID: {tweet.id}")
-                    print(f"Content: {tweet.text}")
-                    print("---")
+                log.debug("Retrieved %d tweets", len(response.data))
+                if log.isEnabledFor(logging.DEBUG):
+                    for tweet in response.data:
+                        log.debug("Tweet %s", tweet.id, extra={'tweet_id': tweet.id, 'sample': 'tweet'})
             return response.data if response.data else []
         except tweepy.TweepyException as e:
-            print(f"Error fetching tweets: {str(e)}")
+            log.error("Error fetching tweets: %s", e)
+            raise
+
+    @instrumented
+    @verified
+    def list_tweets(self, max_results: int = 100, fields='minimal') -> List[Post]:
+        """
+        Your most recent tweets as Post tuples
+
+        Decodes the raw response directly instead of building tweepy objects.
+        """
+        try:
+            response = self.client.request('GET', f'/2/users/{self.user_id}/tweets', params={
+                'max_results': max_results,
+                'tweet.fields': ','.join(select_fields('twitter.tweet', fields)),
+            }, user_auth=True)
+            return [post_from_tweet(tweet) for tweet in loads(response.content).get('data', [])]
+        except tweepy.TweepyException as e:
+            log.error("Error listing tweets: %s", e)
+            raise
+
+    @instrumented
+    @verified
+    def list_tweets_page(self, max_results: int = 100, fields='minimal',
+                         pagination_token: Optional[str] = None) -> Tuple[List[Post], Optional[str]]:
+        """One page of your tweets, newest first, as (Post tuples, token of the next page or None)"""
+        params = {'max_results': max_results, 'tweet.fields': ','.join(select_fields('twitter.tweet', fields))}
+        if pagination_token:
+            params['pagination_token'] = pagination_token
+        try:
+            response = self.client.request('GET', f'/2/users/{self.user_id}/tweets', params=params, user_auth=True)
+            page = loads(response.content)
+            return [post_from_tweet(tweet) for tweet in page.get('data', [])], page.get('meta', {}).get('next_token')
+        except tweepy.TweepyException as e:
+            log.error("Error listing tweets: %s", e)
             raise
 
     # UPDATE (Note: Twitter API v2 doesn't support direct tweet updates, but you can delete and recreate)
+    @instrumented
+    @verified
     def update_tweet(self, tweet_id: str, new_text: str) -> Dict[str, Any]:
         """
         Update a tweet by deleting and recreating it
@@ -108,20 +324,66 @@ class TwitterManager:
             # Create new tweet
             return self.create_tweet(new_text)
         except tweepy.TweepyException as e:
-            print(f"Error updating tweet: {str(e)}")
+            log.error("Error updating tweet %s: %s", tweet_id, e)
             raise
 
     # DELETE
+    @instrumented
+    @verified
     def delete_tweet(self, tweet_id: str) -> bool:
         """
         Delete a tweet
         """
         try:
             self.client.delete_tweet(tweet_id)
-            print(f"Tweet deleted successfully!")
+            log.info("Tweet deleted: %s", tweet_id, extra={'tweet_id': tweet_id})
             return True
         except tweepy.TweepyException as e:
-            print(f"Error deleting tweet: {str(e)}")
+            log.error("Error deleting tweet %s: %s", tweet_id, e)
+            raise
+
+    # METRICS
+    @instrumented
+    @verified
+    def get_tweet_metrics(self, tweet_ids: List[str]) -> Dict[str, Dict[str, int]]:
+        """
+        Get public metrics for many tweets, 100 ids per lookup request
+        """
+        try:
+            metrics = {}
+            tweet_ids = list(tweet_ids)
+            for i in range(0, len(tweet_ids), 100):
+                response = self.client.get_tweets(
+                    ids=tweet_ids[i:i + 100],
+                    tweet_fields=['public_metrics']
+                )
+                for tweet in response.data or []:
+                    public_metrics = tweet.public_metrics or {}
+                    metrics[str(tweet.id)] = {
+                        'views': public_metrics.get('impression_count'),
+                        'likes': public_metrics.get('like_count'),
+                        'comments': public_metrics.get('reply_count'),
+                        'shares': public_metrics.get('retweet_count', 0) + public_metrics.get('quote_count', 0),
+                    }
+            return metrics
+        except tweepy.TweepyException as e:
+            log.error("Error fetching tweet metrics: %s", e)
+            raise
+
+    @instrumented
+    @verified
+    def get_follower_count(self) -> Dict[str, Any]:
+        """
+        Get the authenticated user's id and follower count
+        """
+        try:
+            me = self.client.get_me(user_fields=['public_metrics'])
+            return {
+                'id': str(me.data.id),
+                'followers': me.data.public_metrics.get('followers_count'),
+            }
+        except tweepy.TweepyException as e:
+            log.error("Error fetching follower count: %s", e)
             raise
 
 # Example usage
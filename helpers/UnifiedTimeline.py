@@ -0,0 +1,84 @@
+import heapq
+import itertools
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from helpers.Models import MediaItem, Post
+from helpers.StructuredLog import get_logger
+
+log = get_logger(__name__)
+
+Item = Union[Post, MediaItem]
+
+# platform -> (manager method returning (items, cursor), its cursor argument, smallest and largest page)
+PAGES = {
+    'reddit': ('list_posts_page', 'after', 1, 100),
+    'twitter': ('list_tweets_page', 'pagination_token', 5, 100),
+    'facebook': ('list_posts_page', 'after', 1, 100),
+    'instagram': ('list_media_page', 'after', 1, 100),
+    'youtube': ('list_videos_page', 'page_token', 1, 50),
+}
+
+
+def paginate(fetch_page: Callable[[Optional[str]], Optional[Tuple[List[Item], Optional[str]]]]) -> Iterator[Item]:
+    """
+    Items of a cursor-paginated listing, fetching each page only once the previous one is used up
+
+    Args:
+        fetch_page: Given the cursor of a page (None for the first), returns its items and the
+            next page's cursor (None after the last); None ends the listing early
+    """
+    cursor = None
+    while True:
+        page = fetch_page(cursor)
+        if page is None:
+            return
+        items, cursor = page
+        yield from items
+        if not items or not cursor:
+            return
+
+
+def _newest_first(item: Item) -> float:
+    # Undated items go last
+    return item.created_at if item.created_at is not None else float('-inf')
+
+
+def _guarded(platform: str, items: Iterable[Item]) -> Iterator[Item]:
+    # One platform failing ends only its own part of the timeline
+    try:
+        yield from items
+    except Exception as e:
+        log.warning("Timeline stops early for %s: %s", platform, e, extra={'platform': platform})
+
+
+def unified_timeline(managers: Dict[str, Any], limit: Optional[int] = 50,
+                     page_size: Optional[int] = None) -> Iterator[Item]:
+    """
+    Newest items across platforms, merged lazily into one reverse-chronological stream
+
+    Every platform's listing is already newest first, so a k-way heap merge only
+    ever compares each platform's next item. The first page of each platform is
+    fetched when the first item is taken; after that a platform's next page is only
+    fetched once its buffered page is used up and its next item is needed. With
+    the page size at least `limit`, the newest `limit` items cost one request per
+    platform.
+
+    Args:
+        managers: Platform name (a key of PAGES) -> manager, e.g. {'reddit': RedditManager()}
+        limit: Most items to yield (None for all, paging as far back as the platforms go)
+        page_size: Items per request (defaults to `limit`, within each API's bounds)
+
+    Returns:
+        Iterator of Post and MediaItem tuples, newest first
+    """
+    streams = []
+    for platform, manager in managers.items():
+        method, cursor_argument, smallest, largest = PAGES[platform]
+        size = max(smallest, min(largest, page_size or limit or largest))
+
+        def fetch_page(cursor, fetch=getattr(manager, method), size=size, cursor_argument=cursor_argument):
+            return fetch(size, **{cursor_argument: cursor})
+
+        streams.append(_guarded(platform, paginate(fetch_page)))
+    merged = heapq.merge(*streams, key=_newest_first, reverse=True)
+    return itertools.islice(merged, limit) if limit is not None else merged
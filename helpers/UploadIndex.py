@@ -0,0 +1,100 @@
+import os
+import sqlite3
+import threading
+import time
+from typing import List, NamedTuple, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from helpers.MediaPreprocessor import hash_file
+
+# Load environment variables
+load_dotenv()
+
+# What create calls do when the same bytes were already uploaded to the platform
+ON_DUPLICATE = ('upload', 'reuse', 'confirm')
+
+
+class UploadRecord(NamedTuple):
+    content_hash: str
+    platform: str
+    remote_id: str
+    uploaded_at: float
+
+
+class DuplicateUploadError(Exception):
+    """Raised with on_duplicate='confirm' when the file was uploaded before"""
+
+    def __init__(self, record: UploadRecord):
+        self.record = record
+        super().__init__(
+            f"This file was already uploaded to {record.platform} as {record.remote_id} "
+            f"on {time.strftime('%Y-%m-%d %H:%M', time.localtime(record.uploaded_at))}"
+        )
+
+
+class UploadIndex:
+    def __init__(self, path: Optional[str] = None):
+        """
+        Persistent index of content hash -> (platform, remote id, upload time)
+
+        Args:
+            path: SQLite database file (defaults to UPLOAD_INDEX_PATH or ./upload_index.db)
+        """
+        self.path = path or os.getenv('UPLOAD_INDEX_PATH', 'upload_index.db')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+        with self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.execute(
+                'CREATE TABLE IF NOT EXISTS uploads ('
+                ' content_hash TEXT NOT NULL, platform TEXT NOT NULL, remote_id TEXT NOT NULL,'
+                ' uploaded_at REAL NOT NULL, PRIMARY KEY (content_hash, platform, remote_id))'
+            )
+
+    def lookup(self, content_hash: str, platform: str) -> List[UploadRecord]:
+        """Previous uploads of these bytes to `platform`, newest first"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT content_hash, platform, remote_id, uploaded_at FROM uploads'
+                ' WHERE content_hash = ? AND platform = ? ORDER BY uploaded_at DESC',
+                (content_hash, platform)
+            ).fetchall()
+        return [UploadRecord(*row) for row in rows]
+
+    def record(self, content_hash: str, platform: str, remote_id: str) -> UploadRecord:
+        """Remember that these bytes now live on `platform` as `remote_id`"""
+        entry = UploadRecord(content_hash, platform, str(remote_id), time.time())
+        with self._lock, self._conn:
+            self._conn.execute('INSERT OR REPLACE INTO uploads VALUES (?, ?, ?, ?)', entry)
+        return entry
+
+    def forget(self, platform: str, remote_id: str):
+        """Drop a remote asset, e.g. after it was deleted"""
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM uploads WHERE platform = ? AND remote_id = ?', (platform, str(remote_id)))
+
+    def check(self, file_path: str, platform: str, on_duplicate: str = 'upload') -> Tuple[str, Optional[UploadRecord]]:
+        """
+        Hash a file and look for an earlier upload of it
+
+        Args:
+            file_path: File about to be uploaded
+            platform: Destination platform
+            on_duplicate: 'upload' to ignore earlier uploads, 'reuse' to return the newest one,
+                'confirm' to raise DuplicateUploadError if there is one
+
+        Returns:
+            (content_hash, existing record or None)
+        """
+        if on_duplicate not in ON_DUPLICATE:
+            raise ValueError(f"Invalid on_duplicate. Must be one of {', '.join(ON_DUPLICATE)}")
+        content_hash = hash_file(file_path)
+        if on_duplicate == 'upload':
+            return content_hash, None
+        existing = self.lookup(content_hash, platform)
+        if not existing:
+            return content_hash, None
+        if on_duplicate == 'confirm':
+            raise DuplicateUploadError(existing[0])
+        return content_hash, existing[0]
@@ -0,0 +1,341 @@
+import argparse
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple, Union
+
+from dotenv import load_dotenv
+
+from helpers.StructuredLog import get_logger
+
+# Load environment variables
+load_dotenv()
+
+log = get_logger(__name__, 'youtube')
+
+# Resumable upload chunks must be multiples of 256 KiB
+CHUNK_UNIT = 256 * 1024
+MIN_CHUNK_SIZE = 4 * CHUNK_UNIT
+MAX_CHUNK_SIZE = 256 * CHUNK_UNIT
+# Chunk size aimed for, in seconds of one upload's share of the throughput: long enough that
+# the per-chunk round trip is small, short enough that a failed chunk costs little. Progress
+# is only seen per chunk, so chunks are also kept under half a tuning interval.
+CHUNK_SECONDS = 4.0
+# Weight of the newest interval in the smoothed throughput
+SMOOTHING = 0.5
+
+
+class FileProgress(NamedTuple):
+    job_id: int
+    file_path: str
+    title: str
+    state: str  # 'queued', 'uploading', 'done' or 'failed'
+    bytes_sent: int
+    total_bytes: int
+    deadline: Optional[float] = None  # Unix time
+    video_id: Optional[str] = None
+    error: Optional[str] = None
+
+
+class BatchProgress(NamedTuple):
+    files: int
+    queued: int
+    uploading: int
+    done: int
+    failed: int
+    bytes_sent: int
+    total_bytes: int
+    throughput: float  # Bytes per second over the last tuning interval
+    concurrency: int
+    chunk_size: int
+
+
+class _Job:
+    __slots__ = ('job_id', 'file_path', 'title', 'description', 'privacy_status', 'deadline', 'on_duplicate',
+                 'idempotency_key', 'state', 'bytes_sent', 'total_bytes', 'video_id', 'error')
+
+    def __init__(self, job_id, file_path, title, description, privacy_status, deadline, on_duplicate,
+                 idempotency_key):
+        self.job_id = job_id
+        self.file_path = file_path
+        self.title = title
+        self.description = description
+        self.privacy_status = privacy_status
+        self.deadline = deadline
+        self.on_duplicate = on_duplicate
+        self.idempotency_key = idempotency_key
+        self.state = 'queued'
+        self.bytes_sent = 0
+        self.total_bytes = os.path.getsize(file_path)
+        self.video_id = None
+        self.error = None
+
+    def progress(self) -> FileProgress:
+        return FileProgress(self.job_id, self.file_path, self.title, self.state, self.bytes_sent, self.total_bytes,
+                            self.deadline, self.video_id, self.error)
+
+
+def _youtube_client():
+    from helpers.YouTubeOperations import YouTubeOperations
+
+    client = YouTubeOperations()
+    client.authenticate(lazy=True)
+    return client
+
+
+class UploadScheduler:
+    def __init__(self, callback: Optional[Callable[[FileProgress, BatchProgress], None]] = None,
+                 max_concurrency: Optional[int] = None, client_factory: Optional[Callable] = None,
+                 interval: Optional[float] = None):
+        """
+        Runs many resumable YouTube uploads at once, earliest deadline first
+
+        Concurrency starts at 2 and is tuned every `interval` seconds by hill climbing
+        on the measured aggregate throughput: it keeps moving in the direction that
+        raised throughput, and steps back once more uploads stop adding any. Each file's
+        chunk size is picked when it starts, so one chunk takes about CHUNK_SECONDS (at
+        most half an interval) at the current per-upload rate.
+
+        Args:
+            callback: Called as callback(file, batch) whenever a file is queued, starts,
+                sends a chunk, finishes or fails; runs on worker threads
+            max_concurrency: Most uploads at once (defaults to YOUTUBE_UPLOAD_MAX_CONCURRENCY or 6)
+            client_factory: Returns an authenticated YouTubeOperations; each worker gets its
+                own, since the underlying httplib2 client is not thread-safe
+            interval: Seconds between tuning steps (defaults to YOUTUBE_UPLOAD_TUNE_INTERVAL or 5)
+        """
+        self.callback = callback
+        self.max_concurrency = max_concurrency or int(os.getenv('YOUTUBE_UPLOAD_MAX_CONCURRENCY', '6'))
+        self.client_factory = client_factory or _youtube_client
+        self.interval = interval or float(os.getenv('YOUTUBE_UPLOAD_TUNE_INTERVAL', '5'))
+        self.concurrency = min(2, self.max_concurrency)
+        self.chunk_size = MIN_CHUNK_SIZE
+        self.throughput = 0.0
+
+        self._lock = threading.Condition()
+        self._queue: List[Tuple[float, int, _Job]] = []
+        self._jobs: Dict[int, _Job] = {}
+        self._ids = itertools.count(1)
+        self._active = 0
+        self._closed = False
+        self._workers: List[threading.Thread] = []
+        self._tuner: Optional[threading.Thread] = None
+        # Hill-climbing state
+        self._direction = 1
+        self._last_rate = 0.0
+
+    def add(self, file_path: str, title: Optional[str] = None, description: str = '',
+            privacy_status: str = 'private', deadline: Union[float, datetime, None] = None,
+            on_duplicate: str = 'upload', idempotency_key: Optional[str] = None) -> int:
+        """
+        Queue a file; uploads without a deadline go after all that have one
+
+        Returns:
+            Job ID, as in the FileProgress reported for it
+        """
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"Video file not found: {file_path}")
+        if isinstance(deadline, datetime):
+            deadline = deadline.timestamp()
+        title = title or os.path.splitext(os.path.basename(file_path))[0]
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Scheduler is closed")
+            job = _Job(next(self._ids), file_path, title, description, privacy_status, deadline, on_duplicate,
+                       idempotency_key)
+            self._jobs[job.job_id] = job
+            heapq.heappush(self._queue, (deadline if deadline is not None else float('inf'), job.job_id, job))
+            self._lock.notify_all()
+        self._report(job)
+        return job.job_id
+
+    def start(self) -> 'UploadScheduler':
+        """Start the workers; files can still be added afterwards"""
+        with self._lock:
+            if self._workers:
+                return self
+            self._workers = [threading.Thread(target=self._work, name=f'youtube-upload-{i}', daemon=True)
+                             for i in range(self.max_concurrency)]
+            self._tuner = threading.Thread(target=self._tune, name='youtube-upload-tuner', daemon=True)
+        for worker in self._workers:
+            worker.start()
+        self._tuner.start()
+        return self
+
+    def close(self):
+        """Accept no more files; workers stop once the queue is drained"""
+        with self._lock:
+            self._closed = True
+            self._lock.notify_all()
+
+    def cancel(self):
+        """Drop every file that has not started yet and close the scheduler"""
+        with self._lock:
+            cancelled = [job for _, _, job in self._queue]
+            self._queue.clear()
+            for job in cancelled:
+                job.state, job.error = 'failed', 'Cancelled'
+        for job in cancelled:
+            self._report(job)
+        self.close()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every queued file is done or failed; returns False on timeout"""
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        with self._lock:
+            while self._queue or self._active:
+                remaining = deadline - time.monotonic() if deadline is not None else None
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._lock.wait(remaining)
+        return True
+
+    def snapshot(self) -> Tuple[List[FileProgress], BatchProgress]:
+        """Every file's progress, in the order added, and the batch totals"""
+        with self._lock:
+            return [job.progress() for job in self._jobs.values()], self._batch()
+
+    def _batch(self) -> BatchProgress:
+        states = [job.state for job in self._jobs.values()]
+        return BatchProgress(
+            files=len(states), queued=states.count('queued'), uploading=states.count('uploading'),
+            done=states.count('done'), failed=states.count('failed'),
+            bytes_sent=sum(job.bytes_sent for job in self._jobs.values()),
+            total_bytes=sum(job.total_bytes for job in self._jobs.values()),
+            throughput=self.throughput, concurrency=self.concurrency, chunk_size=self.chunk_size,
+        )
+
+    def _report(self, job: _Job):
+        if self.callback is None:
+            return
+        with self._lock:
+            file, batch = job.progress(), self._batch()
+        try:
+            self.callback(file, batch)
+        except Exception:
+            log.exception("Upload progress callback failed")
+
+    def _next_job(self) -> Optional[_Job]:
+        with self._lock:
+            while not (self._queue and self._active < self.concurrency):
+                if self._closed and not self._queue:
+                    return None
+                self._lock.wait()
+            _, _, job = heapq.heappop(self._queue)
+            self._active += 1
+            job.state = 'uploading'
+            return job
+
+    def _work(self):
+        client = None
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._report(job)
+
+            def progress(bytes_sent, total_bytes, job=job):
+                job.bytes_sent = bytes_sent
+                self._report(job)
+
+            try:
+                if client is None:
+                    client = self.client_factory()
+                response = client.create_video(job.title, job.description, job.privacy_status, job.file_path,
+                                               job.on_duplicate, job.idempotency_key,
+                                               chunk_size=self.chunk_size, progress=progress)
+                job.video_id, job.bytes_sent, job.state = response['id'], job.total_bytes, 'done'
+            except Exception as e:
+                job.error, job.state = f"{type(e).__name__}: {e}", 'failed'
+                log.error("Upload of %s failed: %s", job.file_path, e)
+            # Reported before the slot is freed, so wait() returns after the last callback
+            self._report(job)
+            with self._lock:
+                self._active -= 1
+                self._lock.notify_all()
+
+    def _tune(self):
+        last_sent, last_time = 0, time.monotonic()
+        while True:
+            time.sleep(self.interval)
+            with self._lock:
+                if self._closed and not self._queue and not self._active:
+                    return
+                now = time.monotonic()
+                sent = sum(job.bytes_sent for job in self._jobs.values())
+                measured = (sent - last_sent) / (now - last_time)
+                last_sent, last_time = sent, now
+                # Only a saturated interval says anything about the concurrency limit
+                saturated = self._active >= self.concurrency and measured > 0
+                rate = self.throughput = measured if not self.throughput or not saturated else \
+                    SMOOTHING * measured + (1 - SMOOTHING) * self.throughput
+                if not saturated:
+                    continue
+
+                if rate > self._last_rate * 1.05:
+                    pass  # The last step helped; take another
+                elif rate < self._last_rate * 0.95:
+                    self._direction = -self._direction
+                else:
+                    # No gain from more uploads at once; prefer fewer
+                    self._direction = -1
+                self._last_rate = rate
+                self.concurrency = max(1, min(self.max_concurrency, self.concurrency + self._direction))
+                per_upload = rate / self._active
+                seconds = min(CHUNK_SECONDS, self.interval / 2)
+                self.chunk_size = max(MIN_CHUNK_SIZE, min(MAX_CHUNK_SIZE,
+                                                          int(per_upload * seconds) // CHUNK_UNIT * CHUNK_UNIT))
+                self._lock.notify_all()
+            log.debug("Upload concurrency %d, chunk size %d", self.concurrency, self.chunk_size,
+                      extra={'throughput': round(rate), 'active': self._active})
+
+
+def _format_bytes(count: float) -> str:
+    for unit in ('B', 'KiB', 'MiB', 'GiB'):
+        if count < 1024 or unit == 'GiB':
+            return f"{count:.1f} {unit}"
+        count /= 1024
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Upload many videos to YouTube at once, earliest deadline first")
+    parser.add_argument('files', nargs='*', help="Video files; titles default to the file names")
+    parser.add_argument('--manifest', help="JSONL with file_path and optional title, description, "
+                                           "privacy_status and deadline (ISO 8601) per line")
+    parser.add_argument('--privacy', choices=['public', 'unlisted', 'private'], default='private')
+    parser.add_argument('--max-concurrency', type=int, help="Most uploads at once")
+    args = parser.parse_args()
+
+    jobs = [{'file_path': path} for path in args.files]
+    if args.manifest:
+        with open(args.manifest, encoding='utf-8') as f:
+            jobs += [json.loads(line) for line in f if line.strip()]
+    if not jobs:
+        parser.error("Pass video files or --manifest")
+
+    last_line = [0.0]
+
+    def report(file: FileProgress, batch: BatchProgress):
+        if file.state in ('done', 'failed'):
+            print(f"{file.state:>6}  {file.file_path}  {file.video_id or file.error}")
+        now = time.monotonic()
+        if now - last_line[0] >= 2 or batch.done + batch.failed == batch.files:
+            last_line[0] = now
+            print(f"{batch.done + batch.failed}/{batch.files} files, {_format_bytes(batch.bytes_sent)} of "
+                  f"{_format_bytes(batch.total_bytes)}, {_format_bytes(batch.throughput)}/s, "
+                  f"{batch.concurrency} at once, {_format_bytes(batch.chunk_size)} chunks")
+
+    scheduler = UploadScheduler(report, args.max_concurrency)
+    for job in jobs:
+        deadline = job.get('deadline')
+        scheduler.add(job['file_path'], job.get('title'), job.get('description', ''),
+                      job.get('privacy_status', args.privacy),
+                      datetime.fromisoformat(deadline) if deadline else None)
+    scheduler.start().close()
+    scheduler.wait()
+    _, batch = scheduler.snapshot()
+    raise SystemExit(1 if batch.failed else 0)
@@ -0,0 +1,86 @@
+import functools
+import hashlib
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Hashable
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+class VerificationCache:
+    def __init__(self, ttl: float = 3600.0):
+        """
+        Process-wide cache of successful credential checks
+
+        Keyed by platform plus a fingerprint of the credentials, so every manager
+        built with the same credentials shares one check per `ttl` seconds.
+        Concurrent callers for the same key wait for a single check; failures
+        are not cached.
+        """
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._results: Dict[Hashable, tuple] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+
+    def verify(self, key: Hashable, check: Callable[[], Any]) -> Any:
+        """Result of `check()` for `key`, running it only if there is no fresh cached result"""
+        cached = self._results.get(key)
+        if cached and cached[0] > time.monotonic():
+            return cached[1]
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            cached = self._results.get(key)
+            if cached and cached[0] > time.monotonic():
+                return cached[1]
+            result = check()
+            self._results[key] = (time.monotonic() + self.ttl, result)
+            return result
+
+    def invalidate(self, key: Hashable):
+        self._results.pop(key, None)
+
+
+verification_cache = VerificationCache(ttl=float(os.getenv('VERIFY_TTL_SECONDS', '3600')))
+
+
+def fingerprint(*parts) -> str:
+    """Stable, non-reversible key for a set of credentials"""
+    return hashlib.sha256('\0'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+def verified(method):
+    """Run the manager's warmup() (a cache hit after the first call) before `method`"""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        self.warmup()
+        return method(self, *args, **kwargs)
+    return wrapper
+
+
+def warmup_all(managers: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Verify several managers at the same time
+
+    Args:
+        managers: Name -> manager with a warmup() method
+
+    Returns:
+        Name -> warmup() result, or the exception it raised
+    """
+    if not managers:
+        return {}
+    with ThreadPoolExecutor(len(managers), thread_name_prefix='warmup') as pool:
+        futures = {name: pool.submit(manager.warmup) for name, manager in managers.items()}
+    results = {}
+    for name, future in futures.items():
+        try:
+            results[name] = future.result()
+        except Exception as e:
+            results[name] = e
+    return results
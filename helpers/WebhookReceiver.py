@@ -0,0 +1,352 @@
+import argparse
+import collections
+import hmac
+import json
+import os
+import threading
+import time
+import xml.etree.ElementTree as ElementTree
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Iterable, List, NamedTuple, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+import requests
+from dotenv import load_dotenv
+
+from helpers.Models import loads
+from helpers.StructuredLog import get_logger
+
+# Load environment variables
+load_dotenv()
+
+log = get_logger(__name__)
+
+# Larger bodies are refused; real notifications are a few KiB
+MAX_BODY = 1024 * 1024
+
+# Graph API feed verbs -> change actions
+GRAPH_VERBS = {'add': 'created', 'edited': 'updated', 'edit': 'updated', 'remove': 'deleted',
+               'hide': 'deleted', 'unhide': 'created'}
+
+YOUTUBE_HUB = 'https://pubsubhubbub.appspot.com/subscribe'
+YOUTUBE_TOPIC = 'https://www.youtube.com/xml/feeds/videos.xml?channel_id='
+ATOM_NAMESPACES = {
+    'atom': 'http://www.w3.org/2005/Atom',
+    'yt': 'http://www.youtube.com/xml/schemas/2015',
+    'at': 'http://purl.org/atompub/tombstones/1.0',
+}
+
+
+class Change(NamedTuple):
+    """One pushed change, the same shape for every platform"""
+    platform: str
+    kind: str  # 'post', 'comment', 'media' or 'video'
+    action: str  # 'created', 'updated' or 'deleted'
+    remote_id: str
+    account_id: Optional[str] = None  # Page, Instagram account or YouTube channel
+    parent_id: Optional[str] = None  # Post or media a comment belongs to
+    time: Optional[float] = None  # Unix time
+
+
+def sign(body: bytes, secret: str, algorithm: str = 'sha256') -> str:
+    """Signature header value for `body`, as Meta (sha256) and the YouTube hub (sha1) send it"""
+    return f"{algorithm}={hmac.new(secret.encode(), body, algorithm).hexdigest()}"
+
+
+def verify_signature(body: bytes, header: Optional[str], secret: Optional[str]) -> bool:
+    """Whether `header` ("sha256=<hex>" or "sha1=<hex>") is a valid HMAC of `body` under `secret`"""
+    if not header or not secret or '=' not in header:
+        return False
+    algorithm = header.partition('=')[0]
+    if algorithm not in ('sha1', 'sha256'):
+        return False
+    return hmac.compare_digest(sign(body, secret, algorithm), header)
+
+
+def parse_graph(payload: dict) -> List[Change]:
+    """Changes in a Graph API webhook delivery (page feed, Instagram media and comments)"""
+    changes = []
+    platform = {'page': 'facebook', 'instagram': 'instagram'}.get(payload.get('object'))
+    if platform is None:
+        return changes
+    for entry in payload.get('entry', []):
+        account_id = str(entry.get('id'))
+        for change in entry.get('changes', []):
+            field, value = change.get('field'), change.get('value') or {}
+            when = value.get('created_time') or entry.get('time')
+            when = float(when) if isinstance(when, (int, float)) else None
+            if platform == 'facebook' and field == 'feed':
+                action = GRAPH_VERBS.get(value.get('verb'))
+                if action is None:
+                    continue
+                if value.get('item') == 'comment':
+                    changes.append(Change('facebook', 'comment', action, str(value['comment_id']),
+                                          account_id, str(value.get('post_id')), when))
+                elif value.get('post_id'):
+                    changes.append(Change('facebook', 'post', action, str(value['post_id']), account_id, None, when))
+            elif platform == 'instagram' and field in ('comments', 'live_comments'):
+                media_id = (value.get('media') or {}).get('id')
+                changes.append(Change('instagram', 'comment', 'created', str(value['id']), account_id,
+                                      str(media_id) if media_id else None, when))
+            elif platform == 'instagram' and field in ('media', 'mentions'):
+                media_id = value.get('media_id') or value.get('id')
+                if media_id:
+                    action = GRAPH_VERBS.get(value.get('verb'), 'created')
+                    changes.append(Change('instagram', 'media', action, str(media_id), account_id, None, when))
+    return changes
+
+
+def _atom_time(value: Optional[str]) -> Optional[float]:
+    return datetime.fromisoformat(value).timestamp() if value else None
+
+
+def parse_youtube(body: bytes) -> List[Change]:
+    """Changes in a YouTube PubSubHubbub Atom notification"""
+    root = ElementTree.fromstring(body)
+    changes = []
+    for entry in root.findall('atom:entry', ATOM_NAMESPACES):
+        published = _atom_time(entry.findtext('atom:published', namespaces=ATOM_NAMESPACES))
+        updated = _atom_time(entry.findtext('atom:updated', namespaces=ATOM_NAMESPACES))
+        # The hub notifies both uploads and metadata edits; only a fresh entry is a new video
+        action = 'created' if published and updated and updated - published < 300 else 'updated'
+        changes.append(Change('youtube', 'video', action,
+                              entry.findtext('yt:videoId', namespaces=ATOM_NAMESPACES),
+                              entry.findtext('yt:channelId', namespaces=ATOM_NAMESPACES), None, updated))
+    for deleted in root.findall('at:deleted-entry', ATOM_NAMESPACES):
+        channel = deleted.findtext('at:by/atom:uri', namespaces=ATOM_NAMESPACES) or ''
+        changes.append(Change('youtube', 'video', 'deleted', deleted.get('ref', '').rpartition(':')[2],
+                              channel.rpartition('/')[2] or None, None, _atom_time(deleted.get('when'))))
+    return changes
+
+
+class ChangeFeed:
+    def __init__(self, maxlen: int = 10000):
+        """
+        Recent changes in arrival order, with listeners called for each new one
+
+        Platforms redeliver notifications they consider unacknowledged, so a change
+        seen in the last `maxlen` is dropped.
+        """
+        self._lock = threading.Lock()
+        self._changes = collections.deque(maxlen=maxlen)
+        self._seen = collections.OrderedDict()
+        self._maxlen = maxlen
+        self._seq = 0
+        self._listeners: List[Callable[[Change], None]] = []
+
+    def subscribe(self, listener: Callable[[Change], None]):
+        with self._lock:
+            self._listeners.append(listener)
+
+    def publish(self, changes: Iterable[Change]) -> int:
+        """Append new changes and notify listeners; returns how many were new"""
+        fresh = []
+        with self._lock:
+            for change in changes:
+                if change in self._seen:
+                    continue
+                self._seen[change] = None
+                if len(self._seen) > self._maxlen:
+                    self._seen.popitem(last=False)
+                self._seq += 1
+                self._changes.append((self._seq, change))
+                fresh.append(change)
+            listeners = list(self._listeners)
+        for change in fresh:
+            for listener in listeners:
+                try:
+                    listener(change)
+                except Exception as e:
+                    log.error("Change listener failed for %s: %s", change, e, extra={'platform': change.platform})
+        return len(fresh)
+
+    def since(self, seq: int = 0) -> List[Tuple[int, Change]]:
+        """(sequence number, change) pairs after `seq`, oldest first"""
+        with self._lock:
+            return [(n, change) for n, change in self._changes if n > seq]
+
+
+def cache_updater(prefetcher=None, store=None, upload_index=None) -> Callable[[Change], None]:
+    """
+    Listener that keeps local state in step with pushed changes
+
+    Args:
+        prefetcher: ListingPrefetcher whose listings for the platform are dropped
+        store: MetricsStore that starts tracking new posts, media and videos
+        upload_index: UploadIndex that forgets deleted uploads
+    """
+    def update(change: Change):
+        if prefetcher:
+            prefetcher.invalidate(change.platform)
+        if store and change.action == 'created' and change.kind != 'comment':
+            store.track(change.platform, change.remote_id, change.time)
+        if upload_index and change.action == 'deleted':
+            upload_index.forget(change.platform, change.remote_id)
+    return update
+
+
+class _WebhookHandler(BaseHTTPRequestHandler):
+    feed: ChangeFeed = None
+    app_secret: Optional[str] = None
+    youtube_secret: Optional[str] = None
+    verify_token: Optional[str] = None
+
+    def _reply(self, status: int, body: bytes = b''):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        # Subscription handshakes: echo hub.challenge if we asked for this subscription
+        url = urlparse(self.path)
+        query = {key: values[0] for key, values in parse_qs(url.query).items()}
+        challenge = query.get('hub.challenge', '').encode()
+        if url.path == '/webhooks/graph':
+            ok = query.get('hub.mode') == 'subscribe' and self.verify_token and hmac.compare_digest(
+                query.get('hub.verify_token', ''), self.verify_token)
+        elif url.path == '/webhooks/youtube':
+            ok = query.get('hub.mode') in ('subscribe', 'unsubscribe', 'denied') and \
+                query.get('hub.topic', '').startswith(YOUTUBE_TOPIC)
+        else:
+            return self._reply(404)
+        self._reply(200, challenge) if ok else self._reply(403)
+
+    def do_POST(self):
+        path = urlparse(self.path).path
+        try:
+            length = int(self.headers.get('Content-Length', 0))
+        except ValueError:
+            length = -1
+        # A negative length would read until the client hangs up
+        if length < 0:
+            return self._reply(400)
+        if length > MAX_BODY:
+            return self._reply(413)
+        body = self.rfile.read(length)
+        try:
+            if path == '/webhooks/graph':
+                if not verify_signature(body, self.headers.get('X-Hub-Signature-256'), self.app_secret):
+                    return self._reply(401)
+                changes = parse_graph(loads(body))
+            elif path == '/webhooks/youtube':
+                if not verify_signature(body, self.headers.get('X-Hub-Signature'), self.youtube_secret):
+                    # PubSubHubbub: acknowledge but ignore, so a forged request learns nothing
+                    return self._reply(202)
+                changes = parse_youtube(body)
+            else:
+                return self._reply(404)
+        except (ValueError, KeyError, ElementTree.ParseError) as e:
+            log.warning("Malformed webhook on %s: %s", path, e)
+            return self._reply(400)
+        self.feed.publish(changes)
+        self._reply(200)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_webhooks(feed: ChangeFeed, port: Optional[int] = None, host: str = '0.0.0.0') -> Optional[ThreadingHTTPServer]:
+    """
+    Receive Graph API and YouTube notifications on a background thread
+
+    Graph API deliveries go to /webhooks/graph and are checked against FB_APP_SECRET;
+    the subscription handshake must present WEBHOOK_VERIFY_TOKEN. YouTube hub
+    notifications go to /webhooks/youtube and are checked against YOUTUBE_WEBHOOK_SECRET
+    (the hub.secret given when subscribing).
+
+    Args:
+        feed: Where verified changes are published
+        port: Port to listen on (defaults to WEBHOOK_PORT; nothing is started if neither is set)
+        host: Interface to bind
+
+    Returns:
+        The running server, or None
+    """
+    port = port or int(os.getenv('WEBHOOK_PORT', '0'))
+    if not port:
+        return None
+    handler = type('WebhookHandler', (_WebhookHandler,), {
+        'feed': feed,
+        'app_secret': os.getenv('FB_APP_SECRET'),
+        'youtube_secret': os.getenv('YOUTUBE_WEBHOOK_SECRET'),
+        'verify_token': os.getenv('WEBHOOK_VERIFY_TOKEN'),
+    })
+    server = ThreadingHTTPServer((host, port), handler)
+    threading.Thread(target=server.serve_forever, name='webhooks', daemon=True).start()
+    log.info("Receiving webhooks on http://%s:%d/webhooks/", host, port)
+    return server
+
+
+def subscribe_youtube(channel_id: str, callback_url: str, secret: Optional[str] = None,
+                      lease_seconds: int = 864000) -> bool:
+    """Ask the YouTube hub to push `channel_id`'s uploads to `callback_url` (renew before the lease ends)"""
+    response = requests.post(YOUTUBE_HUB, data={
+        'hub.mode': 'subscribe',
+        'hub.topic': YOUTUBE_TOPIC + channel_id,
+        'hub.callback': callback_url,
+        'hub.secret': secret or os.getenv('YOUTUBE_WEBHOOK_SECRET', ''),
+        'hub.lease_seconds': str(lease_seconds),
+    }, timeout=30)
+    return response.status_code in (202, 204)
+
+
+def sample_payload(platform: str, remote_id: str, action: str = 'created') -> bytes:
+    """A notification body like the platform would send, for local testing"""
+    now = int(time.time())
+    if platform == 'youtube':
+        stamp = datetime.fromtimestamp(now, timezone.utc).isoformat()
+        if action == 'deleted':
+            return (f'<feed xmlns:at="{ATOM_NAMESPACES["at"]}" xmlns="{ATOM_NAMESPACES["atom"]}">'
+                    f'<at:deleted-entry ref="yt:video:{remote_id}" when="{stamp}">'
+                    f'<at:by><uri>https://www.youtube.com/channel/UCsample</uri></at:by></at:deleted-entry></feed>'
+                    ).encode()
+        return (f'<feed xmlns:yt="{ATOM_NAMESPACES["yt"]}" xmlns="{ATOM_NAMESPACES["atom"]}"><entry>'
+                f'<id>yt:video:{remote_id}</id><yt:videoId>{remote_id}</yt:videoId>'
+                f'<yt:channelId>UCsample</yt:channelId><published>{stamp}</published>'
+                f'<updated>{stamp}</updated></entry></feed>').encode()
+    if platform == 'instagram':
+        return json.dumps({'object': 'instagram', 'entry': [{'id': 'sample', 'time': now, 'changes': [
+            {'field': 'comments', 'value': {'id': remote_id, 'text': 'Sample', 'media': {'id': 'sample-media'}}}
+        ]}]}).encode()
+    verb = {'created': 'add', 'updated': 'edited', 'deleted': 'remove'}[action]
+    return json.dumps({'object': 'page', 'entry': [{'id': 'sample', 'time': now, 'changes': [
+        {'field': 'feed', 'value': {'item': 'post', 'verb': verb, 'post_id': remote_id, 'created_time': now}}
+    ]}]}).encode()
+
+
+def send_sample(url: str, platform: str, remote_id: str, action: str = 'created') -> int:
+    """POST a locally signed sample notification to a running receiver; returns the HTTP status"""
+    body = sample_payload(platform, remote_id, action)
+    if platform == 'youtube':
+        headers = {'Content-Type': 'application/atom+xml',
+                   'X-Hub-Signature': sign(body, os.getenv('YOUTUBE_WEBHOOK_SECRET', ''), 'sha1')}
+        path = '/webhooks/youtube'
+    else:
+        headers = {'Content-Type': 'application/json',
+                   'X-Hub-Signature-256': sign(body, os.getenv('FB_APP_SECRET', ''))}
+        path = '/webhooks/graph'
+    return requests.post(url.rstrip('/') + path, data=body, headers=headers, timeout=10).status_code
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run the webhook receiver, or send it a signed sample event")
+    parser.add_argument('command', choices=['serve', 'send'])
+    parser.add_argument('--port', type=int, help="Port to serve on (defaults to WEBHOOK_PORT)")
+    parser.add_argument('--url', default='http://localhost:8765', help="Receiver to send the sample to")
+    parser.add_argument('--platform', choices=['facebook', 'instagram', 'youtube'], default='facebook')
+    parser.add_argument('--id', default='sample_1', help="Remote id in the sample event")
+    parser.add_argument('--action', choices=['created', 'updated', 'deleted'], default='created')
+    args = parser.parse_args()
+
+    if args.command == 'send':
+        print(send_sample(args.url, args.platform, args.id, args.action))
+    else:
+        feed = ChangeFeed()
+        feed.subscribe(print)
+        server = serve_webhooks(feed, args.port)
+        if server is None:
+            parser.error("Set WEBHOOK_PORT or pass --port")
+        threading.Event().wait()
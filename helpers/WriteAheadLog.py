@@ -0,0 +1,253 @@
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from typing import Any, Callable, List, NamedTuple, Optional
+
+import httplib2
+from dotenv import load_dotenv
+
+from helpers.Resilience import Resilience
+from helpers.StructuredLog import get_logger
+
+# Load environment variables
+load_dotenv()
+
+log = get_logger(__name__)
+
+# Intent states: 'pending' while the create is being sent, 'done' once the platform
+# returned the new item, 'failed' when it certainly was not created, and 'unknown'
+# when the request may or may not have reached the platform
+STATES = ('pending', 'done', 'failed', 'unknown')
+
+# Allowance for the platform's clock when matching items created after an intent
+CLOCK_SKEW = 300
+
+# Seconds between sweeps for finished intents past their retention
+PURGE_INTERVAL = 3600
+
+
+class Intent(NamedTuple):
+    platform: str
+    key: str
+    operation: str
+    payload: dict
+    state: str
+    result: Any
+    attempts: int
+    created_at: float
+    updated_at: float
+    error: Optional[str] = None
+
+
+class IntentInFlightError(Exception):
+    """Raised when another worker is sending the same create right now"""
+
+    def __init__(self, intent: Intent):
+        self.intent = intent
+        super().__init__(f"{intent.platform} {intent.operation} {intent.key} is already being sent "
+                         f"(attempt {intent.attempts}, started {time.time() - intent.updated_at:.0f}s ago)")
+
+
+class AmbiguousCreateError(Exception):
+    """Raised instead of resending a create that may have been carried out, when there is no way to check"""
+
+    def __init__(self, intent: Intent):
+        self.intent = intent
+        super().__init__(f"{intent.platform} {intent.operation} {intent.key} may already have been created "
+                         f"({intent.error or 'outcome unknown'}) and cannot be checked automatically")
+
+
+def ambiguous(error: Exception) -> bool:
+    """
+    Whether a create that raised `error` may have been carried out anyway
+
+    Failures to connect, 4xx responses and errors raised before sending are certain;
+    timeouts, dropped connections and 5xx responses after the request went out are not.
+    """
+    # requests and tweepy errors carry the response, googleapiclient's HttpError its headers as resp
+    status = getattr(getattr(error, 'response', None), 'status_code', None) or \
+        getattr(getattr(error, 'resp', None), 'status', None)
+    if status is not None:
+        return int(status) >= 500
+    if Resilience.retryable_exception('POST', error):
+        # Could not connect, so nothing was sent
+        return False
+    return Resilience.transport_error(error) or isinstance(error, (socket.timeout, httplib2.HttpLib2Error))
+
+
+class WriteAheadLog:
+    _default = None
+    _default_lock = threading.Lock()
+
+    def __init__(self, path: Optional[str] = None, lease: Optional[float] = None,
+                 retention: Optional[float] = None):
+        """
+        Persistent log of create calls, written before each is sent
+
+        A retried create with the same idempotency key returns the item the first try
+        made instead of making another. If the first try ended ambiguously (a timeout
+        after the request went out, a 5xx), the platform is checked with a cheap read
+        for an item created since; it is only sent again if none turns up.
+
+        Args:
+            path: SQLite database file (defaults to WAL_PATH or ./write_ahead.db)
+            lease: Seconds a pending create is assumed to still be in flight (defaults to WAL_LEASE_SECONDS or 300)
+            retention: Seconds a done or failed intent is kept, and so how long its key deduplicates
+                (defaults to WAL_RETENTION_DAYS or 30 days)
+        """
+        self.path = path or os.getenv('WAL_PATH', 'write_ahead.db')
+        self.lease = lease if lease is not None else float(os.getenv('WAL_LEASE_SECONDS', '300'))
+        self.retention = retention if retention is not None else \
+            float(os.getenv('WAL_RETENTION_DAYS', '30')) * 86400
+        self._lock = threading.Lock()
+        self._purged_at = 0.0
+        # Autocommit mode, so claiming an intent is one BEGIN IMMEDIATE transaction across processes
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS intents ('
+            ' platform TEXT NOT NULL, key TEXT NOT NULL, operation TEXT NOT NULL, payload TEXT NOT NULL,'
+            ' state TEXT NOT NULL, result TEXT, attempts INTEGER NOT NULL, created_at REAL NOT NULL,'
+            ' updated_at REAL NOT NULL, error TEXT, PRIMARY KEY (platform, key))'
+        )
+
+    @classmethod
+    def default(cls) -> 'WriteAheadLog':
+        """Shared log for this process"""
+        with cls._default_lock:
+            if cls._default is None:
+                cls._default = cls()
+            return cls._default
+
+    def _row(self, platform: str, key: str) -> Optional[Intent]:
+        row = self._conn.execute(
+            'SELECT platform, key, operation, payload, state, result, attempts, created_at, updated_at, error'
+            ' FROM intents WHERE platform = ? AND key = ?', (platform, key)
+        ).fetchone()
+        if row is None:
+            return None
+        return Intent(row[0], row[1], row[2], json.loads(row[3]), row[4],
+                      json.loads(row[5]) if row[5] is not None else None, *row[6:])
+
+    def get(self, platform: str, key: str) -> Optional[Intent]:
+        with self._lock:
+            return self._row(platform, key)
+
+    def _claim(self, platform: str, key: str, operation: str, payload: dict) -> Optional[Intent]:
+        """Mark the intent pending for this attempt; returns its previous record (None if new)"""
+        now = time.time()
+        with self._lock:
+            self._conn.execute('BEGIN IMMEDIATE')
+            try:
+                previous = self._row(platform, key)
+                if previous and previous.state == 'pending' and now - previous.updated_at < self.lease:
+                    raise IntentInFlightError(previous)
+                if previous is None:
+                    self._conn.execute(
+                        "INSERT INTO intents VALUES (?, ?, ?, ?, 'pending', NULL, 1, ?, ?, NULL)",
+                        (platform, key, operation, json.dumps(payload, default=str), now, now)
+                    )
+                elif previous.state != 'done':
+                    self._conn.execute(
+                        "UPDATE intents SET state = 'pending', attempts = attempts + 1, updated_at = ?"
+                        ' WHERE platform = ? AND key = ?', (now, platform, key)
+                    )
+                self._conn.execute('COMMIT')
+            except BaseException:
+                self._conn.execute('ROLLBACK')
+                raise
+        return previous
+
+    def _finish(self, platform: str, key: str, state: str, result: Any = None, error: Optional[str] = None):
+        with self._lock:
+            self._conn.execute(
+                'UPDATE intents SET state = ?, result = ?, error = ?, updated_at = ? WHERE platform = ? AND key = ?',
+                (state, json.dumps(result, default=str) if result is not None else None, error, time.time(),
+                 platform, key)
+            )
+
+    def run(self, platform: str, operation: str, payload: dict, send: Callable[[], Any],
+            find: Optional[Callable[[float], Any]] = None, key: Optional[str] = None) -> Any:
+        """
+        Send a create at most once per idempotency key
+
+        Args:
+            platform: Platform the item is created on
+            operation: Manager method, for the record
+            payload: What is being created, for the record and for find()
+            send: Makes the create request and returns its result; raises on failure
+            find: Given the earliest Unix time the item can have been created at, returns
+                the result for a matching item created since, or None; called before
+                resending a create whose earlier attempt ended ambiguously. Without it such
+                a create raises AmbiguousCreateError instead of being sent again.
+            key: Idempotency key; without one the create is just sent, as there is
+                nothing a retry could be matched by
+
+        Returns:
+            The result of send(), of find(), or recorded for the key by an earlier call
+        """
+        if not key:
+            return send()
+        if time.time() - self._purged_at > PURGE_INTERVAL:
+            self.purge()
+        previous = self._claim(platform, key, operation, payload)
+        if previous and previous.state == 'done':
+            log.info("Skipping %s %s: already created", operation, key, extra={'platform': platform})
+            return previous.result
+
+        if previous and previous.state in ('pending', 'unknown'):
+            if find is None:
+                self._finish(platform, key, 'unknown', error=previous.error)
+                raise AmbiguousCreateError(previous)
+            # The earlier attempt may have worked; look before sending it again
+            try:
+                found = find(previous.created_at - CLOCK_SKEW)
+            except Exception as e:
+                self._finish(platform, key, 'unknown', error=f"Reconciliation failed: {type(e).__name__}: {e}")
+                raise
+            if found is not None:
+                log.info("Reconciled %s %s with an existing item", operation, key, extra={'platform': platform})
+                self._finish(platform, key, 'done', found)
+                return found
+
+        try:
+            result = send()
+        except Exception as e:
+            state = 'unknown' if ambiguous(e) else 'failed'
+            self._finish(platform, key, state, error=f"{type(e).__name__}: {e}")
+            if state == 'unknown':
+                log.warning("%s %s may or may not have been created: %s", operation, key, e,
+                            extra={'platform': platform})
+            raise
+        self._finish(platform, key, 'done', result)
+        return result
+
+    def purge(self) -> int:
+        """
+        Drop done and failed intents last updated longer than the retention ago
+
+        Pending and unknown intents are kept, since their outcome still has to be settled.
+
+        Returns:
+            Number of intents dropped
+        """
+        with self._lock:
+            self._purged_at = time.time()
+            cursor = self._conn.execute(
+                "DELETE FROM intents WHERE state IN ('done', 'failed') AND updated_at < ?",
+                (self._purged_at - self.retention,)
+            )
+        if cursor.rowcount:
+            log.info("Purged %d finished intents", cursor.rowcount)
+        return cursor.rowcount
+
+    def intents(self, state: Optional[str] = None, platform: Optional[str] = None, limit: int = 100) -> List[Intent]:
+        """Most recently updated intents, optionally only in one state or for one platform"""
+        query = ('SELECT platform, key FROM intents WHERE (? IS NULL OR state = ?) AND (? IS NULL OR platform = ?)'
+                 ' ORDER BY updated_at DESC LIMIT ?')
+        with self._lock:
+            keys = self._conn.execute(query, (state, state, platform, platform, limit)).fetchall()
+            return [self._row(*row) for row in keys]
@@ -3,11 +3,31 @@ from google_auth_oauthlib.flow import InstalledAppFlow
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from googleapiclient.errors import HttpError, ResumableUploadError
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaFileUpload, build_http
+from google_auth_httplib2 import AuthorizedHttp
+from datetime import datetime
+import functools
 import os
 import pickle
 import socket
 from dotenv import load_dotenv
+from helpers.UploadIndex import DuplicateUploadError, UploadIndex
+from helpers.CredentialStore import CredentialStore
+from helpers.Instrumentation import instrumented
+from helpers.Models import media_from_youtube
+from helpers.QuotaLedger import MeteredRequest, QuotaLedger
+from helpers.Resilience import ResilientHttp
+from helpers.StructuredLog import get_logger
+from helpers.Verification import fingerprint, verification_cache, verified
+from helpers.WriteAheadLog import WriteAheadLog
+
+log = get_logger(__name__, 'youtube')
+
+
+def _refresh_credentials(credentials):
+    credentials.refresh(Request())
+    return credentials
+
 
 class YouTubeOperations:
     def __init__(self):
@@ -19,6 +39,9 @@ class YouTubeOperations:
         self.credentials = None
         self.youtube = None
         self.channel_id = None
+        self.uploads_playlist_id = None
+        self.quota = None
+        self.upload_index = UploadIndex()
         self.SCOPES = [
             'https://www.googleapis.com/auth/youtube.force-ssl',
             'https://www.googleapis.com/auth/youtube'
@@ -42,58 +65,116 @@ class YouTubeOperations:
             ).execute()
 
             if not channels_response.get('items'):
-                print("\nERROR: No YouTube channel found for this Google account!")
+                log.error("No YouTube channel found for this Google account")
                 return False
 
             self.channel_id = channels_response['items'][0]['id']
             channel_title = channels_response['items'][0]['snippet']['title']
-            print(f"\nConnected to YouTube channel: {channel_title}")
+            log.info("Connected to YouTube channel: %s", channel_title, extra={'channel_id': self.channel_id})
             return True
 
         except HttpError as e:
-            print(f"\nError verifying YouTube channel: {e}")
+            log.error("Error verifying YouTube channel: %s", e)
             return False
 
-    def authenticate(self):
+    def authenticate(self, lazy=False):
+        """
+        Load credentials and build the API client. With lazy=True the channel is not
+        verified here but by warmup() or the first API call.
+        """
         try:
-            if os.path.exists('token.pickle'):
+            store = CredentialStore.default()
+            # Refreshed in the background ahead of expiry from now on
+            store.register('youtube', refresh=_refresh_credentials, expiry=lambda credentials: credentials.expiry)
+            self.credentials = store.get('youtube')
+
+            if self.credentials is None and os.path.exists('token.pickle'):
+                # Move a token saved by older versions into the store
                 with open('token.pickle', 'rb') as token:
                     self.credentials = pickle.load(token)
+                store.put('youtube', self.credentials)
 
             if not self.credentials or not self.credentials.valid:
                 if self.credentials and self.credentials.expired and self.credentials.refresh_token:
-                    print("Refreshing expired credentials...")
-                    self.credentials.refresh(Request())
+                    log.info("Refreshing expired credentials")
+                    self.credentials = store.refresh_if_needed('youtube')
                 else:
-                    print("Starting new authentication flow...")
+                    log.info("Starting new authentication flow")
                     port = self.find_available_port()
                     flow = InstalledAppFlow.from_client_secrets_file(
                         'client_secrets.json',
                         self.SCOPES
                     )
                     self.credentials = flow.run_local_server(port=port)
+                    store.put('youtube', self.credentials)
+                log.info("Credentials saved")
 
-                with open('token.pickle', 'wb') as token:
-                    pickle.dump(self.credentials, token)
-                print("Credentials saved successfully!")
-
-            self.youtube = build('youtube', 'v3', credentials=self.credentials)
-            print("YouTube API client created successfully!")
+            # Uses the bundled discovery document, so building the client makes no request
+            api_endpoint = os.getenv('YOUTUBE_API_BASE_URL')
+            # build_http() keeps googleapiclient's timeout and 308 handling for resumable uploads
+            # Quota belongs to the Google Cloud project, so requests are limited per OAuth client
+            account = getattr(self.credentials, 'client_id', None) or self.client_id or 'default'
+            http = AuthorizedHttp(self.credentials, http=ResilientHttp(build_http(), 'youtube', account))
+            # Every call is charged to the project's daily quota before it is sent
+            self.quota = QuotaLedger(project=account)
+            self.youtube = build('youtube', 'v3', http=http,
+                                 requestBuilder=functools.partial(MeteredRequest, ledger=self.quota),
+                                 client_options={'api_endpoint': api_endpoint} if api_endpoint else None)
+            log.debug("YouTube API client created")
             
-            if not self.verify_youtube_channel():
-                raise Exception("YouTube channel verification failed")
+            if not lazy:
+                self.warmup()
                 
             return self.youtube
 
         except Exception as e:
-            print(f"Authentication error: {e}")
+            log.error("Authentication error: %s", e)
             raise
 
-    def create_video(self, title, description, privacy_status, file_path):
+    @instrumented
+    def warmup(self):
+        """Verify the channel (once per TTL across all instances) and return its ID"""
+        if self.youtube is None:
+            self.authenticate(lazy=True)
+        if self.channel_id is None:
+            self.channel_id = verification_cache.verify(
+                ('youtube', fingerprint(self.credentials.client_id, self.credentials.refresh_token)),
+                self._verify
+            )
+        return self.channel_id
+
+    def _verify(self):
+        if not self.verify_youtube_channel():
+            raise Exception("YouTube channel verification failed")
+        return self.channel_id
+
+    @instrumented
+    @verified
+    def create_video(self, title, description, privacy_status, file_path, on_duplicate='upload',
+                     idempotency_key=None, chunk_size=1024*1024, progress=None):
+        """
+        Upload a video. With on_duplicate='reuse' a file that was uploaded before is not sent
+        again and the existing video is returned; 'confirm' raises DuplicateUploadError instead.
+
+        Uploads with the same idempotency_key are made once (see WriteAheadLog); a retry after
+        an upload that timed out first looks for the video among the channel's latest.
+
+        chunk_size is the resumable upload chunk in bytes (a multiple of 256 KiB), and
+        progress(bytes_sent, total_bytes) is called after every chunk.
+        """
         try:
             if not os.path.exists(file_path):
                 raise FileNotFoundError(f"Video file not found: {file_path}")
 
+            content_hash, existing = self.upload_index.check(file_path, 'youtube', on_duplicate)
+            if existing:
+                # videos.list costs 1 unit against 1600 for videos.insert
+                current = self.read_video(existing.remote_id)
+                if current.get('items'):
+                    log.info("Reusing existing upload: %s", existing.remote_id, extra={'video_id': existing.remote_id})
+                    return current['items'][0]
+                self.upload_index.forget('youtube', existing.remote_id)
+
             body = {
                 'snippet': {
                     'title': title,
@@ -107,35 +188,64 @@ class YouTubeOperations:
                 }
             }
 
-            media = MediaFileUpload(
-                file_path,
-                chunksize=1024*1024,
-                resumable=True
-            )
+            def send():
+                media = MediaFileUpload(
+                    file_path,
+                    chunksize=chunk_size,
+                    resumable=True
+                )
 
-            print("\nStarting video upload...")
-            request = self.youtube.videos().insert(
-                part=','.join(body.keys()),
-                body=body,
-                media_body=media
-            )
+                log.info("Starting video upload", extra={'file': file_path, 'bytes': media.size()})
+                request = self.youtube.videos().insert(
+                    part=','.join(body.keys()),
+                    body=body,
+                    media_body=media
+                )
 
-            response = None
-            while response is None:
-                status, response = request.next_chunk()
-                if status:
-                    print(f"Uploaded {int(status.progress() * 100)}%")
+                response = None
+                while response is None:
+                    status, response = request.next_chunk()
+                    if status:
+                        log.info("Uploaded %d%%", int(status.progress() * 100),
+                                 extra={'bytes_sent': status.resumable_progress, 'sample': 'chunk'})
+                        if progress:
+                            progress(status.resumable_progress, media.size())
+                if progress:
+                    progress(media.size(), media.size())
 
-            print(f"\nVideo upload completed successfully! Video ID: {response['id']}")
+                log.info("Video upload completed: %s", response['id'], extra={'video_id': response['id']})
+                return response
+
+            def find(since):
+                # The uploads playlist costs 1 unit against 1600 for another videos.insert
+                for item in self.list_my_videos(max_results=10).get('items', []):
+                    snippet = item['snippet']
+                    published = snippet.get('publishedAt')
+                    if snippet.get('title') == title and published and \
+                            datetime.fromisoformat(published.replace('Z', '+00:00')).timestamp() >= since:
+                        found = self.read_video(item['id']['videoId'])
+                        return found['items'][0] if found.get('items') else None
+                return None
+
+            response = WriteAheadLog.default().run(
+                'youtube', 'create_video',
+                {'title': title, 'privacy_status': privacy_status, 'file': file_path, 'content_hash': content_hash},
+                send, find, key=idempotency_key
+            )
+            self.upload_index.record(content_hash, 'youtube', response['id'])
             return response
 
+        except DuplicateUploadError:
+            raise
         except ResumableUploadError as e:
-            print(f"\nUpload error: {e}")
+            log.error("Upload error: %s", e)
             raise
         except Exception as e:
-            print(f"\nUnexpected error during video upload: {e}")
+            log.exception("Unexpected error during video upload")
             raise
 
+    @instrumented
+    @verified
     def read_video(self, video_id):
         try:
             request = self.youtube.videos().list(
@@ -145,11 +255,13 @@ class YouTubeOperations:
             response = request.execute()
             return response
         except Exception as e:
-            print(f"Error reading video details: {e}")
+            log.error("Error reading video %s: %s", video_id, e)
             raise
 
 
 
+    @instrumented
+    @verified
     def update_video(self, video_id, title=None, description=None):
         try:
             video = self.youtube.videos().list(part="snippet", id=video_id).execute()
@@ -169,29 +281,117 @@ class YouTubeOperations:
             return response
 
         except HttpError as e:
-            print(f"Error updating video: {e}")
+            log.error("Error updating video %s: %s", video_id, e)
             raise
         except Exception as e:
-            print(f"Unexpected error while updating video: {e}")
+            log.exception("Unexpected error while updating video %s", video_id)
             raise
 
+    @instrumented
+    @verified
     def delete_video(self, video_id):
         try:
             request = self.youtube.videos().delete(id=video_id)
             request.execute()
-            print("Video deleted successfully!")
+            self.upload_index.forget('youtube', video_id)
+            log.info("Video deleted: %s", video_id, extra={'video_id': video_id})
             return True
         except Exception as e:
-            print(f"Error deleting video: {e}")
+            log.error("Error deleting video %s: %s", video_id, e)
             raise
 
-    def list_my_videos(self, max_results=10):
+    @instrumented
+    @verified
+    def list_my_videos(self, max_results=10, page_token=None):
+        """
+        Most recent uploads, in the same shape as a search.list response
+
+        Reads the channel's uploads playlist (1 quota unit per call) rather than
+        search.list with forMine (100 units). page_token is a previous response's
+        nextPageToken.
+        """
         try:
-            request = self.youtube.search().list(
-                part="snippet", forMine=True, type="video", maxResults=max_results
-            )
-            response = request.execute()
-            return response
+            if self.uploads_playlist_id is None:
+                channel = self.youtube.channels().list(part="contentDetails", mine=True).execute()
+                self.uploads_playlist_id = channel['items'][0]['contentDetails']['relatedPlaylists']['uploads']
+            response = self.youtube.playlistItems().list(
+                part="snippet,contentDetails", playlistId=self.uploads_playlist_id, maxResults=max_results,
+                pageToken=page_token
+            ).execute()
+            items = []
+            for item in response.get('items', []):
+                snippet = dict(item['snippet'])
+                # The playlist snippet's publishedAt is when the video was added; prefer its publish time
+                # but keep the other, which is what the playlist is ordered by
+                snippet['addedAt'] = snippet.get('publishedAt')
+                snippet['publishedAt'] = item['contentDetails'].get('videoPublishedAt', snippet.get('publishedAt'))
+                items.append({
+                    'kind': 'youtube#searchResult',
+                    'id': {'kind': 'youtube#video', 'videoId': item['contentDetails']['videoId']},
+                    'snippet': snippet,
+                })
+            return {'items': items, 'nextPageToken': response.get('nextPageToken'),
+                    'pageInfo': response.get('pageInfo', {})}
+        except Exception as e:
+            log.error("Error listing videos: %s", e)
+            raise
+
+    @instrumented
+    @verified
+    def list_videos(self, max_results=10):
+        """Most recent uploads as MediaItem tuples"""
+        return [media_from_youtube(item) for item in self.list_my_videos(max_results).get('items', [])]
+
+    @instrumented
+    @verified
+    def list_videos_page(self, max_results=50, page_token=None):
+        """
+        One page of uploads, newest first, as (MediaItem tuples, token of the next page or None)
+
+        created_at is when the video was added to the uploads playlist rather than its
+        publish time, which can be out of that order (e.g. scheduled videos), so the
+        pages stay sorted for a merge with other platforms.
+        """
+        response = self.list_my_videos(max_results, page_token)
+        items = [media_from_youtube(dict(item, snippet=dict(item['snippet'], publishedAt=item['snippet']['addedAt'])))
+                 for item in response.get('items', [])]
+        return items, response.get('nextPageToken')
+
+    @instrumented
+    @verified
+    def get_video_statistics(self, video_ids):
+        """Fetch view, like and comment counts for many videos, 50 ids per videos.list call"""
+        try:
+            stats = {}
+            video_ids = list(video_ids)
+            for i in range(0, len(video_ids), 50):
+                response = self.youtube.videos().list(
+                    part="statistics", id=','.join(video_ids[i:i + 50]), maxResults=50
+                ).execute()
+                for item in response.get('items', []):
+                    statistics = item.get('statistics', {})
+                    stats[item['id']] = {
+                        'views': statistics.get('viewCount'),
+                        'likes': statistics.get('likeCount'),
+                        'comments': statistics.get('commentCount'),
+                    }
+            return stats
         except Exception as e:
-            print(f"Error listing videos: {e}")
-            raise
\ No newline at end of file
+            log.error("Error fetching video statistics: %s", e)
+            raise
+
+    @instrumented
+    @verified
+    def get_channel_statistics(self):
+        try:
+            response = self.youtube.channels().list(part="statistics", mine=True).execute()
+            if not response.get('items'):
+                return {}
+            statistics = response['items'][0]['statistics']
+            return {
+                'followers': statistics.get('subscriberCount'),
+                'views': statistics.get('viewCount'),
+            }
+        except Exception as e:
+            log.error("Error fetching channel statistics: %s", e)
+            raise
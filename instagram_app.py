@@ -2,7 +2,7 @@ import streamlit as st
 from helpers.InstagramAPI import InstagramAPI
 import time
 
-def run(operation):
+def run(operation, prefetcher=None):
     
         # Initialize InstagramAPI instance
     try:
@@ -23,7 +23,9 @@ def run(operation):
             st.header("Instagram Account Information")
             
             try:
-                account_info = api.get_account_info()
+                account_info = prefetcher.get('instagram', 'account_info') if prefetcher else None
+                if account_info is None:
+                    account_info = api.get_account_info()
                 st.write("Account Information:")
                 st.json(account_info)
                 
@@ -49,6 +51,8 @@ def run(operation):
                     
                     if result and 'id' in result:
                         media_id = result['id']
+                        if prefetcher:
+                            prefetcher.invalidate('instagram')
                         st.success(f"Post created successfully! Media ID: {media_id}")
                         
                         # Step 2: Retrieve the media details to get the permalink
@@ -76,7 +80,10 @@ def run(operation):
             
             if st.button("Get Media List"):
                 try:
-                    media_list = api.get_media_list(limit=limit)
+                    # The prefetched listing holds the default five most recent posts
+                    media_list = prefetcher.get('instagram', 'media_list') if prefetcher and limit == 5 else None
+                    if media_list is None:
+                        media_list = api.get_media_list(limit=limit)
                     if "data" in media_list:
                         for media in media_list["data"]:
                             st.subheader(f"Post ID: {media['id']}")
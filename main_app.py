@@ -1,25 +1,110 @@
+import os
+import threading
 import streamlit as st
 import reddit_app
 import youtube_app
 import facebook_app
 import instagram_app
 import twitter_app
+import analytics_app
+import diagnostics_app
+import timeline_app
+from helpers.ListingPrefetcher import ListingPrefetcher
+from helpers.RedditManager import RedditManager
+from helpers.YouTubeOperations import YouTubeOperations
+from helpers.InstagramAPI import InstagramAPI
+from helpers.TwitterManager import TwitterManager
+from helpers.FacebookMinimal import FacebookMinimal
+from helpers.CredentialStore import CredentialStore
+from helpers.Instrumentation import serve_metrics
+from helpers.MetricsStore import MetricsStore
+from helpers.StructuredLog import get_logger
+from helpers.UploadIndex import UploadIndex
+from helpers.Verification import warmup_all
+from helpers.WebhookReceiver import ChangeFeed, cache_updater, serve_webhooks
+
+log = get_logger(__name__)
+
+
+@st.cache_resource
+def get_prefetcher():
+    def youtube():
+        yt = YouTubeOperations()
+        yt.authenticate(lazy=True)
+        return yt
+
+    # With webhooks pushing changes, polling is only a safety sweep for missed notifications
+    ttl = float(os.getenv('WEBHOOK_SWEEP_INTERVAL', '900')) if os.getenv('WEBHOOK_PORT') else 60.0
+    return ListingPrefetcher({
+        'reddit': RedditManager,
+        'youtube': youtube,
+        'instagram': InstagramAPI,
+        'twitter': lambda: TwitterManager(lazy=True),
+    }, ttl=ttl)
+
+
+@st.cache_resource
+def start_warmup():
+    """Verify every platform's credentials in parallel, once per server process"""
+    factories = {
+        'reddit': RedditManager,
+        'facebook': lambda: FacebookMinimal(lazy=True),
+        'instagram': InstagramAPI,
+        'twitter': lambda: TwitterManager(lazy=True),
+    }
+    # Without a stored token YouTube needs the interactive OAuth flow, which must not start in the background
+    if CredentialStore.default().get('youtube') is not None:
+        factories['youtube'] = YouTubeOperations
+
+    managers = {}
+    for name, factory in factories.items():
+        try:
+            managers[name] = factory()
+        except Exception as e:
+            log.warning("Skipping %s warmup: %s", name, e, extra={'platform': name})
+    thread = threading.Thread(target=warmup_all, args=(managers,), name='warmup', daemon=True)
+    thread.start()
+    return thread
+
+
+@st.cache_resource
+def start_metrics_server():
+    """Prometheus endpoint on METRICS_PORT, if set, once per server process"""
+    return serve_metrics()
+
+
+@st.cache_resource
+def start_webhook_server():
+    """Graph API and YouTube webhook receiver on WEBHOOK_PORT, if set, once per server process"""
+    feed = ChangeFeed()
+    # New items start being tracked for analytics; deleted uploads are no longer offered for reuse
+    feed.subscribe(cache_updater(prefetcher=get_prefetcher(), store=MetricsStore(), upload_index=UploadIndex()))
+    return feed, serve_webhooks(feed)
+
+
+start_warmup()
+start_metrics_server()
+start_webhook_server()
 
 # Sidebar for selecting platform and CRUD operation
 st.sidebar.title("Social Media Platform Manager")
 platform = st.sidebar.selectbox(
     "Select Social Media Platform", 
-    ["Reddit", "YouTube", "Facebook", "Instagram", "Twitter"]
+    ["Reddit", "YouTube", "Facebook", "Instagram", "Twitter", "Timeline", "Analytics", "Diagnostics"]
 )
 
+# Start loading this platform's listings while the rest of the page renders
+prefetcher = get_prefetcher()
+prefetcher.prefetch(platform.lower())
+
 # Define CRUD operations based on platform
 if platform == "Reddit":
     operation = st.sidebar.selectbox("Select Operation", ["Create Post", "Read Post", "Update Post", "Delete Post"])
-    reddit_app.run(operation)
+    reddit_app.run(operation, prefetcher)
     
 elif platform == "YouTube":
-    operation = st.sidebar.selectbox("Select Operation", ["Create Video", "Read Video", "Update Video", "Delete Video"])
-    youtube_app.run(operation)
+    operation = st.sidebar.selectbox("Select Operation", ["Create Video", "Batch Upload", "Read Video", "Update Video", "Delete Video", "Quota Usage"])
+    youtube_app.run(operation, prefetcher)
     
 elif platform == "Facebook":
     operation = st.sidebar.selectbox("Select Operation", ["Create Post", "Read Post", "Update Post", "Delete Post"])
@@ -27,8 +112,20 @@ elif platform == "Facebook":
 
 elif platform == "Instagram":
     operation = st.sidebar.selectbox("Select Operation", ["Get Account Info", "Publish Post", "Get Media List"])
-    instagram_app.run(operation)
+    instagram_app.run(operation, prefetcher)
 
 elif platform == "Twitter":
     operation = st.sidebar.selectbox("Select Operation", ["Create Tweet", "Read Tweet", "Get Recent Tweets", "Delete Tweet"])
-    twitter_app.run(operation)
+    twitter_app.run(operation, prefetcher)
+
+elif platform == "Timeline":
+    operation = st.sidebar.selectbox("Select Operation", ["Recent Items"])
+    timeline_app.run(operation)
+
+elif platform == "Analytics":
+    operation = st.sidebar.selectbox("Select Operation", ["Overview", "Growth", "Best Posting Hours", "Top Posts"])
+    analytics_app.run(operation)
+
+elif platform == "Diagnostics":
+    operation = st.sidebar.selectbox("Select Operation", ["Requests", "Errors", "Circuit Breakers", "Rate Limits", "Prometheus Export"])
+    diagnostics_app.run(operation)
@@ -1,13 +1,27 @@
 import streamlit as st
 from helpers.RedditManager import RedditManager
+from helpers.MediaPreprocessor import MediaPreprocessor
+from helpers.UploadIndex import DuplicateUploadError
 
 
+@st.cache_resource
+def get_preprocessor():
+    return MediaPreprocessor()
 
 
+@st.cache_resource
+def get_media_submitter():
+    # One worker pool and poller per server process instead of a new pair per rerun;
+    # submit_media only touches PRAW through per-thread clients, so sessions can share it
+    return RedditManager()
 
 
 
-def run(operation):
+
+
+
+
+def run(operation, prefetcher=None):
     reddit_manager = RedditManager()
 
 
@@ -15,7 +29,9 @@ def run(operation):
         # Function to fetch and display recent posts in a dropdown
     def get_recent_posts_dropdown():
         # Fetch recent posts (limit can be adjusted as needed)
-        recent_posts = reddit_manager.get_recent_posts(limit=10)  # Ensure get_recent_posts is defined in RedditManager
+        recent_posts = prefetcher.get('reddit', 'recent_posts') if prefetcher else None
+        if recent_posts is None:
+            recent_posts = reddit_manager.get_recent_posts(limit=10)  # Ensure get_recent_posts is defined in RedditManager
         if recent_posts:
             post_titles = {post['title']: post['id'] for post in recent_posts}
             selected_title = st.selectbox("Select a Post", list(post_titles.keys()))
@@ -29,6 +45,26 @@ def run(operation):
 
 
 
+    def show_media_submissions():
+        # Media posts submitted in the background during this session
+        submissions = st.session_state.get("reddit_media", [])
+        if not submissions:
+            return
+        st.subheader("Background media posts")
+        for subreddit_name, title, future in submissions:
+            if not future.done():
+                st.write(f"r/{subreddit_name} - {title}: in progress")
+            elif future.exception():
+                st.write(f"r/{subreddit_name} - {title}: failed ({future.exception()})")
+            else:
+                post_url = f"https://www.reddit.com/r/{subreddit_name}/comments/{future.result()}/"
+                st.markdown(f"r/{subreddit_name} - {title}: [created]({post_url})")
+        st.button("Refresh")
+        if prefetcher and any(future.done() for _, _, future in submissions):
+            prefetcher.invalidate('reddit')
+        # Finished posts are shown once more, then dropped
+        st.session_state["reddit_media"] = [entry for entry in submissions if not entry[2].done()]
+
     if operation == "Create Post":
         st.header("Create a New Reddit Post")
 
@@ -36,16 +72,57 @@ def run(operation):
         subreddit_name = st.text_input("Subreddit Name (without 'r/')", "")
         title = st.text_input("Post Title", "")
         content = st.text_area("Post Content", "")
-        post_type = st.selectbox("Post Type", ["text", "link", "image"])
+        post_type = st.selectbox("Post Type", ["text", "link", "image", "video", "gallery"])
+        if post_type in ("video", "gallery"):
+            st.caption("Content is the file path" + (", one image per line" if post_type == "gallery" else ""))
+        background = post_type in ("video", "gallery")
+        if post_type == "image":
+            background = st.checkbox("Don't wait for Reddit to create the post", value=False)
+        on_duplicate = "confirm"
+        if post_type == "image":
+            duplicate_choice = st.radio(
+                "If this image was uploaded before",
+                ["Ask me", "Reuse uploaded image", "Upload again"]
+            )
+            on_duplicate = {"Ask me": "confirm", "Reuse uploaded image": "reuse", "Upload again": "upload"}[duplicate_choice]
 
         if st.button("Create Post"):
-            post_id = reddit_manager.create_post(subreddit_name, title, content, post_type)
-            if post_id:
-                st.success(f"Post created successfully! Post ID: {post_id}")
-                post_url = f"https://www.reddit.com/r/{subreddit_name}/comments/{post_id}/"
-                st.markdown(f"[View Post on Reddit]({post_url})", unsafe_allow_html=True)
+            media = [line.strip() for line in content.splitlines() if line.strip()] \
+                if post_type == "gallery" else content
+            if post_type in ("image", "video", "gallery"):
+                # Resize, re-encode and strip metadata; repeated posts of the same file hit the cache
+                target = "reddit_video" if post_type == "video" else "reddit_image"
+                paths = media if post_type == "gallery" else [media]
+                try:
+                    paths = get_preprocessor().prepare_many([(path, target) for path in paths])
+                except Exception as e:
+                    st.warning(f"Media preprocessing failed, uploading the original: {e}")
+                media = paths if post_type == "gallery" else paths[0]
+            if background:
+                try:
+                    future = get_media_submitter().submit_media(subreddit_name, title, media, post_type, on_duplicate)
+                    st.session_state.setdefault("reddit_media", []).append((subreddit_name, title, future))
+                    st.info("Submitted; the post is created in the background.")
+                except DuplicateUploadError as e:
+                    st.warning(f"{e}. Choose 'Reuse uploaded image' or 'Upload again' to continue.")
+                except (ValueError, FileNotFoundError) as e:
+                    st.error(str(e))
             else:
-                st.error("Failed to create the post.")
+                try:
+                    post_id = reddit_manager.create_post(subreddit_name, title, media, post_type, on_duplicate)
+                except DuplicateUploadError as e:
+                    st.warning(f"{e}. Choose 'Reuse uploaded image' or 'Upload again' to continue.")
+                    return
+                if post_id:
+                    if prefetcher:
+                        prefetcher.invalidate('reddit')
+                    st.success(f"Post created successfully! Post ID: {post_id}")
+                    post_url = f"https://www.reddit.com/r/{subreddit_name}/comments/{post_id}/"
+                    st.markdown(f"[View Post on Reddit]({post_url})", unsafe_allow_html=True)
+                else:
+                    st.error("Failed to create the post.")
+
+        show_media_submissions()
 
 
     elif operation == "Read Post":
@@ -54,7 +131,9 @@ def run(operation):
         # Display dropdown for recent posts
         post_id = get_recent_posts_dropdown()
         if post_id and st.button("Fetch Post"):
-            post_data = reddit_manager.read_post(post_id)
+            post_data = prefetcher.get('reddit', f'post:{post_id}') if prefetcher else None
+            if post_data is None:
+                post_data = reddit_manager.read_post(post_id)
             if post_data:
                 st.write("Post details:")
                 st.write(post_data)
@@ -73,6 +152,8 @@ def run(operation):
         if post_id and st.button("Update Post"):
             update_success = reddit_manager.update_post(post_id, new_content)
             if update_success:
+                if prefetcher:
+                    prefetcher.invalidate('reddit')
                 st.success("Post updated successfully!")
                 # Display the link to view the updated post
                 post_data = reddit_manager.read_post(post_id)
@@ -91,6 +172,8 @@ def run(operation):
         if post_id and st.button("Delete Post"):
             delete_success = reddit_manager.delete_post(post_id)
             if delete_success:
+                if prefetcher:
+                    prefetcher.invalidate('reddit')
                 st.success("Post deleted successfully!")
                 # Inform the user that the post is deleted and cannot be viewed
                 st.info("Note: The post has been deleted, so it is no longer available on Reddit.")
@@ -0,0 +1,56 @@
+import io
+import os
+
+import pytest
+from PIL import Image, ImageCms
+
+from helpers import MediaPreprocessor as preprocessor
+from helpers.MediaPreprocessor import _process_image
+
+SRGB = ImageCms.ImageCmsProfile(ImageCms.createProfile('sRGB')).tobytes()
+LAB = ImageCms.ImageCmsProfile(ImageCms.createProfile('LAB')).tobytes()
+
+
+def saved(tmp_path, image, **options):
+    path = str(tmp_path / 'source.png')
+    image.save(path, **options)
+    return path
+
+
+def test_profile_is_kept_when_the_colour_space_is_unchanged(tmp_path):
+    source = saved(tmp_path, Image.new('RGBA', (64, 64), (200, 100, 50, 255)), icc_profile=SRGB)
+    destination = _process_image(source, str(tmp_path / 'out.jpg'), 'twitter_image')
+    with Image.open(destination) as result:
+        assert result.mode == 'RGB'
+        assert result.info.get('icc_profile') == SRGB
+
+
+def test_profile_of_another_colour_space_is_not_attached_to_rgb_output(tmp_path):
+    source = saved(tmp_path, Image.new('L', (64, 64), 128), icc_profile=LAB)
+    destination = _process_image(source, str(tmp_path / 'out.jpg'), 'twitter_image')
+    with Image.open(destination) as result:
+        assert result.mode == 'RGB'
+        assert 'icc_profile' not in result.info
+
+
+def noise(side):
+    return Image.frombytes('RGB', (side, side), os.urandom(side * side * 3))
+
+
+def test_image_over_the_limit_at_lowest_quality_is_scaled_down(tmp_path, monkeypatch):
+    monkeypatch.setitem(preprocessor.PLATFORM_SPECS, 'tiny_image', {
+        'kind': 'image', 'format': 'JPEG', 'max_side': 4096, 'max_bytes': 60 * 1024, 'quality': 85})
+    source = saved(tmp_path, noise(1024))
+    destination = _process_image(source, str(tmp_path / 'out.jpg'), 'tiny_image')
+    assert os.path.getsize(destination) <= 60 * 1024
+    with Image.open(destination) as result:
+        assert max(result.size) < 1024
+
+
+def test_image_that_cannot_fit_raises_naming_the_target(tmp_path, monkeypatch):
+    monkeypatch.setitem(preprocessor.PLATFORM_SPECS, 'tiny_image', {
+        'kind': 'image', 'format': 'JPEG', 'max_side': 4096, 'max_bytes': 1024, 'quality': 85})
+    source = saved(tmp_path, noise(512))
+    with pytest.raises(ValueError, match='tiny_image'):
+        _process_image(source, str(tmp_path / 'out.jpg'), 'tiny_image')
+    assert os.listdir(tmp_path) == ['source.png']
@@ -0,0 +1,64 @@
+from helpers.MetricsCollector import MetricsCollector
+from helpers.MetricsStore import MetricsStore
+from helpers.Models import Post
+
+
+class Reddit:
+    def list_posts(self, limit):
+        return [Post('reddit', 'a', 100), Post('reddit', 'b', 200)]
+
+    def get_post_metrics(self, post_ids):
+        return {post_id: {'score': 10, 'comments': None} for post_id in post_ids}
+
+
+class Twitter:
+    def list_tweets(self, max_results):
+        return [Post('twitter', 't1', 300)]
+
+    def get_follower_count(self):
+        return {'id': 'me', 'followers': 42}
+
+    def get_tweet_metrics(self, tweet_ids):
+        return {tweet_id: {'likes': 3} for tweet_id in tweet_ids}
+
+
+def test_discover_tracks_recent_items(tmp_path):
+    collector = MetricsCollector(MetricsStore(str(tmp_path)), reddit=Reddit(), twitter=Twitter())
+    assert collector.discover() == 3
+    assert collector.store.tracked('reddit') == ['a', 'b']
+
+
+def test_collect_appends_one_batch(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    collector = MetricsCollector(store, reddit=Reddit(), twitter=Twitter())
+    collector.discover()
+    # Missing values are polled but not stored
+    assert collector.collect() == 6
+    assert len(store) == 4
+    assert len(set(store.column('ts'))) == 1
+    assert sorted(store.series('followers', platform='twitter')['value']) == [42]
+    assert sorted(store.series('score', platform='reddit')['value']) == [10, 10]
+
+
+class DownInstagram:
+    instagram_account_id = 'acct'
+
+    def list_media(self, limit, fields):
+        raise ConnectionError("instagram is down")
+
+    def get_media_metrics(self, media_ids):
+        raise ConnectionError("instagram is down")
+
+
+def test_failing_platform_keeps_the_others_samples(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    collector = MetricsCollector(store, reddit=Reddit(), twitter=Twitter(), instagram=DownInstagram())
+    assert collector.discover() == 3
+    assert collector.collect() == 6
+    assert len(store) == 4
+    assert store.tracked('instagram') == []
+
+
+def test_empty_store_is_kept(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    assert MetricsCollector(store).store is store
@@ -0,0 +1,69 @@
+import numpy as np
+
+from helpers.EngagementAnalytics import EngagementAnalytics
+from helpers.MetricsStore import MetricsStore
+
+
+def test_append_samples_tracks_items_and_reads_back(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    store.append_samples([('reddit', 'a', 'likes', 3), ('youtube', 'v', 'views', 10),
+                          ('reddit', 'a', 'comments', None)], ts=100)
+    assert len(store) == 2
+    assert store.tracked() == ['a', 'v']
+    cols = store.columns()
+    assert list(cols['ts']) == [100, 100]
+    assert list(cols['item']) == [store.item_id('reddit', 'a'), store.item_id('youtube', 'v')]
+    assert list(cols['value']) == [3, 10]
+
+
+def test_torn_append_counts_only_complete_rows(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    store.append_samples([('reddit', 'a', 'likes', 3)], ts=100)
+    with open(store._column_path('ts'), 'ab') as f:
+        f.write(np.int64(200).tobytes())
+    assert len(store) == 1
+
+
+def test_refresh_items_sees_other_writers(tmp_path):
+    reader, writer = MetricsStore(str(tmp_path)), MetricsStore(str(tmp_path))
+    writer.append_samples([('twitter', 't1', 'likes', 1)], ts=100)
+    assert reader.item_id('twitter', 't1') is None
+    assert reader.refresh_items() == 1
+    assert reader.item_id('twitter', 't1') == 0
+
+
+def test_series_includes_items_tracked_elsewhere(tmp_path):
+    reader, writer = MetricsStore(str(tmp_path)), MetricsStore(str(tmp_path))
+    writer.append_samples([('reddit', 'a', 'likes', 1), ('twitter', 't1', 'likes', 2)], ts=100)
+    series = reader.series('likes', platform='twitter')
+    assert list(series['value']) == [2]
+
+
+def test_analytics_refresh_is_incremental(tmp_path):
+    store = MetricsStore(str(tmp_path))
+    analytics = EngagementAnalytics(store)
+    store.append_samples([('reddit', 'a', 'likes', 1)], ts=100)
+    assert analytics.refresh() == 1
+    store.append_samples([('reddit', 'a', 'likes', 5), ('reddit', 'b', 'likes', 2)], ts=200)
+    assert analytics.refresh() == 2
+    assert analytics.refresh() == 0
+    assert analytics.platform_totals().loc['reddit', 'likes'] == 7
+
+
+def test_analytics_refresh_with_concurrent_append(tmp_path):
+    store, writer = MetricsStore(str(tmp_path)), MetricsStore(str(tmp_path))
+    writer.append_samples([('reddit', 'a', 'likes', 1)], ts=100)
+    analytics = EngagementAnalytics(store)
+    refresh_items = store.refresh_items
+
+    def refresh_then_append():
+        # Another process tracks a new item and appends its rows right after the catalog is read
+        count = refresh_items()
+        writer.append_samples([('youtube', 'v', 'likes', 4)], ts=200)
+        return count
+
+    store.refresh_items = refresh_then_append
+    assert analytics.refresh() == 1
+    store.refresh_items = refresh_items
+    assert analytics.refresh() == 1
+    assert analytics.platform_totals().loc['youtube', 'likes'] == 4
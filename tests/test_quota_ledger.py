@@ -0,0 +1,115 @@
+import time
+from datetime import datetime
+
+import pytest
+
+from helpers.QuotaLedger import QUOTA_TIMEZONE, QuotaExceededError, QuotaLedger, _parse_budgets, quota_cost
+
+
+def ledger(tmp_path, **kwargs):
+    kwargs.setdefault('daily_quota', 200)
+    kwargs.setdefault('budgets', {})
+    return QuotaLedger('project', str(tmp_path / 'quota.db'), **kwargs)
+
+
+def test_charge_records_calls_and_units(tmp_path):
+    quota = ledger(tmp_path)
+    assert quota.charge('youtube.videos.list') == 1
+    assert quota.charge('youtube.videos.list') == 1
+    assert quota.charge('youtube.search.list') == 100
+    assert quota.usage() == {'youtube.search.list': {'calls': 1, 'units': 100},
+                             'youtube.videos.list': {'calls': 2, 'units': 2}}
+    assert quota.history() == {quota.day(): 102}
+
+
+def test_call_over_the_daily_quota_is_rejected_and_not_charged(tmp_path):
+    quota = ledger(tmp_path)
+    quota.charge('youtube.search.list')
+    quota.charge('youtube.videos.update')
+    with pytest.raises(QuotaExceededError) as raised:
+        quota.charge('youtube.search.list')
+    assert (raised.value.method_id, raised.value.cost, raised.value.remaining) == ('youtube.search.list', 100, 50)
+    # The message points to the cheaper way of getting the same data
+    assert 'playlistItems.list' in str(raised.value)
+    assert quota.usage()['youtube.search.list'] == {'calls': 1, 'units': 100}
+    assert quota.charge('youtube.videos.update') == 50
+
+
+def test_method_budget_is_enforced_within_the_daily_quota(tmp_path):
+    quota = ledger(tmp_path, budgets={'youtube.videos.update': 100})
+    quota.charge('youtube.videos.update')
+    quota.charge('youtube.videos.update')
+    with pytest.raises(QuotaExceededError):
+        quota.charge('youtube.videos.update')
+    assert quota.charge('youtube.videos.delete') == 50
+
+
+def test_ledgers_share_the_database_but_not_projects(tmp_path):
+    first, second = ledger(tmp_path), ledger(tmp_path)
+    other = QuotaLedger('other', str(tmp_path / 'quota.db'), daily_quota=200, budgets={})
+    first.charge('youtube.search.list')
+    second.charge('youtube.search.list')
+    with pytest.raises(QuotaExceededError):
+        first.charge('youtube.search.list')
+    assert other.charge('youtube.search.list') == 100
+
+
+def test_defer_waits_for_the_reset(tmp_path, monkeypatch):
+    quota = ledger(tmp_path, daily_quota=100, policy='defer')
+    quota.charge('youtube.search.list')
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        quota.day = lambda now=None: 'tomorrow'
+    monkeypatch.setattr(time, 'sleep', sleep)
+
+    assert quota.charge('youtube.search.list') == 100
+    assert len(slept) == 1 and 0 < slept[0] <= 86401
+    assert quota.usage('tomorrow') == {'youtube.search.list': {'calls': 1, 'units': 100}}
+
+
+def test_defer_rejects_when_the_reset_is_too_far_away(tmp_path):
+    quota = ledger(tmp_path, daily_quota=100, policy='defer', max_defer=0)
+    quota.charge('youtube.search.list')
+    with pytest.raises(QuotaExceededError):
+        quota.charge('youtube.search.list')
+
+
+def test_unknown_policy_is_refused(tmp_path):
+    with pytest.raises(ValueError):
+        ledger(tmp_path, policy='ignore')
+
+
+def test_plan_prices_a_batch_without_charging_it(tmp_path):
+    quota = ledger(tmp_path, budgets={'youtube.videos.update': 50})
+    quota.charge('youtube.videos.list')
+
+    plan = quota.plan(['youtube.search.list', 'youtube.videos.list', 'youtube.videos.list'])
+    assert (plan['cost'], plan['remaining'], plan['fits']) == (102, 199, True)
+    assert list(plan['suggestions']) == ['youtube.search.list']
+
+    assert not quota.plan(['youtube.search.list'] * 2)['fits']
+    # Within the daily quota, but over the method's own budget
+    assert not quota.plan(['youtube.videos.update'] * 2)['fits']
+    assert quota.usage() == {'youtube.videos.list': {'calls': 1, 'units': 1}}
+
+
+def test_forecast_extrapolates_todays_rate(tmp_path):
+    quota = ledger(tmp_path, daily_quota=10000)
+    for _ in range(10):
+        quota.charge('youtube.search.list')
+    now = datetime.now(QUOTA_TIMEZONE)
+    forecast = quota.forecast(now)
+    assert (forecast['used'], forecast['remaining']) == (1000, 9000)
+    assert forecast['resets_at'] == quota.resets_at(now)
+    if forecast['exhausts_at'] is not None:
+        assert now < forecast['exhausts_at'] < forecast['resets_at']
+
+
+def test_costs_and_budget_strings():
+    assert quota_cost('youtube.videos.insert') == 1600
+    assert quota_cost('youtube.captions.list') == 1
+    assert quota_cost('youtube.captions.insert') == 50
+    assert _parse_budgets('search.list=1000, youtube.videos.insert=4800') == {
+        'youtube.search.list': 1000, 'youtube.videos.insert': 4800}
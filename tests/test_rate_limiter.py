@@ -0,0 +1,119 @@
+import json
+import time
+
+import pytest
+import requests
+
+from helpers.Instrumentation import InstrumentedAdapter
+from helpers.RateLimiter import RateLimiter, RateLimitExceeded, endpoint_class, parse_limits
+from helpers.Resilience import resilient_session
+
+UPLOAD_URL = 'https://upload.twitter.com/1.1/media/upload.json'
+TWEETS_URL = 'https://api.twitter.com/2/tweets'
+
+
+def limiter(tmp_path, limits):
+    return RateLimiter(str(tmp_path / 'limits.db'), limits=limits, max_wait=0)
+
+
+def test_acquire_takes_a_token_per_request_until_the_budget_is_spent(tmp_path):
+    rate_limiter = limiter(tmp_path, {('reddit', 'api'): (3, 60)})
+    assert [rate_limiter.acquire('reddit', 'me') for _ in range(3)] == [0, 0, 0]
+    with pytest.raises(RateLimitExceeded) as raised:
+        rate_limiter.acquire('reddit', 'me')
+    assert raised.value.key == 'reddit:me:api'
+    assert raised.value.wait == pytest.approx(20, abs=0.1)
+
+
+def test_acquire_waits_for_its_token_when_allowed_to(tmp_path, monkeypatch):
+    rate_limiter = RateLimiter(str(tmp_path / 'limits.db'), limits={('reddit', 'api'): (1, 60)}, max_wait=300)
+    slept = []
+    monkeypatch.setattr(time, 'sleep', slept.append)
+    assert rate_limiter.acquire('reddit', 'me') == 0
+    # The token is reserved before the wait, so the next caller queues behind it
+    assert rate_limiter.acquire('reddit', 'me') == pytest.approx(60, abs=0.1)
+    assert rate_limiter.acquire('reddit', 'me') == pytest.approx(120, abs=0.1)
+    assert slept == [pytest.approx(60, abs=0.1), pytest.approx(120, abs=0.1)]
+
+
+def test_budgets_are_per_account_and_shared_through_the_database(tmp_path):
+    limits = {('reddit', 'api'): (1, 60)}
+    first, second = limiter(tmp_path, limits), limiter(tmp_path, limits)
+    first.acquire('reddit', 'me')
+    with pytest.raises(RateLimitExceeded):
+        second.acquire('reddit', 'me')
+    second.acquire('reddit', 'someone-else')
+
+
+def test_unlimited_platforms_are_not_tracked(tmp_path):
+    rate_limiter = limiter(tmp_path, {('youtube', 'api'): (0, 1)})
+    assert rate_limiter.acquire('youtube', 'me') == 0
+    rate_limiter.observe('youtube', 'me', 'GET', {'x-rate-limit-remaining': '0'})
+    assert rate_limiter.budgets() == {}
+
+
+def test_observe_tightens_to_the_twitter_headers(tmp_path):
+    rate_limiter = limiter(tmp_path, {('twitter', 'read'): (900, 900)})
+    rate_limiter.observe('twitter', 'me', 'GET', {'x-rate-limit-remaining': '5'})
+    assert rate_limiter.budgets()['twitter:me:read'] == pytest.approx(5, abs=0.01)
+    # Headers never loosen the local budget
+    rate_limiter.observe('twitter', 'me', 'GET', {'x-rate-limit-remaining': '500'})
+    assert rate_limiter.budgets()['twitter:me:read'] == pytest.approx(5, abs=0.01)
+
+
+def test_observe_with_nothing_left_waits_out_the_reset(tmp_path):
+    rate_limiter = limiter(tmp_path, {('reddit', 'api'): (100, 60)})
+    rate_limiter.observe('reddit', 'me', 'GET', {'x-ratelimit-remaining': '0', 'x-ratelimit-reset': '30'})
+    with pytest.raises(RateLimitExceeded) as raised:
+        rate_limiter.acquire('reddit', 'me')
+    # 30s of debt at 100 per minute, plus the time for the requested token itself
+    assert raised.value.wait == pytest.approx(30.6, abs=0.1)
+
+
+def test_observe_scales_graph_usage_to_the_budget(tmp_path):
+    rate_limiter = limiter(tmp_path, {('facebook', 'api'): (200, 3600)})
+    rate_limiter.observe('facebook', 'me', 'GET', {'x-app-usage': json.dumps({'call_count': 75, 'total_time': 10})})
+    assert rate_limiter.budgets()['facebook:me:api'] == pytest.approx(50, abs=0.01)
+    rate_limiter.observe('facebook', 'me', 'GET', {'x-app-usage': 'not json'})
+    rate_limiter.observe('facebook', 'me', 'GET', {})
+    assert rate_limiter.budgets()['facebook:me:api'] == pytest.approx(50, abs=0.01)
+
+
+def test_endpoint_classes():
+    assert endpoint_class('twitter', 'GET') == 'read'
+    assert endpoint_class('twitter', 'POST', TWEETS_URL) == 'write'
+    assert endpoint_class('twitter', 'POST', UPLOAD_URL) == 'media'
+    assert endpoint_class('reddit', 'POST') == 'api'
+
+
+def test_parse_limits_overrides_the_defaults():
+    limits = parse_limits('reddit=60/60, twitter.write=17/86400, twitter=1/2, youtube=0, mastodon=300/300')
+    assert limits[('reddit', 'api')] == (60, 60)
+    assert limits[('twitter', 'read')] == limits[('twitter', 'write')] == (1, 2)
+    assert limits[('youtube', 'api')] == (0, 1)
+    assert limits[('mastodon', 'api')] == (300, 300)
+
+
+def test_media_uploads_have_their_own_twitter_budget(tmp_path, monkeypatch):
+    shared = limiter(tmp_path, {('twitter', 'write'): (2, 900), ('twitter', 'media'): (200, 900)})
+    monkeypatch.setattr(RateLimiter, '_default', shared)
+
+    uploads = []
+
+    def send(adapter, request, **kwargs):
+        response = requests.Response()
+        response.status_code = 200
+        if 'upload' in request.url:
+            uploads.append(request)
+            # The last chunk uses up the upload endpoint's own limit
+            response.headers['x-rate-limit-remaining'] = '0' if len(uploads) == 100 else '100'
+            response.headers['x-rate-limit-reset'] = '9999999999'
+        return response
+    monkeypatch.setattr(InstrumentedAdapter, 'send', send)
+
+    session = resilient_session(requests.Session(), 'twitter', 'me')
+    for _ in range(100):
+        session.post(UPLOAD_URL, data=b'chunk')
+    session.post(TWEETS_URL, json={'text': 'after a large upload'})
+    session.post(TWEETS_URL, json={'text': 'and another'})
+    assert shared.budgets()['twitter:me:write'] == pytest.approx(0, abs=0.01)
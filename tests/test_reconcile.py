@@ -0,0 +1,103 @@
+import time
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+from helpers.InstagramAPI import InstagramAPI
+from helpers.Models import MediaItem, Post
+from helpers.RedditManager import RedditManager, log as reddit_log
+from helpers.TwitterManager import TwitterManager
+from helpers.WriteAheadLog import WriteAheadLog
+
+
+@pytest.fixture(autouse=True)
+def wal(tmp_path, monkeypatch):
+    log = WriteAheadLog(str(tmp_path / 'wal.db'))
+    monkeypatch.setattr(WriteAheadLog, '_default', log)
+    return log
+
+
+def timeout():
+    raise requests.exceptions.ReadTimeout("timed out")
+
+
+class Subreddit:
+    def __init__(self, outcomes):
+        self.outcomes = outcomes
+        self.submitted = 0
+
+    def submit(self, title, selftext=None, url=None):
+        self.submitted += 1
+        outcome = self.outcomes.pop(0)
+        return outcome() if callable(outcome) else outcome
+
+
+def reddit(subreddit, submissions):
+    manager = RedditManager.__new__(RedditManager)
+    manager.username = 'me'
+    manager.logger = reddit_log
+    manager.reddit = SimpleNamespace(
+        subreddit=lambda name: subreddit,
+        redditor=lambda name: SimpleNamespace(submissions=SimpleNamespace(new=lambda limit: iter(submissions))),
+    )
+    return manager
+
+
+def post(post_id, title, subreddit='test', age=0):
+    return SimpleNamespace(id=post_id, title=title, subreddit=subreddit, created_utc=time.time() - age)
+
+
+def test_reddit_post_that_timed_out_is_found_instead_of_resent():
+    subreddit = Subreddit([timeout])
+    submissions = [post('other', 'Something else'), post('p1', 'Hello')]
+    manager = reddit(subreddit, submissions)
+    assert manager.create_post('test', 'Hello', 'body', idempotency_key='k') is None
+    assert manager.create_post('test', 'Hello', 'body', idempotency_key='k') == 'p1'
+    assert subreddit.submitted == 1
+
+
+def test_reddit_post_is_resent_when_not_found():
+    subreddit = Subreddit([timeout, SimpleNamespace(id='p2')])
+    # Same title, but from long before the first attempt
+    manager = reddit(subreddit, [post('old', 'Hello', age=3600)])
+    manager.create_post('test', 'Hello', 'body', idempotency_key='k')
+    assert manager.create_post('test', 'Hello', 'body', idempotency_key='k') == 'p2'
+    assert subreddit.submitted == 2
+
+
+def test_instagram_publish_that_timed_out_is_found_instead_of_resent(monkeypatch):
+    api = InstagramAPI('acct', 'token', 'page', session=requests.Session())
+    published = []
+
+    def publish(image_url, caption):
+        published.append(caption)
+        timeout()
+    monkeypatch.setattr(api, '_publish_post', publish)
+    monkeypatch.setattr(api, 'list_media', lambda limit, fields: [
+        MediaItem('instagram', 'm1', time.time(), title='Sunset')])
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        api.create_post('https://example.com/a.jpg', 'Sunset', idempotency_key='k')
+    assert api.create_post('https://example.com/a.jpg', 'Sunset', idempotency_key='k') == {'id': 'm1'}
+    assert published == ['Sunset']
+
+
+def test_media_tweet_that_timed_out_is_found_instead_of_resent(monkeypatch):
+    manager = TwitterManager.__new__(TwitterManager)
+    manager.user_id = '1'
+    sent = []
+
+    def create_tweet(text, media_ids):
+        sent.append(text)
+        timeout()
+    manager.client = SimpleNamespace(create_tweet=create_tweet)
+    manager.submit_media_upload = lambda path: SimpleNamespace(result=lambda: '99')
+    # The API returns the text escaped, with the media's t.co link appended
+    monkeypatch.setattr(manager, 'list_tweets', lambda max_results: [
+        Post('twitter', 't1', time.time(), text='Fish &amp; chips https://t.co/AbC123')])
+
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        manager.create_tweet('Fish & chips', idempotency_key='k', media_paths=['a.jpg'])
+    assert manager.create_tweet('Fish & chips', idempotency_key='k', media_paths=['a.jpg'])['id'] == 't1'
+    assert sent == ['Fish & chips']
@@ -0,0 +1,53 @@
+import threading
+import time
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+from helpers.Instrumentation import current_operation
+from helpers.RedditManager import CLOCK_SKEW, RedditManager, _PendingMedia, log as reddit_log
+
+
+def poller(submissions):
+    manager = RedditManager.__new__(RedditManager)
+    manager.username = 'me'
+    manager.logger = reddit_log
+    manager.media_poll_interval = 0
+    manager.media_timeout = 600
+    manager._media_lock = threading.Lock()
+    manager._media_poller = object()
+    manager._pending_media = []
+    manager._claimed_media = {}
+    manager._local = threading.local()
+    manager._local.reddit = SimpleNamespace(
+        redditor=lambda name: SimpleNamespace(submissions=SimpleNamespace(new=lambda limit: iter(submissions))))
+    return manager
+
+
+def post(post_id, title, created_utc):
+    return SimpleNamespace(id=post_id, title=title, subreddit='test', created_utc=created_utc, url=None)
+
+
+def test_poller_resolves_media_and_forgets_claims_that_can_no_longer_match():
+    now = time.time()
+    manager = poller([post('p1', 'Hello', now)])
+    future = Future()
+    manager._pending_media.append(_PendingMedia(future, 'test', 'Hello', False, now, None))
+    manager._claimed_media['ancient'] = now - manager.media_timeout - CLOCK_SKEW - 1
+
+    manager._poll_media()
+
+    assert future.result(timeout=0) == 'p1'
+    assert manager._claimed_media == {'p1': now}
+    assert manager._media_poller is None
+
+
+def test_poller_restores_the_operation_label():
+    now = time.time()
+    manager = poller([post('p1', 'Hello', now)])
+    manager._pending_media.append(_PendingMedia(Future(), 'test', 'Hello', False, now, None))
+    token = current_operation.set('caller')
+    try:
+        manager._poll_media()
+        assert current_operation.get() == 'caller'
+    finally:
+        current_operation.reset(token)
@@ -0,0 +1,88 @@
+import pytest
+
+from helpers.Resilience import CircuitBreaker, CircuitOpenError, Resilience, RetryPolicy
+
+
+def layer(attempts=2):
+    breaker = CircuitBreaker('twitter', failure_threshold=2, reset_timeout=0.05)
+    return Resilience('twitter', RetryPolicy(attempts=attempts, base_delay=0, deadline=5), breaker)
+
+
+def responses(*statuses):
+    statuses = list(statuses)
+
+    def send():
+        status = statuses.pop(0)
+        return status, {}, '', status
+    return send
+
+
+def open_circuit(breaker):
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+
+
+def test_opens_after_threshold_and_rejects_requests():
+    breaker = layer().breaker
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.record_failure()
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_failures_reset_on_success():
+    breaker = layer().breaker
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_half_open_lets_one_probe_through():
+    breaker = layer().breaker
+    open_circuit(breaker)
+    breaker.opened_at -= 1
+    breaker.before_request()
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+    breaker.record_success()
+    assert breaker.state == CircuitBreaker.CLOSED
+    breaker.before_request()
+
+
+def test_failed_probe_reopens():
+    breaker = layer().breaker
+    open_circuit(breaker)
+    breaker.opened_at -= 1
+    breaker.before_request()
+    breaker.record_failure()
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request()
+
+
+def test_throttled_probe_is_retried():
+    resilience = layer()
+    open_circuit(resilience.breaker)
+    resilience.breaker.opened_at -= 1
+    assert resilience.call('GET', responses(429, 200)) == 200
+    assert resilience.breaker.state == CircuitBreaker.CLOSED
+
+
+def test_throttled_probe_does_not_block_later_requests():
+    resilience = layer(attempts=1)
+    open_circuit(resilience.breaker)
+    resilience.breaker.opened_at -= 1
+    assert resilience.call('GET', responses(429)) == 429
+    assert resilience.call('GET', responses(200)) == 200
+
+
+def test_server_errors_open_the_circuit():
+    resilience = layer()
+    assert resilience.call('GET', responses(503, 503)) == 503
+    assert resilience.breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        resilience.call('GET', responses(200))
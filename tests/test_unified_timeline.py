@@ -0,0 +1,71 @@
+from helpers.Models import MediaItem, Post
+from helpers.UnifiedTimeline import paginate, unified_timeline
+
+
+class Listing:
+    """A manager whose list_*_page serves `times` (newest first) in pages, counting requests"""
+
+    def __init__(self, platform, times, item=Post):
+        self.items = [item(platform, f'{platform}-{n}', created_at) for n, created_at in enumerate(times)]
+        self.requests = []
+
+    def page(self, size, **cursor):
+        start = int(next(iter(cursor.values())) or 0)
+        self.requests.append((size, start))
+        end = start + size
+        return self.items[start:end], str(end) if end < len(self.items) else None
+
+    list_posts_page = list_tweets_page = list_videos_page = page
+
+
+def test_merges_newest_first_across_platforms():
+    reddit, twitter = Listing('reddit', [90, 70, 10]), Listing('twitter', [100, 80, 20])
+    timeline = unified_timeline({'reddit': reddit, 'twitter': twitter}, limit=None)
+    assert [item.created_at for item in timeline] == [100, 90, 80, 70, 20, 10]
+
+
+def test_undated_items_go_last():
+    reddit = Listing('reddit', [None])
+    youtube = Listing('youtube', [50, 40], item=MediaItem)
+    timeline = unified_timeline({'reddit': reddit, 'youtube': youtube}, limit=None)
+    assert [item.id for item in timeline] == ['youtube-0', 'youtube-1', 'reddit-0']
+
+
+def test_page_size_of_limit_costs_one_request_per_platform():
+    reddit, twitter = Listing('reddit', range(100, 0, -1)), Listing('twitter', range(99, 0, -1))
+    items = list(unified_timeline({'reddit': reddit, 'twitter': twitter}, limit=10))
+    assert len(items) == 10
+    assert reddit.requests == [(10, 0)]
+    assert twitter.requests == [(10, 0)]
+
+
+def test_next_page_is_fetched_only_when_needed():
+    # Reddit holds the six newest items, so only it pages on
+    reddit, twitter = Listing('reddit', [60, 59, 58, 57, 56, 55]), Listing('twitter', [10, 9, 8, 7, 6])
+    items = list(unified_timeline({'reddit': reddit, 'twitter': twitter}, limit=6, page_size=5))
+    assert [item.created_at for item in items] == [60, 59, 58, 57, 56, 55]
+    assert reddit.requests == [(5, 0), (5, 5)]
+    assert twitter.requests == [(5, 0)]
+
+
+def test_page_size_is_kept_within_the_api_bounds():
+    twitter, youtube = Listing('twitter', [2, 1]), Listing('youtube', [2, 1], item=MediaItem)
+    list(unified_timeline({'twitter': twitter}, limit=2))
+    list(unified_timeline({'youtube': youtube}, limit=None))
+    assert twitter.requests == [(5, 0)]
+    assert youtube.requests == [(50, 0)]
+
+
+def test_failing_platform_ends_only_its_own_part():
+    class Down:
+        def list_tweets_page(self, size, pagination_token):
+            raise ConnectionError("unreachable")
+    reddit = Listing('reddit', [3, 2, 1])
+    timeline = unified_timeline({'twitter': Down(), 'reddit': reddit}, limit=None)
+    assert [item.created_at for item in timeline] == [3, 2, 1]
+
+
+def test_paginate_stops_on_an_empty_page_or_none():
+    pages = {None: (['a', 'b'], 'next'), 'next': ([], 'again')}
+    assert list(paginate(pages.get)) == ['a', 'b']
+    assert list(paginate(lambda cursor: None)) == []
@@ -0,0 +1,113 @@
+import threading
+from types import SimpleNamespace
+
+from helpers import UploadScheduler as upload_scheduler
+from helpers.UploadScheduler import CHUNK_UNIT, MIN_CHUNK_SIZE, UploadScheduler
+
+MiB = 1024 * 1024
+
+
+class Client:
+    def __init__(self, uploaded, fail=()):
+        self.uploaded = uploaded
+        self.fail = fail
+
+    def create_video(self, title, description, privacy_status, file_path, on_duplicate, idempotency_key,
+                     chunk_size, progress):
+        if title in self.fail:
+            raise ConnectionError("upload failed")
+        self.uploaded.append(title)
+        return {'id': f'v-{title}'}
+
+
+def video(tmp_path, name, size=10):
+    path = tmp_path / f'{name}.mp4'
+    path.write_bytes(b'\0' * size)
+    return str(path)
+
+
+def test_uploads_run_earliest_deadline_first(tmp_path):
+    uploaded = []
+    scheduler = UploadScheduler(max_concurrency=1, client_factory=lambda: Client(uploaded), interval=60)
+    scheduler.add(video(tmp_path, 'none'), 'none')
+    scheduler.add(video(tmp_path, 'late'), 'late', deadline=2000)
+    scheduler.add(video(tmp_path, 'early'), 'early', deadline=1000)
+    scheduler.add(video(tmp_path, 'none2'), 'none2')
+    scheduler.start().close()
+    assert scheduler.wait(timeout=5)
+    assert uploaded == ['early', 'late', 'none', 'none2']
+
+
+def test_progress_is_reported_for_every_file(tmp_path):
+    reports = []
+    lock = threading.Lock()
+
+    def callback(file, batch):
+        with lock:
+            reports.append((file.title, file.state))
+    scheduler = UploadScheduler(callback, max_concurrency=2, client_factory=lambda: Client([], fail={'b'}),
+                                interval=60)
+    scheduler.add(video(tmp_path, 'a'), 'a')
+    scheduler.add(video(tmp_path, 'b'), 'b')
+    scheduler.start().close()
+    assert scheduler.wait(timeout=5)
+
+    files, batch = scheduler.snapshot()
+    assert [(file.title, file.state, file.video_id) for file in files] == [('a', 'done', 'v-a'), ('b', 'failed', None)]
+    assert (batch.files, batch.done, batch.failed, batch.bytes_sent) == (2, 1, 1, 10)
+    assert ('a', 'done') in reports and ('b', 'failed') in reports
+
+
+def test_cancel_fails_files_not_yet_started(tmp_path):
+    scheduler = UploadScheduler(client_factory=lambda: Client([]), interval=60)
+    scheduler.add(video(tmp_path, 'a'), 'a')
+    scheduler.cancel()
+    files, batch = scheduler.snapshot()
+    assert [(file.state, file.error) for file in files] == [('failed', 'Cancelled')]
+    assert scheduler.wait(timeout=0)
+
+
+def tune(scheduler, rates):
+    """Fake clock and sleep feeding the tuner one interval per rate (bytes/s; 0 leaves the slots idle)"""
+    clock = SimpleNamespace(now=0.0)
+    job = next(iter(scheduler._jobs.values()))
+    steps = iter(rates)
+    history = []
+
+    def sleep(seconds):
+        if clock.now:  # What the previous interval left
+            history.append((scheduler.concurrency, scheduler.chunk_size))
+        clock.now += seconds
+        rate = next(steps, None)
+        if rate is None:
+            scheduler._closed, scheduler._active = True, 0
+            scheduler._queue.clear()
+            return
+        scheduler._active = scheduler.concurrency if rate else 0
+        job.bytes_sent += int(rate * seconds)
+
+    return clock, sleep, history
+
+
+def test_tuner_climbs_while_throughput_grows_then_steps_back(tmp_path, monkeypatch):
+    scheduler = UploadScheduler(max_concurrency=6, client_factory=lambda: Client([]), interval=5)
+    scheduler.add(video(tmp_path, 'a'), 'a')
+    clock, sleep, history = tune(scheduler, [1 * MiB, 3 * MiB, 2 * MiB])
+    monkeypatch.setattr(upload_scheduler, 'time', SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep))
+
+    scheduler._tune()
+
+    assert [concurrency for concurrency, _ in history] == [3, 4, 3]
+    # 1 MiB/s over two uploads, for half an interval, in whole 256 KiB units
+    assert history[0][1] == 5 * CHUNK_UNIT
+
+
+def test_tuner_holds_while_uploads_do_not_fill_the_slots(tmp_path, monkeypatch):
+    scheduler = UploadScheduler(max_concurrency=6, client_factory=lambda: Client([]), interval=5)
+    scheduler.add(video(tmp_path, 'a'), 'a')
+    clock, sleep, history = tune(scheduler, [0, 0])
+    monkeypatch.setattr(upload_scheduler, 'time', SimpleNamespace(monotonic=lambda: clock.now, sleep=sleep))
+
+    scheduler._tune()
+
+    assert history == [(2, MIN_CHUNK_SIZE), (2, MIN_CHUNK_SIZE)]
@@ -0,0 +1,123 @@
+import http.client
+import json
+import threading
+from http.server import ThreadingHTTPServer
+from types import SimpleNamespace
+
+import pytest
+
+from helpers.WebhookReceiver import (ChangeFeed, _WebhookHandler, cache_updater, parse_graph, parse_youtube,
+                                     sample_payload, sign, verify_signature)
+
+SECRET = 'app-secret'
+
+
+@pytest.mark.parametrize('algorithm', ['sha256', 'sha1'])
+def test_signature_of_the_body_is_accepted(algorithm):
+    body = sample_payload('facebook', 'post_1')
+    assert verify_signature(body, sign(body, SECRET, algorithm), SECRET)
+
+
+@pytest.mark.parametrize('header', [
+    sign(b'other body', SECRET),
+    sign(sample_payload('facebook', 'post_1'), 'wrong-secret'),
+    'md5=' + sign(sample_payload('facebook', 'post_1'), SECRET).partition('=')[2],
+    'no-separator',
+    None,
+])
+def test_wrong_signature_is_rejected(header):
+    body = sample_payload('facebook', 'post_1')
+    assert not verify_signature(body, header, SECRET)
+
+
+def test_nothing_verifies_without_a_secret():
+    body = sample_payload('facebook', 'post_1')
+    assert not verify_signature(body, sign(body, ''), None)
+
+
+@pytest.mark.parametrize('action', ['created', 'updated', 'deleted'])
+def test_parse_graph_page_feed(action):
+    [change] = parse_graph(json.loads(sample_payload('facebook', 'post_1', action)))
+    assert (change.platform, change.kind, change.action, change.remote_id, change.account_id) == \
+        ('facebook', 'post', action, 'post_1', 'sample')
+
+
+def test_parse_graph_instagram_comment():
+    [change] = parse_graph(json.loads(sample_payload('instagram', 'comment_1')))
+    assert (change.platform, change.kind, change.action, change.remote_id, change.parent_id) == \
+        ('instagram', 'comment', 'created', 'comment_1', 'sample-media')
+
+
+def test_parse_graph_ignores_other_objects_and_verbs():
+    assert parse_graph({'object': 'user', 'entry': [{'id': '1', 'changes': [{'field': 'feed'}]}]}) == []
+    assert parse_graph({'object': 'page', 'entry': [{'id': '1', 'changes': [
+        {'field': 'feed', 'value': {'item': 'like', 'verb': 'block', 'post_id': 'p'}}]}]}) == []
+
+
+def test_parse_youtube_upload_and_deletion():
+    [created] = parse_youtube(sample_payload('youtube', 'vid_1'))
+    assert (created.platform, created.kind, created.action, created.remote_id, created.account_id) == \
+        ('youtube', 'video', 'created', 'vid_1', 'UCsample')
+    [deleted] = parse_youtube(sample_payload('youtube', 'vid_1', 'deleted'))
+    assert (deleted.action, deleted.remote_id, deleted.account_id) == ('deleted', 'vid_1', 'UCsample')
+
+
+def test_feed_drops_redelivered_changes_and_updates_caches():
+    feed, tracked, forgotten = ChangeFeed(), [], []
+    store = SimpleNamespace(track=lambda platform, remote_id, when: tracked.append(remote_id))
+    index = SimpleNamespace(forget=lambda platform, remote_id: forgotten.append(remote_id))
+    feed.subscribe(cache_updater(store=store, upload_index=index))
+
+    created = parse_graph(json.loads(sample_payload('facebook', 'post_1')))
+    assert feed.publish(created) == 1
+    assert feed.publish(created) == 0
+    feed.publish(parse_graph(json.loads(sample_payload('facebook', 'post_1', 'deleted'))))
+    assert (tracked, forgotten) == (['post_1'], ['post_1'])
+    assert [n for n, _ in feed.since(1)] == [2]
+
+
+@pytest.fixture
+def receiver():
+    feed = ChangeFeed()
+    handler = type('WebhookHandler', (_WebhookHandler,), {'feed': feed, 'app_secret': SECRET})
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server, feed
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, body: bytes, headers: dict) -> int:
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    # Sent by hand so the Content-Length header is exactly the one given
+    connection.putrequest('POST', '/webhooks/graph')
+    for name, value in headers.items():
+        connection.putheader(name, value)
+    connection.endheaders(body)
+    status = connection.getresponse().status
+    connection.close()
+    return status
+
+
+def test_signed_delivery_is_published(receiver):
+    server, feed = receiver
+    body = sample_payload('facebook', 'post_1')
+    assert post(server, body, {'Content-Length': str(len(body)), 'X-Hub-Signature-256': sign(body, SECRET)}) == 200
+    assert [change.remote_id for _, change in feed.since()] == ['post_1']
+
+
+@pytest.mark.parametrize('length', ['-1', 'abc'])
+def test_bad_content_length_is_rejected_without_reading(receiver, length):
+    server, feed = receiver
+    body = sample_payload('facebook', 'post_1')
+    # Without the check, a negative length blocks reading until the client hangs up
+    assert post(server, body, {'Content-Length': length, 'X-Hub-Signature-256': sign(body, SECRET)}) == 400
+    assert feed.since() == []
+
+
+def test_wrongly_signed_delivery_is_refused(receiver):
+    server, feed = receiver
+    body = sample_payload('facebook', 'post_1')
+    headers = {'Content-Length': str(len(body)), 'X-Hub-Signature-256': sign(body, 'wrong-secret')}
+    assert post(server, body, headers) == 401
+    assert feed.since() == []
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+import requests
+
+from helpers.WriteAheadLog import AmbiguousCreateError, IntentInFlightError, WriteAheadLog
+
+
+@pytest.fixture
+def wal(tmp_path):
+    return WriteAheadLog(str(tmp_path / 'wal.db'), lease=60, retention=3600)
+
+
+class Platform:
+    """Records creates and lets a test decide how each one ends"""
+
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.sent = 0
+        self.lookups = []
+
+    def send(self):
+        self.sent += 1
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    def finder(self, found):
+        def find(since):
+            self.lookups.append(since)
+            return found
+        return find
+
+
+def test_same_key_is_sent_once(wal):
+    platform = Platform({'id': '1'})
+    assert wal.run('twitter', 'create_tweet', {}, platform.send, key='k') == {'id': '1'}
+    assert wal.run('twitter', 'create_tweet', {}, platform.send, key='k') == {'id': '1'}
+    assert platform.sent == 1
+    assert wal.get('twitter', 'k').state == 'done'
+
+
+def test_ambiguous_failure_is_reconciled_before_resending(wal):
+    platform = Platform(requests.exceptions.ReadTimeout("timed out"))
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        wal.run('twitter', 'create_tweet', {}, platform.send, platform.finder(None), key='k')
+    assert wal.get('twitter', 'k').state == 'unknown'
+
+    found = wal.run('twitter', 'create_tweet', {}, platform.send, platform.finder({'id': '1'}), key='k')
+    assert found == {'id': '1'}
+    assert platform.sent == 1
+    assert len(platform.lookups) == 1
+    assert wal.get('twitter', 'k').state == 'done'
+
+
+def test_ambiguous_failure_is_resent_when_nothing_is_found(wal):
+    platform = Platform(requests.exceptions.ReadTimeout("timed out"), {'id': '2'})
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        wal.run('twitter', 'create_tweet', {}, platform.send, platform.finder(None), key='k')
+    assert wal.run('twitter', 'create_tweet', {}, platform.send, platform.finder(None), key='k') == {'id': '2'}
+    assert platform.sent == 2
+    assert wal.get('twitter', 'k').attempts == 2
+
+
+def test_certain_failure_is_resent_without_lookup(wal):
+    platform = Platform(ConnectionRefusedError("refused"), {'id': '3'})
+    with pytest.raises(ConnectionRefusedError):
+        wal.run('twitter', 'create_tweet', {}, platform.send, platform.finder({'id': 'x'}), key='k')
+    assert wal.get('twitter', 'k').state == 'failed'
+    assert wal.run('twitter', 'create_tweet', {}, platform.send, platform.finder({'id': 'x'}), key='k') == {'id': '3'}
+    assert platform.lookups == []
+
+
+def test_pending_intent_within_lease_is_in_flight(wal):
+    wal._claim('twitter', 'k', 'create_tweet', {})
+    with pytest.raises(IntentInFlightError):
+        wal.run('twitter', 'create_tweet', {}, Platform({'id': '1'}).send, key='k')
+
+
+def test_stale_pending_intent_is_reconciled(tmp_path):
+    wal = WriteAheadLog(str(tmp_path / 'wal.db'), lease=0)
+    wal._claim('twitter', 'k', 'create_tweet', {})
+    platform = Platform()
+    assert wal.run('twitter', 'create_tweet', {}, platform.send, platform.finder({'id': '1'}), key='k') == {'id': '1'}
+    assert platform.sent == 0
+
+
+def test_creates_without_a_key_are_not_logged(wal):
+    platform = Platform({'id': '1'}, {'id': '2'})
+    wal.run('twitter', 'create_tweet', {}, platform.send)
+    wal.run('twitter', 'create_tweet', {}, platform.send)
+    assert platform.sent == 2
+    assert wal.intents() == []
+
+
+def test_purge_drops_only_finished_intents_past_retention(wal):
+    platform = Platform({'id': '1'}, requests.exceptions.ReadTimeout("timed out"), {'id': '3'})
+    wal.run('twitter', 'create_tweet', {}, platform.send, key='done')
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        wal.run('twitter', 'create_tweet', {}, platform.send, key='unknown')
+    wal.run('twitter', 'create_tweet', {}, platform.send, key='recent')
+    wal._conn.execute('UPDATE intents SET updated_at = ? WHERE key != ?', (time.time() - 7200, 'recent'))
+    assert wal.purge() == 1
+    assert sorted(intent.key for intent in wal.intents()) == ['recent', 'unknown']
+
+
+def test_ambiguous_failure_without_finder_is_not_resent(wal):
+    platform = Platform(requests.exceptions.ReadTimeout("timed out"), {'id': '2'})
+    with pytest.raises(requests.exceptions.ReadTimeout):
+        wal.run('twitter', 'create_tweet', {}, platform.send, key='k')
+    with pytest.raises(AmbiguousCreateError):
+        wal.run('twitter', 'create_tweet', {}, platform.send, key='k')
+    assert platform.sent == 1
+    assert wal.get('twitter', 'k').state == 'unknown'
@@ -0,0 +1,67 @@
+import time
+from datetime import datetime
+import pandas as pd
+import streamlit as st
+from helpers.CredentialStore import CredentialStore
+from helpers.FacebookMinimal import FacebookMinimal
+from helpers.InstagramAPI import InstagramAPI
+from helpers.RedditManager import RedditManager
+from helpers.TwitterManager import TwitterManager
+from helpers.UnifiedTimeline import unified_timeline
+from helpers.YouTubeOperations import YouTubeOperations
+
+
+def get_managers():
+    """
+    One manager per platform with credentials, built on every run
+
+    Not cached across sessions: PRAW and httplib2 clients are not thread-safe,
+    and each session's script runs on its own thread.
+    """
+    def youtube():
+        # Without a stored token YouTube needs the interactive OAuth flow; leave it out instead
+        if CredentialStore.default().get('youtube') is None:
+            raise ValueError("not authenticated")
+        yt = YouTubeOperations()
+        yt.authenticate(lazy=True)
+        return yt
+
+    factories = {
+        'reddit': RedditManager,
+        'twitter': lambda: TwitterManager(lazy=True),
+        'facebook': lambda: FacebookMinimal(lazy=True),
+        'instagram': InstagramAPI,
+        'youtube': youtube,
+    }
+    managers, skipped = {}, {}
+    for name, factory in factories.items():
+        try:
+            managers[name] = factory()
+        except Exception as e:
+            skipped[name] = str(e)
+    return managers, skipped
+
+
+def run(operation):
+    managers, skipped = get_managers()
+
+    # --- RECENT ITEMS ---
+    if operation == "Recent Items":
+        st.header("Unified Timeline")
+        platforms = st.multiselect("Platforms", list(managers), default=list(managers))
+        limit = st.number_input("Items", min_value=1, max_value=500, value=50)
+        for name, reason in skipped.items():
+            st.caption(f"{name.capitalize()} is not set up: {reason}")
+
+        if st.button("Load Timeline") and platforms:
+            started = time.perf_counter()
+            items = list(unified_timeline({name: managers[name] for name in platforms}, int(limit)))
+            st.caption(f"{len(items)} items in {time.perf_counter() - started:.2f}s")
+            st.dataframe(pd.DataFrame([{
+                'time': datetime.fromtimestamp(item.created_at) if item.created_at else None,
+                'platform': item.platform,
+                'title': item.title or getattr(item, 'text', None),
+                'likes': item.likes,
+                'comments': item.comments,
+                'url': item.url,
+            } for item in items]))
@@ -2,9 +2,10 @@ import streamlit as st
 from helpers.TwitterManager import TwitterManager
 import tweepy
 
-def run(operation):
+def run(operation, prefetcher=None):
     
-    twitter = TwitterManager()
+    # Credentials are checked on the first API call and cached across reruns
+    twitter = TwitterManager(lazy=True)
 
     # Check if Twitter API was successfully initialized before proceeding
     if twitter:
@@ -13,11 +14,15 @@ def run(operation):
             if operation == "Create Tweet":
                 st.header("Create a New Tweet")
                 tweet_text = st.text_area("Tweet Content", "")
+                media_input = st.text_area("Media files (optional, one path per line: up to 4 images, or a GIF or video)", "")
                 
                 if st.button("Create Tweet"):
-                    response = twitter.create_tweet(tweet_text)
+                    media_paths = [line.strip() for line in media_input.splitlines() if line.strip()]
+                    response = twitter.create_tweet(tweet_text, media_paths=media_paths or None)
                     if response and 'id' in response:
                         tweet_id = response['id']
+                        if prefetcher:
+                            prefetcher.invalidate('twitter')
                         st.success(f"Tweet created successfully! Tweet ID: {tweet_id}")
                         tweet_url = f"https://twitter.com/user/status/{tweet_id}"
                         st.markdown(f"[View Tweet on Twitter]({tweet_url})", unsafe_allow_html=True)
@@ -47,7 +52,10 @@ def run(operation):
                 max_results = st.number_input("Number of tweets to fetch", min_value=1, max_value=10, value=5)
                 
                 if st.button("Get Recent Tweets"):
-                    recent_tweets = twitter.get_my_tweets(max_results=max_results)
+                    # The prefetched listing holds the default five most recent tweets
+                    recent_tweets = prefetcher.get('twitter', 'my_tweets') if prefetcher and max_results == 5 else None
+                    if recent_tweets is None:
+                        recent_tweets = twitter.get_my_tweets(max_results=max_results)
                     if recent_tweets:
                         for tweet in recent_tweets:
                             st.subheader(f"Tweet ID: {tweet.id}")
@@ -67,6 +75,8 @@ def run(operation):
                 if st.button("Delete Tweet"):
                     delete_success = twitter.delete_tweet(tweet_id)
                     if delete_success:
+                        if prefetcher:
+                            prefetcher.invalidate('twitter')
                         st.success("Tweet deleted successfully!")
                     else:
                         st.error("Failed to delete tweet. Check the Tweet ID.")
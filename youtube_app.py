@@ -1,17 +1,40 @@
 import streamlit as st
 from helpers.YouTubeOperations import YouTubeOperations
+from helpers.MediaPreprocessor import MediaPreprocessor
+from helpers.UploadIndex import DuplicateUploadError
+from helpers.UploadScheduler import UploadScheduler
 import os
+import queue
+import shutil
+import tempfile
+import time
 
-def run(operation):
+
+@st.cache_resource
+def get_preprocessor():
+    return MediaPreprocessor()
+
+
+def run(operation, prefetcher=None):
     yt = YouTubeOperations()
     # Authenticate only once, if not already authenticated
     if not yt.credentials or not yt.youtube:
         try:
-            yt.authenticate()
+            # The channel check runs on the first API call and is cached across reruns
+            yt.authenticate(lazy=True)
             st.success("YouTube authenticated successfully!")
         except Exception as e:
             st.error(f"Failed to authenticate YouTube: {e}")
     
+    def list_videos():
+        # Prefer the listing main_app started fetching when YouTube was selected
+        videos = prefetcher.get('youtube', 'videos') if prefetcher else None
+        return videos if videos is not None else yt.list_my_videos(max_results=5)
+
+    def get_video(video_id):
+        video = prefetcher.get('youtube', f'video:{video_id}') if prefetcher else None
+        return video if video is not None else yt.read_video(video_id)
+
     # --- CREATE VIDEO ---
     if operation == "Create Video":
         st.header("Upload a New Video to YouTube")
@@ -23,6 +46,11 @@ def run(operation):
         
         # File uploader for video file
         video_file = st.file_uploader("Choose a video file", type=["mp4", "mov", "avi"])
+        duplicate_choice = st.radio(
+            "If this file was uploaded before",
+            ["Ask me", "Reuse existing video", "Upload again"]
+        )
+        on_duplicate = {"Ask me": "confirm", "Reuse existing video": "reuse", "Upload again": "upload"}[duplicate_choice]
         
         if st.button("Upload Video"):
             if video_file is not None:
@@ -31,13 +59,25 @@ def run(operation):
                     with open("temp_video.mp4", "wb") as f:
                         f.write(video_file.read())
                     
-                    # Call the create_video method with the path to the temp file
-                    response = yt.create_video(title, description, privacy_status, "temp_video.mp4")
+                    # Strip metadata and remux for upload; the same file is only processed once
+                    upload_path = "temp_video.mp4"
+                    try:
+                        upload_path = get_preprocessor().prepare(upload_path, "youtube_video")
+                    except Exception as e:
+                        st.warning(f"Video preprocessing failed, uploading the original: {e}")
+
+                    # Call the create_video method with the path to the prepared file
+                    response = yt.create_video(title, description, privacy_status, upload_path, on_duplicate)
                     
                     if response:
+                        if prefetcher:
+                            prefetcher.invalidate('youtube')
                         video_id = response['id']
                         st.success(f"Video uploaded successfully! Video ID: {video_id}")
                         st.markdown(f"[View Video on YouTube](https://www.youtube.com/watch?v={video_id})")
+                except DuplicateUploadError as e:
+                    st.warning(f"{e}. Choose 'Upload again' to upload it anyway.")
+                    st.markdown(f"[View Existing Video on YouTube](https://www.youtube.com/watch?v={e.record.remote_id})")
                 except Exception as e:
                     st.error(f"Error uploading video: {e}")
                 finally:
@@ -46,13 +86,77 @@ def run(operation):
             else:
                 st.warning("Please upload a video file before clicking 'Upload Video'")    
 
+    # --- BATCH UPLOAD ---
+    elif operation == "Batch Upload":
+        st.header("Upload Many Videos to YouTube")
+        privacy_status = st.selectbox("Privacy Status", ["private", "unlisted", "public"])
+        video_files = st.file_uploader("Choose video files", type=["mp4", "mov", "avi"], accept_multiple_files=True)
+        due_hours = {}
+        for video_file in video_files or []:
+            # Files with the nearest deadline are uploaded first
+            due_hours[video_file.name] = st.number_input(f"{video_file.name}: due in hours (0 for no deadline)",
+                                                         min_value=0.0, value=0.0, key=f"due_{video_file.name}")
+
+        if st.button("Start Uploads"):
+            if not video_files:
+                st.warning("Please choose video files before clicking 'Start Uploads'")
+            else:
+                upload_dir = tempfile.mkdtemp(prefix="youtube-batch-")
+                events = queue.Queue()
+                # Called on the upload threads; this script renders the events below
+                scheduler = UploadScheduler(lambda file, batch: events.put((file, batch)))
+                for video_file in video_files:
+                    path = os.path.join(upload_dir, video_file.name)
+                    with open(path, "wb") as f:
+                        f.write(video_file.read())
+                    hours = due_hours.get(video_file.name)
+                    scheduler.add(path, os.path.splitext(video_file.name)[0], privacy_status=privacy_status,
+                                  deadline=time.time() + hours * 3600 if hours else None)
+                scheduler.start().close()
+                st.session_state["youtube_batch"] = (scheduler, events, upload_dir)
+
+        # Uploads keep running across reruns; show the current batch until it finishes
+        if "youtube_batch" in st.session_state:
+            scheduler, events, upload_dir = st.session_state["youtube_batch"]
+            files, batch = scheduler.snapshot()
+            latest = {file.job_id: file for file in files}
+            summary, total_bar = st.empty(), st.progress(0.0)
+            file_bars = {job_id: st.progress(0.0) for job_id in latest}
+            while True:
+                finished = scheduler.wait(0.5)
+                while not events.empty():
+                    file, batch = events.get_nowait()
+                    latest[file.job_id] = file
+                summary.write(f"{batch.done} done, {batch.failed} failed, {batch.uploading} uploading, "
+                              f"{batch.queued} queued - {batch.throughput / 1024 ** 2:.1f} MiB/s, "
+                              f"{batch.concurrency} at once")
+                total_bar.progress(batch.bytes_sent / batch.total_bytes if batch.total_bytes else 1.0)
+                for job_id, file in latest.items():
+                    label = f"{file.title}: {file.state}"
+                    if file.video_id:
+                        label += f" (https://www.youtube.com/watch?v={file.video_id})"
+                    elif file.error:
+                        label += f" ({file.error})"
+                    file_bars[job_id].progress(file.bytes_sent / file.total_bytes if file.total_bytes else 1.0,
+                                               text=label)
+                if finished:
+                    break
+            del st.session_state["youtube_batch"]
+            shutil.rmtree(upload_dir, ignore_errors=True)
+            if prefetcher:
+                prefetcher.invalidate('youtube')
+            if batch.failed:
+                st.error(f"{batch.failed} of {batch.files} uploads failed.")
+            else:
+                st.success(f"All {batch.files} videos uploaded.")
+
     # --- READ VIDEO ---
     elif operation == "Read Video":
         st.header("Get Video Details")
         
         # List user's recent videos to choose one to read details
         try:
-            videos = yt.list_my_videos(max_results=5)
+            videos = list_videos()
             video_options = {}
             
             if videos.get('items'):
@@ -67,7 +171,7 @@ def run(operation):
                     
                     if st.button("Fetch Video Details"):
                         try:
-                            video_info = yt.read_video(video_id)
+                            video_info = get_video(video_id)
                             st.write("Video details:")
                             st.write(video_info)
                         except Exception as e:
@@ -84,7 +188,7 @@ def run(operation):
         
         # List user's recent videos to help choose one for updating
         try:
-            videos = yt.list_my_videos(max_results=5)
+            videos = list_videos()
             video_options = {}
             
             if videos.get('items'):
@@ -98,10 +202,7 @@ def run(operation):
                     video_id = video_options[selected_title]
                     
                     # Get current video details to show in the form
-                    current_video = yt.youtube.videos().list(
-                        part="snippet",
-                        id=video_id
-                    ).execute()
+                    current_video = get_video(video_id)
                     
                     if current_video['items']:
                         current_snippet = current_video['items'][0]['snippet']
@@ -115,6 +216,8 @@ def run(operation):
                                     title=new_title,
                                     description=new_description
                                 )
+                                if prefetcher:
+                                    prefetcher.invalidate('youtube')
                                 st.success("Video updated successfully!")
                                 st.markdown(f"[View Updated Video on YouTube](https://www.youtube.com/watch?v={video_id})")
                             except Exception as e:
@@ -131,7 +234,7 @@ def run(operation):
         
         # List user's recent videos to help choose one for deletion
         try:
-            videos = yt.list_my_videos(max_results=5)
+            videos = list_videos()
             video_options = {}
             
             if videos.get('items'):
@@ -152,6 +255,8 @@ def run(operation):
                     if st.button("Delete Video") and confirm:
                         try:
                             yt.delete_video(video_id)
+                            if prefetcher:
+                                prefetcher.invalidate('youtube')
                             st.success("Video deleted successfully!")
                             # Add a rerun button to refresh the video list
                             if st.button("Refresh Video List"):
@@ -165,3 +270,30 @@ def run(operation):
                 
         except Exception as e:
             st.error(f"Failed to fetch videos: {e}")
+
+    # --- QUOTA USAGE ---
+    elif operation == "Quota Usage":
+        st.header("YouTube API Quota")
+        if yt.quota is None:
+            st.warning("Authenticate to see quota usage.")
+            return
+        forecast = yt.quota.forecast()
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Used Today", f"{forecast['used']:,}")
+        col2.metric("Remaining", f"{forecast['remaining']:,}")
+        col3.metric("Units per Hour", f"{forecast['units_per_hour']:,.0f}")
+        st.progress(min(forecast['used'] / forecast['daily_quota'], 1.0))
+        if forecast['exhausts_at']:
+            st.warning(f"At today's rate the quota runs out at {forecast['exhausts_at'].astimezone():%H:%M}, "
+                       f"before it resets at {forecast['resets_at'].astimezone():%H:%M}.")
+        else:
+            st.success(f"Quota lasts until it resets at {forecast['resets_at'].astimezone():%H:%M}.")
+
+        usage = yt.quota.usage()
+        if usage:
+            st.subheader("Today by Method")
+            st.dataframe([{'method': method, **entry} for method, entry in usage.items()])
+        history = yt.quota.history()
+        if len(history) > 1:
+            st.subheader("Units per Day")
+            st.bar_chart(history)